@@ -64,5 +64,8 @@ if __name__ == "__main__":
             [console_scripts]
             make_artifacts=vivarium_nih_us_cvd.tools.cli:make_artifacts
             make_results=vivarium_nih_us_cvd.tools.cli:make_results
+            run_sharded=vivarium_nih_us_cvd.tools.cli:run_sharded_simulation
+            run_paired=vivarium_nih_us_cvd.tools.cli:run_paired_simulation
+            run_checkpointed=vivarium_nih_us_cvd.tools.cli:run_checkpointed_simulation
         '''
     )
@@ -1,2 +1,5 @@
-from .disease import MyocardialInfarction, IschemicStroke
-from .observers import DiseaseObserver
\ No newline at end of file
+from .adaptive_stepping import AdaptiveStepping
+from .demography import DemographicBins
+from .disease import MyocardialInfarction, IschemicStroke, SI
+from .observers import DiseaseObserver
+from .risk import JointRiskEffects
\ No newline at end of file
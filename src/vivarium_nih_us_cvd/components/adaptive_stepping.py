@@ -0,0 +1,123 @@
+"""
+=================
+Adaptive Stepping
+=================
+
+Lets simulants outside the acute MI and stroke states take longer effective
+time steps.
+
+"""
+import typing
+
+import numpy as np
+import pandas as pd
+
+from vivarium_nih_us_cvd.constants import models
+
+if typing.TYPE_CHECKING:
+    from vivarium.framework.engine import Builder
+    from vivarium.framework.event import Event
+    from vivarium.framework.population import SimulantData
+
+
+STEP_COUNT_COLUMN = 'adaptive_step_count'
+STEPS_UNTIL_ACTIVE_COLUMN = 'adaptive_steps_until_active'
+STEP_MULTIPLE_COLUMN = 'adaptive_step_multiple'
+
+ACUTE_STATES = {
+    models.MI_MODEL_NAME: models.ACUTE_MI_STATE_NAME,
+    models.ISCHEMIC_STROKE_MODEL_NAME: models.ACUTE_ISCHEMIC_STROKE_STATE_NAME,
+}
+TRANSITION_RATE_PIPELINES = [
+    f'{models.ACUTE_MI_STATE_NAME}.incidence_rate',
+    f'{models.POST_MI_STATE_NAME}_to_{models.ACUTE_MI_STATE_NAME}.transition_rate',
+    f'{models.ACUTE_ISCHEMIC_STROKE_STATE_NAME}.incidence_rate',
+    f'{models.CHRONIC_ISCHEMIC_STROKE_STATE_NAME}_to_{models.ACUTE_ISCHEMIC_STROKE_STATE_NAME}.transition_rate',
+    f'{models.ANGINA_MODEL_NAME}.incidence_rate',
+    f'{models.HF_IHD_MODEL_NAME}.incidence_rate',
+]
+
+
+class AdaptiveStepping:
+    """Advances non-acute simulants every few time steps instead of every step.
+
+    Simulants in an acute state are active every step. Everyone else is
+    active once every ``non_acute_step_multiple`` steps, staggered across the
+    population, so a simulant's first window can be shorter. Active
+    simulants transition with their rates scaled by the number of steps
+    since they were last active, or since the simulation started, so the
+    transition probability is compounded over exactly the skipped steps.
+    Disease states skip inactive simulants entirely. A simulant entering an
+    acute state becomes active every step from the next step on.
+
+    Transitions are only skipped when this component is in the model
+    specification.
+
+    """
+
+    configuration_defaults = {
+        'adaptive_stepping': {
+            'non_acute_step_multiple': 3,
+        }
+    }
+
+    @property
+    def name(self) -> str:
+        return 'adaptive_stepping'
+
+    # noinspection PyAttributeOutsideInit
+    def setup(self, builder: 'Builder'):
+        self.step_multiple = builder.configuration.adaptive_stepping.non_acute_step_multiple
+        if self.step_multiple < 1:
+            raise ValueError('The non-acute step multiple must be at least 1.')
+
+        columns_created = [STEP_COUNT_COLUMN, STEPS_UNTIL_ACTIVE_COLUMN, STEP_MULTIPLE_COLUMN]
+        builder.population.initializes_simulants(self.on_initialize_simulants, creates_columns=columns_created)
+        self.population_view = builder.population.get_view(columns_created + ['alive'] + list(ACUTE_STATES))
+        self.step_view = builder.population.get_view(columns_created)
+        self.step_multiple_view = builder.population.get_view([STEP_MULTIPLE_COLUMN])
+
+        for pipeline in TRANSITION_RATE_PIPELINES:
+            builder.value.register_value_modifier(pipeline, modifier=self.scale_rate,
+                                                  requires_columns=[STEP_MULTIPLE_COLUMN])
+
+        builder.event.register_listener('time_step__prepare', self.on_time_step_prepare)
+        # Disease models transition at the default priority of 5.
+        builder.event.register_listener('time_step', self.on_time_step, priority=6)
+
+    def on_initialize_simulants(self, pop_data: 'SimulantData'):
+        # Stagger the non-acute steps so each step does a similar amount of work.
+        steps_until_active = self.step_multiple - pop_data.index.to_numpy() % self.step_multiple
+        self.population_view.update(pd.DataFrame({
+            STEP_COUNT_COLUMN: np.zeros(len(pop_data.index), dtype=np.int64),
+            STEPS_UNTIL_ACTIVE_COLUMN: steps_until_active.astype(np.int64),
+            STEP_MULTIPLE_COLUMN: np.zeros(len(pop_data.index), dtype=np.int64),
+        }, index=pop_data.index))
+
+    def on_time_step_prepare(self, event: 'Event'):
+        pop = self.population_view.get(event.index, query='alive == "alive"')
+        pop[STEP_COUNT_COLUMN] += 1
+        pop[STEPS_UNTIL_ACTIVE_COLUMN] -= 1
+        is_active = (pop[STEPS_UNTIL_ACTIVE_COLUMN] <= 0).to_numpy()
+        for model, acute_state in ACUTE_STATES.items():
+            is_active |= (pop[model] == acute_state).to_numpy()
+        # Fixed for the whole step, so every disease model sees the same
+        # active simulants regardless of transitions in the models before it.
+        pop[STEP_MULTIPLE_COLUMN] = np.where(is_active, pop[STEP_COUNT_COLUMN], 0)
+        self.population_view.update(pop[[STEP_COUNT_COLUMN, STEPS_UNTIL_ACTIVE_COLUMN, STEP_MULTIPLE_COLUMN]])
+
+    def on_time_step(self, event: 'Event'):
+        pop = self.step_view.get(event.index)
+        active = pop.loc[pop[STEP_MULTIPLE_COLUMN] > 0].index
+        self.step_view.update(pd.DataFrame({
+            STEP_COUNT_COLUMN: np.zeros(len(active), dtype=np.int64),
+            STEPS_UNTIL_ACTIVE_COLUMN: np.full(len(active), self.step_multiple, dtype=np.int64),
+        }, index=active))
+
+    def scale_rate(self, index: pd.Index, rates: pd.Series) -> pd.Series:
+        # Inactive simulants are skipped by the disease states, so a rate of
+        # zero here only matters to anyone else reading the pipeline.
+        return rates * self.step_multiple_view.get(index)[STEP_MULTIPLE_COLUMN]
+
+    def __repr__(self):
+        return 'AdaptiveStepping()'
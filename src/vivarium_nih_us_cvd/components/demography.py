@@ -0,0 +1,98 @@
+"""
+=================
+Demographic Bins
+=================
+
+Integer age bin and sex codes kept on the state table so observers and
+lookups can read them instead of rebinning ages every call.
+
+"""
+import typing
+
+import numpy as np
+import pandas as pd
+
+if typing.TYPE_CHECKING:
+    from vivarium.framework.engine import Builder
+    from vivarium.framework.event import Event
+    from vivarium.framework.population import SimulantData
+
+
+AGE_BIN_COLUMN = 'age_bin'
+SEX_CODE_COLUMN = 'sex_code'
+SEXES = ['Male', 'Female']
+
+
+def load_age_bins(builder: 'Builder') -> pd.DataFrame:
+    """Loads the full set of demographic age bins, sorted by age."""
+    age_bins = builder.data.load('population.age_bins')
+    return age_bins.sort_values('age_start').reset_index(drop=True)
+
+
+def get_age_bin_codes(age: pd.Series, age_bins: pd.DataFrame) -> np.ndarray:
+    """Maps ages to positions in the sorted, non-overlapping age bins, or -1
+    for ages outside every bin."""
+    age = age.to_numpy()
+    age_start, age_end = age_bins.age_start.to_numpy(), age_bins.age_end.to_numpy()
+    codes = np.searchsorted(age_start, age, side='right') - 1
+    in_bin = (codes >= 0) & (age < age_end[np.maximum(codes, 0)])
+    return np.where(in_bin, codes, -1)
+
+
+def get_age_bin_code_map(age_bins: pd.DataFrame, other_bins: pd.DataFrame) -> np.ndarray:
+    """Maps demographic age bin codes to positions in a subset of the bins.
+
+    The result has an extra trailing entry so it can be indexed directly by
+    codes of -1. Bins are matched on their name, as the subset's edges may
+    be trimmed to the simulation's entrance and exit ages.
+    """
+    code_map = np.full(len(age_bins) + 1, -1, dtype=np.intp)
+    code_map[:-1] = pd.Index(other_bins.age_group_name).get_indexer(age_bins.age_group_name)
+    return code_map
+
+
+class DemographicBins:
+    """Maintains integer age bin and sex codes for every simulant.
+
+    Age bin codes are positions in the demographic age bins, or -1 for
+    simulants outside every bin, and sex codes are positions in ``SEXES``.
+    Codes are only recomputed for simulants who age out of their bin.
+
+    """
+
+    @property
+    def name(self) -> str:
+        return 'demographic_bins'
+
+    # noinspection PyAttributeOutsideInit
+    def setup(self, builder: 'Builder'):
+        self.age_bins = load_age_bins(builder)
+        self.age_end = np.append(self.age_bins.age_end.to_numpy(), np.inf)
+
+        columns_created = [AGE_BIN_COLUMN, SEX_CODE_COLUMN]
+        builder.population.initializes_simulants(self.on_initialize_simulants,
+                                                 creates_columns=columns_created,
+                                                 requires_columns=['age', 'sex'])
+        self.population_view = builder.population.get_view(['age', 'sex'] + columns_created)
+
+        # Simulants are aged at priority 8.
+        builder.event.register_listener('time_step', self.on_time_step, priority=9)
+
+    def on_initialize_simulants(self, pop_data: 'SimulantData'):
+        pop = self.population_view.subview(['age', 'sex']).get(pop_data.index)
+        codes = pd.DataFrame({
+            AGE_BIN_COLUMN: get_age_bin_codes(pop['age'], self.age_bins).astype(np.int8),
+            SEX_CODE_COLUMN: pd.Categorical(pop['sex'], categories=SEXES).codes.astype(np.int8),
+        }, index=pop.index)
+        self.population_view.update(codes)
+
+    def on_time_step(self, event: 'Event'):
+        pop = self.population_view.subview(['age', AGE_BIN_COLUMN]).get(event.index)
+        # Ages only increase, so a simulant leaves its bin by passing its end.
+        aged_out = pop.loc[pop['age'].to_numpy() >= self.age_end[pop[AGE_BIN_COLUMN].to_numpy()]]
+        if not aged_out.empty:
+            codes = get_age_bin_codes(aged_out['age'], self.age_bins).astype(np.int8)
+            self.population_view.update(pd.Series(codes, index=aged_out.index, name=AGE_BIN_COLUMN))
+
+    def __repr__(self):
+        return 'DemographicBins()'
@@ -1,17 +1,124 @@
 from datetime import date
 import typing
 
+import numpy as np
 import pandas as pd
 
-from vivarium_public_health.disease import DiseaseState, DiseaseModel, SusceptibleState
-from vivarium_nih_us_cvd.constants import data_keys, models, models
+from vivarium.framework.values import list_combiner, union_post_processor
+from vivarium_public_health.disease import (DiseaseState as DiseaseState_, DiseaseModel as DiseaseModel_,
+                                            RateTransition, SusceptibleState as SusceptibleState_)
+
+from vivarium_nih_us_cvd.components.adaptive_stepping import AdaptiveStepping, STEP_MULTIPLE_COLUMN
+from vivarium_nih_us_cvd.components.demography import AGE_BIN_COLUMN, SEX_CODE_COLUMN
+from vivarium_nih_us_cvd.components.lookup import BinnedLookupTable
+from vivarium_nih_us_cvd.constants import data_keys, models
 
 if typing.TYPE_CHECKING:
     from vivarium.framework.engine import Builder
-    from vivarium.framework.population import SimulantData
+    from vivarium.framework.population import PopulationView, SimulantData
     from vivarium.framework.event import Event
 
 
+def get_state_dtype(model: str) -> pd.CategoricalDtype:
+    """Gets the categorical dtype of a disease model's state column."""
+    return pd.CategoricalDtype(models.STATE_MACHINE_MAP[model]['states'])
+
+
+def get_state_column(model: str, state_id: str, index: pd.Index) -> pd.Series:
+    """Builds a categorical state column with every simulant in one state."""
+    dtype = get_state_dtype(model)
+    codes = np.full(len(index), dtype.categories.get_loc(state_id), dtype=np.int8)
+    return pd.Series(pd.Categorical.from_codes(codes, dtype=dtype), index=index, name=model)
+
+
+class CategoricalStateMixin:
+    """Writes the model's state column as a categorical on transition."""
+
+    def transition_effect(self, index: pd.Index, event_time: pd.Timestamp, population_view: 'PopulationView'):
+        population_view.update(get_state_column(self._model, self.state_id, index))
+        self._transition_side_effect(index, event_time)
+
+
+class AdaptiveStepMixin:
+    """Skips simulants that are inactive this step under adaptive stepping.
+
+    Does nothing unless the ``AdaptiveStepping`` component is in the model.
+    """
+
+    # noinspection PyAttributeOutsideInit
+    def setup(self, builder: 'Builder'):
+        super().setup(builder)
+        self.adaptive_stepping = bool(builder.components.get_components_by_type(AdaptiveStepping))
+        if self.adaptive_stepping:
+            self.step_multiple_view = builder.population.get_view([STEP_MULTIPLE_COLUMN])
+
+    def next_state(self, index: pd.Index, event_time: pd.Timestamp, population_view: 'PopulationView'):
+        if self.adaptive_stepping:
+            index = index[self.step_multiple_view.get(index)[STEP_MULTIPLE_COLUMN].to_numpy() > 0]
+        return super().next_state(index, event_time, population_view)
+
+
+class SusceptibleState(AdaptiveStepMixin, CategoricalStateMixin, SusceptibleState_):
+    pass
+
+
+class DiseaseState(AdaptiveStepMixin, CategoricalStateMixin, DiseaseState_):
+    pass
+
+
+class DiseaseModel(DiseaseModel_):
+    """A disease model whose state column is categorical over the states in
+    ``models.STATE_MACHINE_MAP``."""
+
+    def on_initialize_simulants(self, pop_data: 'SimulantData'):
+        user_data = pop_data.user_data
+        is_birth = user_data['sim_state'] != 'setup' and user_data['age_start'] == user_data['age_end'] == 0
+        prevalence_type = 'birth_prevalence' if is_birth else 'prevalence'
+        if not pop_data.index.empty and any(getattr(state, prevalence_type, None) is not None
+                                            for state in self.states):
+            super().on_initialize_simulants(pop_data)
+        else:
+            # Without prevalence data the parent writes the initial state as
+            # objects, which can't be cast while the population grows.
+            self.population_view.update(get_state_column(self.state_column, self.initial_state, pop_data.index))
+
+    def assign_initial_status_to_simulants(self, simulants_df, state_names, weights_bins, propensities):
+        simulants = super().assign_initial_status_to_simulants(simulants_df, state_names,
+                                                               weights_bins, propensities)
+        simulants['condition_state'] = simulants['condition_state'].astype(get_state_dtype(self.state_column))
+        return simulants
+
+
+class BinnedRateTransition(RateTransition):
+    """A rate transition whose base rate is served by a binned lookup table."""
+
+    # noinspection PyAttributeOutsideInit
+    def setup(self, builder: 'Builder'):
+        rate_data, pipeline_name = self.load_transition_rate_data(builder)
+        self.base_rate = BinnedLookupTable(builder, rate_data)
+        self.transition_rate = builder.value.register_rate_producer(pipeline_name,
+                                                                    source=self.compute_transition_rate,
+                                                                    requires_columns=[AGE_BIN_COLUMN, SEX_CODE_COLUMN,
+                                                                                      'alive'],
+                                                                    requires_values=[f'{pipeline_name}.paf'])
+        paf = builder.lookup.build_table(0)
+        self.joint_paf = builder.value.register_value_producer(f'{pipeline_name}.paf',
+                                                               source=lambda index: [paf(index)],
+                                                               preferred_combiner=list_combiner,
+                                                               preferred_post_processor=union_post_processor)
+
+        self.population_view = builder.population.get_view(['alive'])
+
+    def __str__(self):
+        return f'BinnedRateTransition(from={self.input_state.state_id}, to={self.output_state.state_id})'
+
+
+def add_binned_rate_transition(input_state, output_state, get_data_functions) -> BinnedRateTransition:
+    transition = BinnedRateTransition(input_state, output_state, get_data_functions)
+    input_state.transition_set.append(transition)
+    return transition
+
+
 def MyocardialInfarction():
     susceptible = SusceptibleState(models.MI_MODEL_NAME)
     data_funcs = {'dwell_time': lambda *args: pd.Timedelta(days=28)}
@@ -22,14 +129,14 @@ def MyocardialInfarction():
     data_funcs = {
         'incidence_rate': lambda _, builder: builder.data.load(data_keys.MI.INCIDENCE_ACUTE.sink),
     }
-    susceptible.add_transition(acute_mi, source_data_type='rate', get_data_functions=data_funcs)
+    add_binned_rate_transition(susceptible, acute_mi, data_funcs)
     acute_mi.allow_self_transitions()
     acute_mi.add_transition(post_mi)
     post_mi.allow_self_transitions()
     data_funcs = {
         'transition_rate': lambda builder, *_: builder.data.load(data_keys.MI.INCIDENCE_POST.sink),
     }
-    post_mi.add_transition(acute_mi, source_data_type='rate', get_data_functions=data_funcs)
+    add_binned_rate_transition(post_mi, acute_mi, data_funcs)
 
     return DiseaseModel(models.MI_MODEL_NAME, states=[susceptible, acute_mi, post_mi])
 
@@ -44,13 +151,24 @@ def IschemicStroke():
     data_funcs = {
         'incidence_rate': lambda _, builder: builder.data.load(data_keys.ISCHEMIC_STROKE.INCIDENCE_ACUTE)
     }
-    susceptible.add_transition(acute_stroke, source_data_type='rate', get_data_functions=data_funcs)
+    add_binned_rate_transition(susceptible, acute_stroke, data_funcs)
     acute_stroke.allow_self_transitions()
     acute_stroke.add_transition(chronic_stroke)
     chronic_stroke.allow_self_transitions()
     data_funcs = {
         'transition_rate': lambda builder, *_: builder.data.load(data_keys.ISCHEMIC_STROKE.INCIDENCE_ACUTE)
     }
-    chronic_stroke.add_transition(acute_stroke, source_data_type='rate', get_data_functions=data_funcs)
+    add_binned_rate_transition(chronic_stroke, acute_stroke, data_funcs)
 
     return DiseaseModel(models.ISCHEMIC_STROKE_MODEL_NAME, states=[susceptible, acute_stroke, chronic_stroke])
+
+
+def SI(cause: str) -> DiseaseModel:
+    healthy = SusceptibleState(cause)
+    infected = DiseaseState(cause)
+
+    healthy.allow_self_transitions()
+    healthy.add_transition(infected, source_data_type='rate')
+    infected.allow_self_transitions()
+
+    return DiseaseModel(cause, states=[healthy, infected])
@@ -0,0 +1,91 @@
+"""
+====================
+Binned Lookup Tables
+====================
+
+Dense lookup tables for single draw data stratified by sex, age and year.
+
+"""
+import typing
+from typing import List, Union
+
+import numpy as np
+import pandas as pd
+
+from vivarium_nih_us_cvd.components.demography import AGE_BIN_COLUMN, SEX_CODE_COLUMN, SEXES, load_age_bins
+
+if typing.TYPE_CHECKING:
+    from vivarium.framework.engine import Builder
+
+
+def get_bin_codes(values: np.ndarray, left_edges: np.ndarray) -> np.ndarray:
+    """Finds the bin of each value given sorted left bin edges.
+
+    Values outside the bins are clipped to the first or last bin, matching
+    the order 0 interpolation with extrapolation used by vivarium lookups.
+    """
+    codes = np.searchsorted(left_edges, values, side='right') - 1
+    return np.clip(codes, 0, len(left_edges) - 1)
+
+
+def get_fractional_year(time: pd.Timestamp) -> float:
+    return time.year + time.timetuple().tm_yday / 365.25
+
+
+class BinnedLookupTable:
+    """Serves sex, age and year stratified data from a dense array.
+
+    The data is binned once at setup into a (sex, age bin, year bin, value)
+    array. Calls read simulant age bin and sex codes from the state table,
+    kept by the ``DemographicBins`` component, so a call is a direct integer
+    index into the array rather than the per call binning and merge done by
+    the vivarium interpolation. A single value column is served as a series
+    and a list of value columns as a data frame.
+
+    """
+
+    def __init__(self, builder: 'Builder', data: pd.DataFrame, value_columns: Union[str, List[str]] = 'value',
+                 name: str = 'binned_lookup_table'):
+        # Pipelines name their modifiers after this, as for vivarium lookup tables.
+        self.name = name
+        self.value_columns = value_columns
+        value_columns = [value_columns] if isinstance(value_columns, str) else list(value_columns)
+        self.age_edges = np.sort(data['age_start'].unique())
+        self.year_edges = np.sort(data['year_start'].unique())
+
+        sex_codes = pd.Categorical(data['sex'], categories=SEXES).codes
+        if (sex_codes < 0).any():
+            raise ValueError(f'Binned lookup tables only support the sexes {SEXES}.')
+        age_codes = np.searchsorted(self.age_edges, data['age_start'].values)
+        year_codes = np.searchsorted(self.year_edges, data['year_start'].values)
+
+        shape = (len(SEXES), len(self.age_edges), len(self.year_edges), len(value_columns))
+        self.values = np.full(shape, np.nan)
+        self.values[sex_codes, age_codes, year_codes] = data[value_columns].values
+        if np.isnan(self.values).any():
+            raise ValueError('Binned lookup table data does not cover every sex, age and year bin.')
+
+        self.age_code_map = self.get_age_code_map(load_age_bins(builder))
+        self.clock = builder.time.clock()
+        self.population_view = builder.population.get_view([AGE_BIN_COLUMN, SEX_CODE_COLUMN])
+
+    def get_age_code_map(self, age_bins: pd.DataFrame) -> np.ndarray:
+        """Maps demographic age bin codes to age bins of this table.
+
+        Simulants outside every demographic bin have aged past the last one
+        and are served from the last bin of the table.
+        """
+        age_start = age_bins.age_start.to_numpy()
+        if not np.isin(self.age_edges[self.age_edges > age_start[0]], age_start).all():
+            raise ValueError('Binned lookup table age bins do not align with the demographic age bins.')
+        return np.append(get_bin_codes(age_start, self.age_edges), len(self.age_edges) - 1)
+
+    def __call__(self, index: pd.Index) -> Union[pd.Series, pd.DataFrame]:
+        pop = self.population_view.get(index)
+        sex_codes = pop[SEX_CODE_COLUMN].to_numpy()
+        age_codes = self.age_code_map[pop[AGE_BIN_COLUMN].to_numpy()]
+        year_code = get_bin_codes(np.array([get_fractional_year(self.clock())]), self.year_edges)[0]
+        values = self.values[sex_codes, age_codes, year_code]
+        if isinstance(self.value_columns, str):
+            return pd.Series(values[:, 0], index=index)
+        return pd.DataFrame(values, index=index, columns=self.value_columns)
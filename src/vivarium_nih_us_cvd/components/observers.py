@@ -1,17 +1,19 @@
 import typing
+import numpy as np
 import pandas as pd
-import operator as op
 from collections import Counter
-from functools import reduce
-from typing import Dict, Iterable, List, Tuple, NamedTuple
+from typing import Dict, List, Optional, Tuple
 from itertools import product
 
 from vivarium_public_health.metrics import (MortalityObserver as MortalityObserver_,
                                             DisabilityObserver as DisabilityObserver_)
-from vivarium_public_health.metrics.utilities import (get_state_person_time, QueryString, 
-                                                      get_transition_count, get_age_bins)
+from vivarium_public_health.metrics.utilities import get_age_bins
+from vivarium_public_health.utilities import to_years
 
-from vivarium_nih_us_cvd.constants import data_keys, data_values, models
+from vivarium_nih_us_cvd.components.demography import (AGE_BIN_COLUMN, SEX_CODE_COLUMN, SEXES, get_age_bin_code_map,
+                                                       load_age_bins)
+from vivarium_nih_us_cvd.components.disease import get_state_dtype
+from vivarium_nih_us_cvd.constants import data_keys, data_values, models, results
 
 if typing.TYPE_CHECKING:
     from vivarium.framework.engine import Builder
@@ -19,121 +21,91 @@ if typing.TYPE_CHECKING:
     from vivarium.framework.population import SimulantData
 
 
-class MaskAndId(NamedTuple):
-    mask: pd.Series
-    id: str
-
-
 class ResultsStratifier:
     """Centralized component for handling results stratification.
 
     This should be used as a sub-component for observers.  The observers
-    can then ask this component for population subgroups and labels during
-    results production and have this component manage adjustments to the
-    final column labels for the subgroups.
+    can then ask this component for the integer risk group code of each
+    simulant during results production and for the column labels those
+    codes correspond to.  Only the risk layers configured for the observer
+    are evaluated.
 
     """
 
-    def __init__(self, observer_name: str):
+    def __init__(self, observer_name: str, config_key: str):
         self.name = f'{observer_name}_results_stratifier'
+        self.config_key = config_key
         self._risk_group_ids = []
+        self.risk_group_codes = None
 
     # noinspection PyAttributeOutsideInit
     def setup(self, builder: 'Builder'):
         """Perform this component's setup."""
+        layer_names = builder.configuration.metrics[self.config_key].risk_stratification
+        unknown_layers = set(layer_names).difference(data_values.RISK_STRATIFICATION_LAYERS)
+        if unknown_layers:
+            raise ValueError(f'Unknown risk stratification layers {sorted(unknown_layers)} for {self.config_key}. '
+                             f'Layers must be in {list(data_values.RISK_STRATIFICATION_LAYERS)}.')
         # The only thing you should request here are resources necessary for
         # results stratification.
-        self.sbp = builder.value.get_value('high_systolic_blood_pressure.exposure')
-        self.ldlc = builder.value.get_value('high_ldl_cholesterol.exposure')
-        self.fpg = builder.value.get_value('high_fasting_plasma_glucose.exposure')
-        self.bmi = builder.value.get_value('high_body_mass_index_in_adults.exposure')
+        self.layers = {name: (builder.value.get_value(data_values.RISK_STRATIFICATION_LAYERS[name].exposure),
+                              data_values.RISK_STRATIFICATION_LAYERS[name].threshold)
+                       for name in layer_names}
+
+        # This generates a list of concatenated strings from the stratification layers:
+        #   "SBP_high_LDL_high_FPG_high_BMI_high"
+        self._risk_group_ids = ['_'.join(i) for i in product(*[[f'{name}_high', f'{name}_normal']
+                                                                for name in self.layers])]
 
         columns_required = [models.MI_MODEL_NAME,
                             models.ISCHEMIC_STROKE_MODEL_NAME]
         self.population_view = builder.population.get_view(columns_required)
-        self.risk_groups = None
-        builder.population.initializes_simulants(self.on_initialize_simulants,
-                                                 requires_columns=columns_required,
-                                                 requires_values=['high_systolic_blood_pressure.exposure',
-                                                                  'high_ldl_cholesterol.exposure'])
+        builder.population.initializes_simulants(
+            self.on_initialize_simulants,
+            requires_columns=columns_required,
+            requires_values=[data_values.RISK_STRATIFICATION_LAYERS[name].exposure for name in self.layers]
+        )
 
     # noinspection PyAttributeOutsideInit
     def on_initialize_simulants(self, pop_data: 'SimulantData'):
-        risk_groups = pd.Series('', index=pop_data.index)
-        pop = self.population_view.get(pop_data.index)
-
-        sbp = self.sbp(pop_data.index)
-        ldlc = self.ldlc(pop_data.index)
-        fpg = self.fpg(pop_data.index)
-        bmi = self.bmi(pop_data.index)
-
-        high_sbp = sbp > data_values.THRESHOLD_HIGH_SBP
-        high_ldlc = ldlc > data_values.THRESHOLD_HIGH_LDLC
-        high_fpg = fpg > data_values.THRESHOLD_HIGH_FPG
-        high_bmi = bmi > data_values.THRESHOLD_HIGH_BMI
-
-        groups = []
-        groups.append([MaskAndId(high_sbp, 'SBP_high'), MaskAndId(~high_sbp, 'SBP_normal')])
-        groups.append([MaskAndId(high_ldlc, 'LDL_high'), MaskAndId(~high_ldlc, 'LDL_normal')])
-        groups.append([MaskAndId(high_fpg, 'FPG_high'), MaskAndId(~high_fpg, 'FPG_normal')])
-        groups.append([MaskAndId(high_bmi, 'BMI_high'), MaskAndId(~high_bmi, 'BMI_normal')])
-        p_groups = product(*groups)
+        # Each layer is one bit of the code, most significant first, so codes
+        # index into the risk group ids.
+        codes = np.zeros(len(pop_data.index), dtype=np.intp)
+        for exposure, threshold in self.layers.values():
+            is_high = exposure(pop_data.index) > threshold
+            codes = 2 * codes + (~is_high.to_numpy()).astype(np.intp)
+        codes = pd.Series(codes, index=pop_data.index)
+
+        if self.risk_group_codes is None:
+            self.risk_group_codes = codes
+        else:
+            self.risk_group_codes = pd.concat([self.risk_group_codes.drop(codes.index, errors='ignore'), codes])
 
-        # This generates a list of concatenated strings from the stratification layers:
-        #   "SBP_high_LDL_high_FPG_high_BMI_high"
-        self._risk_group_ids = ['_'.join(i) for i in list(product(*[[g[0].id, g[1].id] for g in groups]))]
-
-        for group in p_groups:
-            mask = reduce(op.and_, [j.mask for j in group])
-            id_str = '_'.join([j.id for j in group])
-            risk_groups.loc[mask] = id_str
-
-        self.risk_groups = risk_groups
-
-    def group(self, population: pd.DataFrame) -> Iterable[Tuple[Tuple[str, ...], pd.DataFrame]]:
-        """Takes the full population and yields stratified subgroups.
-
-        Parameters
-        ----------
-        population
-            The population to stratify.
-
-        Yields
-        ------
-            A tuple of stratification labels and the population subgroup
-            corresponding to those labels.
-
-        """
-        stratification_group = self.risk_groups.loc[population.index]
-        for risk_cat in self._risk_group_ids:
-            if population.empty:
-                pop_in_group = population
-            else:
-                pop_in_group = population.loc[stratification_group == risk_cat]
-            yield (risk_cat,), pop_in_group
-
-    @staticmethod
-    def update_labels(measure_data: Dict[str, float], labels: Tuple[str, ...]) -> Dict[str, float]:
-        """Updates a dict of measure data with stratification labels.
-
-        Parameters
-        ----------
-        measure_data
-            The measure data with unstratified column names.
-        labels
-            The stratification labels. Yielded along with the population
-            subgroup the measure data was produced from by a call to
-            :obj:`ResultsStratifier.group`.
-
-        Returns
-        -------
-            The measure data with column names updated with the stratification
-            labels.
-
-        """
-        stratification_label = labels[0]
-        measure_data = {f'{k}_{stratification_label}': v for k, v in measure_data.items()}
-        return measure_data
+    @property
+    def risk_group_ids(self) -> List[str]:
+        """The risk group labels, ordered by their integer codes."""
+        return self._risk_group_ids
+
+    def get_codes(self, index: pd.Index) -> np.ndarray:
+        """Gets the integer risk group code of each simulant in the index."""
+        return self.risk_group_codes.loc[index].to_numpy(dtype=np.intp)
+
+    def get_checkpoint_state(self) -> Dict:
+        return {'risk_group_codes': self.risk_group_codes}
+
+    def set_checkpoint_state(self, state: Dict):
+        self.risk_group_codes = state['risk_group_codes']
+
+
+def get_transition_codes(states: Tuple[str, ...], transitions: Tuple[models.TransitionString, ...]) -> np.ndarray:
+    """Maps (from state code * number of states + to state code) pair codes
+    to transition codes, or -1 where the pair is not a modeled transition."""
+    transition_codes = np.full(len(states) ** 2, -1, dtype=np.intp)
+    for code, transition in enumerate(transitions):
+        from_state = states.index(transition.from_state.lower())
+        to_state = states.index(transition.to_state.lower())
+        transition_codes[from_state * len(states) + to_state] = code
+    return transition_codes
 
 
 class DiseaseObserver:
@@ -144,6 +116,8 @@ class DiseaseObserver:
                 'by_age': False,
                 'by_year': False,
                 'by_sex': False,
+                'risk_stratification': list(data_values.RISK_STRATIFICATION_LAYERS),
+                'sparse_metrics': False,
             }
         }
     }
@@ -153,7 +127,7 @@ class DiseaseObserver:
         self.configuration_defaults = {
             'metrics': {f'{disease}_observer': DiseaseObserver.configuration_defaults['metrics']['disease_observer']}
         }
-        self.stratifier = ResultsStratifier(self.name)
+        self.stratifier = ResultsStratifier(self.name, f'{disease}_observer')
 
     @property
     def name(self) -> str:
@@ -167,12 +141,18 @@ class DiseaseObserver:
     def setup(self, builder: 'Builder'):
         self.config = builder.configuration['metrics'][f'{self.disease}_observer'].to_dict()
         self.clock = builder.time.clock()
-        self.age_bins = get_age_bins(builder)
+        self.age_bins = get_age_bins(builder).sort_values('age_start').reset_index(drop=True)
         self.counts = Counter()
         self.person_time = Counter()
 
         self.states = models.STATE_MACHINE_MAP[self.disease]['states']
         self.transitions = models.STATE_MACHINE_MAP[self.disease]['transitions']
+        self.age_groups = list(self.age_bins.age_group_name) if self.config['by_age'] else [None]
+        self._age_group_codes = get_age_bin_code_map(load_age_bins(builder), self.age_bins)
+        self.sexes = list(SEXES) if self.config['by_sex'] else ['Both']
+        self._transition_codes = get_transition_codes(self.states, self.transitions)
+        self._transition_keys = {}
+        self._person_time_keys = {}
 
         self.previous_state_column = f'previous_{self.disease}'
         builder.population.initializes_simulants(self.on_initialize_simulants,
@@ -180,9 +160,9 @@ class DiseaseObserver:
 
         columns_required = ['alive', f'{self.disease}', self.previous_state_column]
         if self.config['by_age']:
-            columns_required += ['age']
+            columns_required += [AGE_BIN_COLUMN]
         if self.config['by_sex']:
-            columns_required += ['sex']
+            columns_required += [SEX_CODE_COLUMN]
         self.population_view = builder.population.get_view(columns_required)
 
         builder.value.register_value_modifier('metrics', self.metrics)
@@ -193,39 +173,119 @@ class DiseaseObserver:
         builder.event.register_listener('collect_metrics', self.on_collect_metrics)
 
     def on_initialize_simulants(self, pop_data: 'SimulantData'):
-        self.population_view.update(pd.Series('', index=pop_data.index, name=self.previous_state_column))
+        previous_state = pd.Categorical.from_codes(np.full(len(pop_data.index), -1, dtype=np.int8),
+                                                   dtype=get_state_dtype(self.disease))
+        self.population_view.update(pd.Series(previous_state, index=pop_data.index, name=self.previous_state_column))
 
     def on_time_step_prepare(self, event: 'Event'):
         pop = self.population_view.get(event.index)
         # Ignoring the edge case where the step spans a new year.
         # Accrue all counts and time to the current year.
-        for labels, pop_in_group in self.stratifier.group(pop):
-            for state in self.states:
-                # noinspection PyTypeChecker
-                state_person_time_this_step = get_state_person_time(pop_in_group, self.config, self.disease, state,
-                                                                    self.clock().year, event.step_size, self.age_bins)
-                state_person_time_this_step = self.stratifier.update_labels(state_person_time_this_step, labels)
-                self.person_time.update(state_person_time_this_step)
-
-        # This enables tracking of transitions between states
-        prior_state_pop = self.population_view.get(event.index)
-        prior_state_pop[self.previous_state_column] = prior_state_pop[self.disease]
-        self.population_view.update(prior_state_pop)
+        state = pd.Categorical(pop[self.disease], categories=self.states).codes.astype(np.intp)
+        stratum = self.get_stratum_codes(pop)
+        observed = (pop['alive'] == 'alive').to_numpy() & (state >= 0) & (stratum >= 0)
+
+        n_strata = self.get_strata_count()
+        # Every simulant accrues the same step, so a count scaled by the step
+        # in years is the weighted bincount with the step as the weight.
+        simulant_count = np.bincount(state[observed] * n_strata + stratum[observed],
+                                     minlength=len(self.states) * n_strata)
+        state_person_time = simulant_count * to_years(event.step_size)
+        self.person_time.update(dict(zip(self.get_person_time_keys(self.clock().year), state_person_time.tolist())))
+
+        # This enables tracking of transitions between states. Both columns
+        # share a categorical dtype, so this is a copy of the state codes.
+        self.population_view.update(pop[self.disease].rename(self.previous_state_column))
 
     def on_collect_metrics(self, event: 'Event'):
         pop = self.population_view.get(event.index)
-        for labels, pop_in_group in self.stratifier.group(pop):
-            for transition in self.transitions:
-                # noinspection PyTypeChecker
-                transition_counts_this_step = get_transition_count(pop_in_group, self.config, self.disease, transition,
-                                                                   event.time, self.age_bins)
-                transition_counts_this_step = self.stratifier.update_labels(transition_counts_this_step, labels)
-                self.counts.update(transition_counts_this_step)
+        previous_state = pd.Categorical(pop[self.previous_state_column], categories=self.states).codes.astype(np.intp)
+        current_state = pd.Categorical(pop[self.disease], categories=self.states).codes.astype(np.intp)
+        in_model = (previous_state >= 0) & (current_state >= 0)
+        transition = np.full(len(pop), -1, dtype=np.intp)
+        transition[in_model] = self._transition_codes[previous_state[in_model] * len(self.states)
+                                                      + current_state[in_model]]
+        stratum = self.get_stratum_codes(pop)
+        observed = (transition >= 0) & (stratum >= 0)
+
+        n_strata = self.get_strata_count()
+        transition_counts = np.bincount(transition[observed] * n_strata + stratum[observed],
+                                        minlength=len(self.transitions) * n_strata)
+        self.counts.update(dict(zip(self.get_transition_keys(event.time.year), transition_counts.tolist())))
+
+    def get_stratum_codes(self, pop: pd.DataFrame) -> np.ndarray:
+        """Encodes the (risk group, sex, age group) stratum of each simulant
+        as a single integer, or -1 if the simulant is outside every stratum."""
+        risk_group = self.stratifier.get_codes(pop.index)
+        if self.config['by_sex']:
+            sex = pop[SEX_CODE_COLUMN].to_numpy().astype(np.intp)
+        else:
+            sex = np.zeros(len(pop), dtype=np.intp)
+        if self.config['by_age']:
+            age_group = self._age_group_codes[pop[AGE_BIN_COLUMN].to_numpy()]
+        else:
+            age_group = np.zeros(len(pop), dtype=np.intp)
+        stratum = (risk_group * len(self.sexes) + sex) * len(self.age_groups) + age_group
+        return np.where((sex >= 0) & (age_group >= 0), stratum, -1)
+
+    def get_strata_count(self) -> int:
+        return len(self.stratifier.risk_group_ids) * len(self.sexes) * len(self.age_groups)
+
+    def get_person_time_keys(self, year: int) -> List[str]:
+        """Gets the state person time column names in state code and stratum
+        code order."""
+        if year not in self._person_time_keys:
+            self._person_time_keys[year] = [
+                self.get_output_key(f'{state}_person_time', year, sex, age_group, risk_group)
+                for state, risk_group, sex, age_group in product(
+                    self.states, self.stratifier.risk_group_ids, self.sexes, self.age_groups
+                )
+            ]
+        return self._person_time_keys[year]
+
+    def get_transition_keys(self, year: int) -> List[str]:
+        """Gets the transition count column names in transition code and
+        stratum code order."""
+        if year not in self._transition_keys:
+            self._transition_keys[year] = [
+                self.get_output_key(f'{transition}_event_count', year, sex, age_group, risk_group)
+                for transition, risk_group, sex, age_group in product(
+                    self.transitions, self.stratifier.risk_group_ids, self.sexes, self.age_groups
+                )
+            ]
+        return self._transition_keys[year]
+
+    def get_output_key(self, measure: str, year: int, sex: str, age_group: Optional[str], risk_group: str) -> str:
+        key = measure
+        if self.config['by_year']:
+            key += f'_in_{year}'
+        if self.config['by_sex']:
+            key += f'_among_{sex}'
+        if self.config['by_age']:
+            key += f'_in_age_group_{age_group}'
+        key = key.replace(' ', '_').lower()
+        return f'{key}_{risk_group}' if risk_group else key
 
     def metrics(self, index: pd.Index, metrics: Dict[str, float]):
-        metrics.update(self.counts)
-        metrics.update(self.person_time)
+        if self.config['sparse_metrics']:
+            # Only nonzero strata are emitted, along with the number of
+            # strata observed, and results processing fills in the zeros.
+            metrics.update({key: value for key, value in self.counts.items() if value})
+            metrics.update({key: value for key, value in self.person_time.items() if value})
+            metrics[results.SPARSE_METRICS_SCHEMA_COLUMN_TEMPLATE.format(DISEASE=self.disease)] = (
+                len(self.counts) + len(self.person_time)
+            )
+        else:
+            metrics.update(self.counts)
+            metrics.update(self.person_time)
         return metrics
 
+    def get_checkpoint_state(self) -> Dict:
+        return {'counts': self.counts, 'person_time': self.person_time}
+
+    def set_checkpoint_state(self, state: Dict):
+        self.counts = Counter(state['counts'])
+        self.person_time = Counter(state['person_time'])
+
     def __repr__(self) -> str:
         return f"DiseaseObserver({self.disease})"
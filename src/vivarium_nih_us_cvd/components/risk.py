@@ -0,0 +1,169 @@
+"""
+===================
+Joint Risk Effects
+===================
+
+A single component applying the effects of several continuous risks on the
+rates they target.
+
+"""
+import typing
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from vivarium_public_health.risks import RiskEffect
+from vivarium_public_health.risks.data_transformations import (get_distribution_type, get_relative_risk_data,
+                                                               get_population_attributable_fraction_data)
+from vivarium_public_health.utilities import EntityString, TargetString
+
+from vivarium_nih_us_cvd.components.demography import AGE_BIN_COLUMN, SEX_CODE_COLUMN
+from vivarium_nih_us_cvd.components.lookup import BinnedLookupTable
+from vivarium_nih_us_cvd.constants import data_values
+
+if typing.TYPE_CHECKING:
+    from vivarium.framework.engine import Builder
+    from vivarium.framework.event import Event
+
+
+KEY_COLUMNS = ['sex', 'age_start', 'age_end', 'year_start', 'year_end']
+CONTINUOUS_DISTRIBUTIONS = ['normal', 'lognormal', 'ensemble']
+
+
+class JointRiskEffects:
+    """Applies the effects of continuous risks on their target rates.
+
+    Equivalent to one ``RiskEffect`` per (risk, target) pair with the targets
+    of each risk taken from ``data_values.RISK_EFFECT_TARGETS``. Each exposure
+    is evaluated once per time step, the relative risks of all risks on a
+    target are computed as a block, and each target rate and its PAF get a
+    single modifier.
+
+    """
+
+    def __init__(self, *risks: str):
+        """
+        Parameters
+        ----------
+        risks :
+            Type and name of each risk factor, supplied in the form
+            "risk_type.risk_name". Effects are applied in the given order.
+        """
+        self.risks = [EntityString(risk) for risk in risks]
+        self.targets = {}  # type: Dict[TargetString, List[EntityString]]
+        for risk in self.risks:
+            for target in data_values.RISK_EFFECT_TARGETS[risk]:
+                self.targets.setdefault(TargetString(target), []).append(risk)
+
+        measure_defaults = RiskEffect.configuration_defaults['effect_of_risk_on_target']['measure']
+        self.configuration_defaults = {
+            f'effect_of_{risk.name}_on_{target.name}': {target.measure: measure_defaults}
+            for target, target_risks in self.targets.items() for risk in target_risks
+        }
+
+    @property
+    def name(self):
+        return f'joint_risk_effects.{".".join(risk.name for risk in self.risks)}'
+
+    # noinspection PyAttributeOutsideInit
+    def setup(self, builder: 'Builder'):
+        self.clock = builder.time.clock()
+        self.exposure = {}
+        self.tmrel = {}
+        self.scale = {}
+        for risk in self.risks:
+            if get_distribution_type(builder, risk) not in CONTINUOUS_DISTRIBUTIONS:
+                raise ValueError(f'Joint risk effects only support continuous risks, got {risk}.')
+            self.exposure[risk] = builder.value.get_value(f'{risk.name}.exposure')
+            tmred = builder.data.load(f'{risk}.tmred')
+            self.tmrel[risk] = 0.5 * (tmred['min'] + tmred['max'])
+            self.scale[risk] = builder.data.load(f'{risk}.relative_risk_scalar')
+
+        self.relative_risk = {}
+        for target, risks in self.targets.items():
+            self.relative_risk[target] = BinnedLookupTable(
+                builder, self.load_relative_risk_data(builder, risks, target), [risk.name for risk in risks],
+                name=f'{self.name}.{target}.relative_risk'
+            )
+            paf = BinnedLookupTable(builder, self.load_population_attributable_fraction_data(builder, risks, target),
+                                    name=f'{self.name}.{target}.population_attributable_fraction')
+
+            builder.value.register_value_modifier(f'{target.name}.{target.measure}',
+                                                  modifier=self.get_target_modifier(target),
+                                                  requires_values=[f'{risk.name}.exposure' for risk in risks],
+                                                  requires_columns=[AGE_BIN_COLUMN, SEX_CODE_COLUMN])
+            builder.value.register_value_modifier(f'{target.name}.{target.measure}.paf',
+                                                  modifier=paf,
+                                                  requires_columns=[AGE_BIN_COLUMN, SEX_CODE_COLUMN])
+
+        self._cache_time = None
+        self._exposure_cache = {}  # type: Dict[EntityString, np.ndarray]
+        self._is_cached = np.zeros(0, dtype=bool)
+        builder.event.register_listener('time_step__prepare', self.on_time_step_prepare)
+        builder.event.register_listener('time_step', self.on_time_step, priority=9)
+
+    def on_time_step_prepare(self, event: 'Event'):
+        size = event.index.max() + 1 if not event.index.empty else 0
+        self._is_cached = np.zeros(size, dtype=bool)
+        self._is_cached[event.index] = True
+        for risk in self.risks:
+            exposure = np.full(size, np.nan)
+            exposure[event.index] = self.exposure[risk](event.index).values
+            self._exposure_cache[risk] = exposure
+        self._cache_time = self.clock()
+
+    def on_time_step(self, event: 'Event'):
+        # Exposures are age dependent, so the cache is only good until simulants age.
+        self._cache_time = None
+
+    def get_target_modifier(self, target: TargetString):
+        # Pipelines name modifiers from their name attributes, which partials lack.
+        def adjust_target(index: pd.Index, rates: pd.Series) -> pd.Series:
+            return self.adjust_target(target, index, rates)
+        return adjust_target
+
+    def adjust_target(self, target: TargetString, index: pd.Index, rates: pd.Series) -> pd.Series:
+        risks = self.targets[target]
+        relative_risk = self.relative_risk[target](index).values
+        exposure = np.column_stack([self.get_exposure(risk, index) for risk in risks])
+        tmrel = np.array([self.tmrel[risk] for risk in risks])
+        scale = np.array([self.scale[risk] for risk in risks])
+        effects = np.maximum(relative_risk ** ((exposure - tmrel) / scale), 1)
+        # Apply effects one risk at a time, the same as chained risk effect modifiers.
+        for i in range(len(risks)):
+            rates = rates * effects[:, i]
+        return rates
+
+    def get_exposure(self, risk: EntityString, index: pd.Index) -> np.ndarray:
+        if self._cache_time != self.clock() or index.empty:
+            return self.exposure[risk](index).values
+        # Simulants outside the event index of the step, like untracked or
+        # newly added simulants, are computed fresh.
+        positions = index.to_numpy()
+        is_cached = np.zeros(len(index), dtype=bool)
+        in_cache = positions < len(self._is_cached)
+        is_cached[in_cache] = self._is_cached[positions[in_cache]]
+        if is_cached.all():
+            return self._exposure_cache[risk][positions]
+        exposure = np.empty(len(index))
+        exposure[is_cached] = self._exposure_cache[risk][positions[is_cached]]
+        exposure[~is_cached] = self.exposure[risk](index[~is_cached]).values
+        return exposure
+
+    @staticmethod
+    def load_relative_risk_data(builder: 'Builder', risks: List[EntityString], target: TargetString) -> pd.DataFrame:
+        data = [get_relative_risk_data(builder, risk, target).set_index(KEY_COLUMNS)['value'].rename(risk.name)
+                for risk in risks]
+        return pd.concat(data, axis=1).reset_index()
+
+    @staticmethod
+    def load_population_attributable_fraction_data(builder: 'Builder', risks: List[EntityString],
+                                                   target: TargetString) -> pd.DataFrame:
+        data = [get_population_attributable_fraction_data(builder, risk, target).set_index(KEY_COLUMNS)['value']
+                for risk in risks]
+        joint_paf = 1 - (1 - pd.concat(data, axis=1)).prod(axis=1)
+        return joint_paf.rename('value').reset_index()
+
+    def __repr__(self):
+        return f"JointRiskEffects(risks={[str(risk) for risk in self.risks]})"
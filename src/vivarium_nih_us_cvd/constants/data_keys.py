@@ -1,4 +1,4 @@
-from typing import NamedTuple
+from typing import NamedTuple, Union
 
 from vivarium_nih_us_cvd.constants import models as mod
 
@@ -319,3 +319,38 @@ MAKE_ARTIFACT_KEY_GROUPS = [
     BMI,
     FPG,
 ]
+
+# Keys with the same data for every location. They are built once into a base
+# artifact and copied into each location's artifact. The relative risks of
+# these risks are global in GBD.
+LOCATION_INVARIANT_KEYS = [
+    POPULATION.AGE_BINS,
+    POPULATION.TMRLE,
+    MI.RESTRICTIONS,
+    ANGINA.RESTRICTIONS,
+    HF_IHD.RESTRICTIONS,
+    ISCHEMIC_STROKE.RESTRICTIONS,
+    PAD.RESTRICTIONS,
+    AFIB.RESTRICTIONS,
+] + [
+    key for risk in [LDL_C, SBP, BMI, FPG]
+    for key in [risk.DISTRIBUTION, risk.TMRED, risk.RELATIVE_RISK_SCALAR, risk.RELATIVE_RISK]
+]
+
+# Keys the special case handlers derive from other keys. When the model loads
+# a derived key, its sources must be built too.
+SPECIAL_CASE_SOURCES = {
+    FPG.TMRED_LOCAL: [FPG.TMRED],
+    FPG.RELATIVE_RISK_SCALAR_LOCAL: [FPG.RELATIVE_RISK_SCALAR],
+}
+
+# Keys always stored at full precision in reduced precision artifacts.
+FULL_PRECISION_KEYS = [
+    POPULATION.STRUCTURE,
+    POPULATION.TMRLE,
+]
+
+
+def get_sink(key: Union[str, SourceSink]) -> str:
+    """Gets the artifact key data is written to."""
+    return key.sink if isinstance(key, SourceSink) else key
@@ -12,6 +12,39 @@ THRESHOLD_HIGH_BMI = 25
 THRESHOLD_LOW_BMI = 20
 
 
+class RiskStratificationLayer(NamedTuple):
+    exposure: str
+    threshold: float
+
+
+# Keyed by the label used in results columns, e.g. 'SBP_high'.
+RISK_STRATIFICATION_LAYERS = {
+    'SBP': RiskStratificationLayer('high_systolic_blood_pressure.exposure', THRESHOLD_HIGH_SBP),
+    'LDL': RiskStratificationLayer('high_ldl_cholesterol.exposure', THRESHOLD_HIGH_LDLC),
+    'FPG': RiskStratificationLayer('high_fasting_plasma_glucose.exposure', THRESHOLD_HIGH_FPG),
+    'BMI': RiskStratificationLayer('high_body_mass_index_in_adults.exposure', THRESHOLD_HIGH_BMI),
+}
+
+__IHD_AND_STROKE_TARGETS = [
+    'cause.acute_myocardial_infarction.incidence_rate',
+    'cause.post_myocardial_infarction_to_acute_myocardial_infarction.transition_rate',
+    'cause.acute_ischemic_stroke.incidence_rate',
+    'cause.chronic_ischemic_stroke_to_acute_ischemic_stroke.transition_rate',
+]
+
+# Target rates affected by each risk, used by the joint risk effects component.
+RISK_EFFECT_TARGETS = {
+    'risk_factor.high_ldl_cholesterol': (
+        ['cause.heart_failure_from_ihd.incidence_rate'] + __IHD_AND_STROKE_TARGETS
+    ),
+    'risk_factor.high_systolic_blood_pressure': (
+        ['cause.heart_failure_from_ihd.incidence_rate'] + __IHD_AND_STROKE_TARGETS
+    ),
+    'risk_factor.high_body_mass_index_in_adults': __IHD_AND_STROKE_TARGETS,
+    'risk_factor.high_fasting_plasma_glucose': __IHD_AND_STROKE_TARGETS,
+}
+
+
 ##############################
 # Screening Model Parameters #
 ##############################
@@ -11,7 +11,23 @@ CLUSTER_QUEUE = 'all.q'
 MAKE_ARTIFACT_MEM = '10G'
 MAKE_ARTIFACT_CPU = '1'
 MAKE_ARTIFACT_RUNTIME = '3:00:00'
-MAKE_ARTIFACT_SLEEP = 10
+# Builds with telemetry from a previous build request the smallest memory tier
+# above their peak memory with headroom, and failed builds retry a tier up.
+MAKE_ARTIFACT_MEM_TIERS = ['4G', '8G', '16G', '32G', '64G']
+MAKE_ARTIFACT_MEM_HEADROOM = 1.5
+MAKE_ARTIFACT_RUNTIME_HEADROOM = 2
+MAKE_ARTIFACT_MIN_RUNTIME_SECONDS = 30 * 60
+MAKE_ARTIFACT_MAX_ATTEMPTS = 3
+BASE_ARTIFACT_NAME = 'base.hdf'
+
+# Reduced precision artifact storage
+ARTIFACT_DRAW_DTYPE = 'float32'
+ARTIFACT_COMPLIB = 'blosc:zstd'
+ARTIFACT_COMPLEVEL = 5
+# Keys whose draws would change by more than this are kept at full precision.
+ARTIFACT_MAX_RELATIVE_ERROR = 1e-6
+# Artifacts are only repacked once removed tables free this much of the file.
+ARTIFACT_REPACK_FREED_FRACTION = 0.1
 
 LOCATIONS = [
     'Alabama',
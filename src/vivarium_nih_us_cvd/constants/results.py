@@ -1,4 +1,5 @@
 import itertools
+from typing import Dict, Sequence
 
 import pandas as pd
 
@@ -25,13 +26,38 @@ STANDARD_COLUMNS = {
 
 THROWAWAY_COLUMNS = [f'{state}_event_count' for state in models.STATES]
 
+# Emitted by observers using sparse metrics.  The value is the number of
+# strata the observer tracked, of which only the nonzero ones are present.
+SPARSE_METRICS_SCHEMA_COLUMN_TEMPLATE = '{DISEASE}_observer_strata_count'
+SPARSE_METRICS_SCHEMA_COLUMNS = [SPARSE_METRICS_SCHEMA_COLUMN_TEMPLATE.format(DISEASE=disease)
+                                 for disease in models.STATE_MACHINE_MAP]
+
+# Risk stratification layers and the template fields they fill.
+RISK_STRATIFICATION_FIELDS = {
+    'SBP': 'SBP_HEALTH_STATE',
+    'LDL': 'LDL_HEALTH_STATE',
+    'FPG': 'FPG_STATE',
+    'BMI': 'BMI_STATE',
+}
+DEFAULT_RISK_STRATIFICATION = tuple(RISK_STRATIFICATION_FIELDS)
+UNSTRATIFIED_RISK_VALUE = 'all'
+
+
+def RISK_STRATIFICATION_TEMPLATE(risk_stratification: Sequence[str]) -> str:
+    return ''.join(f'_{risk}_{{{RISK_STRATIFICATION_FIELDS[risk]}}}' for risk in risk_stratification)
+
+
 TOTAL_POPULATION_COLUMN_TEMPLATE = 'total_population_{POP_STATE}'
 PERSON_TIME_COLUMN_TEMPLATE = 'person_time_in_{YEAR}_among_{SEX}_in_age_group_{AGE_GROUP}'
 DEATH_COLUMN_TEMPLATE = 'death_due_to_{CAUSE_OF_DEATH}_in_{YEAR}_among_{SEX}_in_age_group_{AGE_GROUP}'
 YLLS_COLUMN_TEMPLATE = 'ylls_due_to_{CAUSE_OF_DEATH}_in_{YEAR}_among_{SEX}_in_age_group_{AGE_GROUP}'
 YLDS_COLUMN_TEMPLATE = 'ylds_due_to_{CAUSE_OF_DISABILITY}_in_{YEAR}_among_{SEX}_in_age_group_{AGE_GROUP}'
-STATE_PERSON_TIME_COLUMN_TEMPLATE = '{STATE}_person_time_in_{YEAR}_among_{SEX}_in_age_group_{AGE_GROUP}_SBP_{SBP_HEALTH_STATE}_LDL_{LDL_HEALTH_STATE}_FPG_{FPG_STATE}_BMI_{BMI_STATE}'
-TRANSITION_COUNT_COLUMN_TEMPLATE = '{TRANSITION}_event_count_in_{YEAR}_among_{SEX}_in_age_group_{AGE_GROUP}_SBP_{SBP_HEALTH_STATE}_LDL_{LDL_HEALTH_STATE}_FPG_{FPG_STATE}_BMI_{BMI_STATE}'
+STATE_PERSON_TIME_BASE_TEMPLATE = '{STATE}_person_time_in_{YEAR}_among_{SEX}_in_age_group_{AGE_GROUP}'
+TRANSITION_COUNT_BASE_TEMPLATE = '{TRANSITION}_event_count_in_{YEAR}_among_{SEX}_in_age_group_{AGE_GROUP}'
+STATE_PERSON_TIME_COLUMN_TEMPLATE = (STATE_PERSON_TIME_BASE_TEMPLATE
+                                     + RISK_STRATIFICATION_TEMPLATE(DEFAULT_RISK_STRATIFICATION))
+TRANSITION_COUNT_COLUMN_TEMPLATE = (TRANSITION_COUNT_BASE_TEMPLATE
+                                    + RISK_STRATIFICATION_TEMPLATE(DEFAULT_RISK_STRATIFICATION))
 
 
 COLUMN_TEMPLATES = {
@@ -47,6 +73,13 @@ COLUMN_TEMPLATES = {
 NON_COUNT_TEMPLATES = [
 ]
 
+# Risk stratified measures, their templates without risk stratification, and
+# the disease model field and values that fill them.
+RISK_STRATIFIED_TEMPLATES = {
+    'state_person_time': (STATE_PERSON_TIME_BASE_TEMPLATE, 'STATE', 'states'),
+    'transition_count': (TRANSITION_COUNT_BASE_TEMPLATE, 'TRANSITION', 'transitions'),
+}
+
 POP_STATES = ('living', 'dead', 'tracked', 'untracked')
 SEXES = ('male', 'female')
 HEALTH_STATES = ('high', 'normal')
@@ -97,35 +130,62 @@ TEMPLATE_FIELD_MAP = {
 }
 
 
-def RESULT_COLUMNS(kind='all'):
+def RESULT_COLUMNS(kind='all', risk_stratification: Dict[str, Sequence[str]] = None):
+    """Gets result column names.
+
+    ``risk_stratification`` maps disease model names to the risk layers
+    their observers stratify by.  Diseases missing from it use the
+    default stratification.
+    """
     if kind not in COLUMN_TEMPLATES and kind != 'all':
         raise ValueError(f'Unknown result column type {kind}')
     columns = []
     if kind == 'all':
         for k in COLUMN_TEMPLATES:
-            columns += RESULT_COLUMNS(k)
+            columns += RESULT_COLUMNS(k, risk_stratification)
         columns = list(STANDARD_COLUMNS.values()) + columns
     else:
-        template = COLUMN_TEMPLATES[kind]
-        filtered_field_map = {field: values
-                              for field, values in TEMPLATE_FIELD_MAP.items() if f'{{{field}}}' in template}
-        fields, value_groups = filtered_field_map.keys(), itertools.product(*filtered_field_map.values())
-        for value_group in value_groups:
-            columns.append(template.format(**{field: value for field, value in zip(fields, value_group)}))
+        for template, field_map in _get_templates_and_field_maps(kind, risk_stratification):
+            columns += _format_template(template, field_map)[0]
     return columns
 
 
-def RESULTS_MAP(kind):
+def RESULTS_MAP(kind, risk_stratification: Dict[str, Sequence[str]] = None):
     if kind not in COLUMN_TEMPLATES:
         raise ValueError(f'Unknown result column type {kind}')
-    columns = []
-    template = COLUMN_TEMPLATES[kind]
-    filtered_field_map = {field: values
-                          for field, values in TEMPLATE_FIELD_MAP.items() if f'{{{field}}}' in template}
-    fields, value_groups = list(filtered_field_map.keys()), list(itertools.product(*filtered_field_map.values()))
-    for value_group in value_groups:
-        columns.append(template.format(**{field: value for field, value in zip(fields, value_group)}))
-    df = pd.DataFrame(value_groups, columns=map(lambda x: x.lower(), fields))
-    df['key'] = columns
+    maps = []
+    for template, field_map in _get_templates_and_field_maps(kind, risk_stratification):
+        columns, value_groups = _format_template(template, field_map)
+        df = pd.DataFrame(value_groups, columns=[field.lower() for field in field_map])
+        df['key'] = columns
+        maps.append(df)
+    df = pd.concat(maps, ignore_index=True)
+    risk_columns = [field.lower() for field in RISK_STRATIFICATION_FIELDS.values() if field.lower() in df]
+    df[risk_columns] = df[risk_columns].fillna(UNSTRATIFIED_RISK_VALUE)
     df['measure'] = kind  # per researcher feedback, this column is useful, even when it's identical for all rows
     return df.set_index('key').sort_index()
+
+
+def _get_templates_and_field_maps(kind, risk_stratification):
+    """Yields column templates for a kind of result with the values of each
+    template field.  Risk stratified measures yield one template per disease
+    model when a risk stratification is given."""
+    if kind not in RISK_STRATIFIED_TEMPLATES or risk_stratification is None:
+        template = COLUMN_TEMPLATES[kind]
+        yield template, {field: values for field, values in TEMPLATE_FIELD_MAP.items() if f'{{{field}}}' in template}
+        return
+
+    base_template, model_field, model_values = RISK_STRATIFIED_TEMPLATES[kind]
+    for model_name, model in models.STATE_MACHINE_MAP.items():
+        risks = risk_stratification.get(model_name, DEFAULT_RISK_STRATIFICATION)
+        template = base_template + RISK_STRATIFICATION_TEMPLATE(risks)
+        field_map = {field: values for field, values in TEMPLATE_FIELD_MAP.items() if f'{{{field}}}' in template}
+        field_map[model_field] = model[model_values]
+        yield template, field_map
+
+
+def _format_template(template, field_map):
+    fields, value_groups = list(field_map.keys()), list(itertools.product(*field_map.values()))
+    columns = [template.format(**{field: value for field, value in zip(fields, value_group)})
+               for value_group in value_groups]
+    return columns, value_groups
@@ -0,0 +1,96 @@
+"""Indexed stores for external input files used to build artifacts.
+
+External CSVs are read once, given typed columns and written to an HDF store
+with one table per location, so each location build reads only its own rows.
+A store is rebuilt when its source file changes. Reads are cached for the
+life of the process and callers get a copy.
+
+To add an input, define an :class:`AuxiliaryDataSource` and add it to
+``AUXILIARY_DATA_SOURCES``.
+
+"""
+from pathlib import Path
+from typing import Dict, NamedTuple, Tuple
+
+from loguru import logger
+import pandas as pd
+
+from vivarium_nih_us_cvd import paths
+from vivarium_nih_us_cvd.utilities import sanitize_location
+
+
+class AuxiliaryDataSource(NamedTuple):
+    name: str
+    path: str
+    # Columns to keep and their types.
+    dtypes: Dict[str, str]
+    location_column: str = 'location_name'
+
+
+HF_PROPORTIONS = AuxiliaryDataSource(
+    name='hf_proportions',
+    path=paths.HD_PROPDATA_PATH,
+    dtypes={
+        'sex_id': 'int8',
+        'age_group_id': 'int16',
+        'sim_cause': 'category',
+        'proportion': 'float64',
+    },
+)
+
+AUXILIARY_DATA_SOURCES = [
+    HF_PROPORTIONS,
+]
+
+_AUXILIARY_DATA = {}  # type: Dict[Tuple[str, str], pd.DataFrame]
+
+
+def get_store_path(source: AuxiliaryDataSource) -> Path:
+    return paths.AUXILIARY_DATA_DIR / f'{source.name}.hdf'
+
+
+def get_location_key(location: str) -> str:
+    return f'/{sanitize_location(location)}'
+
+
+def is_stale(source: AuxiliaryDataSource) -> bool:
+    store_path = get_store_path(source)
+    return not store_path.exists() or Path(source.path).stat().st_mtime > store_path.stat().st_mtime
+
+
+def build_store(source: AuxiliaryDataSource) -> Path:
+    """Converts the source file to a store with a table per location."""
+    store_path = get_store_path(source)
+    logger.debug(f'Building auxiliary data store for {source.name} at {str(store_path)}.')
+    data = pd.read_csv(source.path, usecols=list(source.dtypes) + [source.location_column], dtype=source.dtypes)
+
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    # Write then rename so readers never see a partial store.
+    temp_path = store_path.with_name(store_path.stem + '_tmp' + store_path.suffix)
+    with pd.HDFStore(str(temp_path), mode='w', complevel=9) as store:
+        for location, location_data in data.groupby(source.location_column):
+            store.put(get_location_key(location),
+                      location_data.drop(columns=source.location_column).reset_index(drop=True),
+                      format='table')
+    temp_path.replace(store_path)
+    return store_path
+
+
+def build_stale_stores():
+    """Builds the store of every source that is missing or out of date."""
+    for source in AUXILIARY_DATA_SOURCES:
+        if is_stale(source):
+            build_store(source)
+
+
+def load_auxiliary_data(source: AuxiliaryDataSource, location: str) -> pd.DataFrame:
+    key = (source.name, location)
+    if key not in _AUXILIARY_DATA:
+        if is_stale(source):
+            build_store(source)
+        _AUXILIARY_DATA[key] = pd.read_hdf(get_store_path(source), get_location_key(location))
+    return _AUXILIARY_DATA[key].copy()
+
+
+def clear_auxiliary_data_cache():
+    _AUXILIARY_DATA.clear()
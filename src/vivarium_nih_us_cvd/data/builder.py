@@ -10,14 +10,16 @@ Some degree of verbosity/boilerplate is fine in the interest of transparancy.
 
 """
 from pathlib import Path
-from typing import Union
+from typing import Any, List, Union
 
 from loguru import logger
 import pandas as pd
-from vivarium.framework.artifact import Artifact, EntityKey
+from vivarium.framework.artifact import Artifact
 
-from vivarium_nih_us_cvd.constants import data_keys
-from vivarium_nih_us_cvd.data import loader
+from vivarium_nih_us_cvd.constants import data_keys, metadata
+from vivarium_nih_us_cvd.data import loader, telemetry
+from vivarium_nih_us_cvd.data.draws import expand_draws
+from vivarium_nih_us_cvd.data.storage import StorageOptions, apply_storage_options, get_table_bytes, write_data
 
 
 def open_artifact(output_path: Path, location: str) -> Artifact:
@@ -49,7 +51,44 @@ def open_artifact(output_path: Path, location: str) -> Artifact:
     return artifact
 
 
-def load_and_write_data(artifact: Artifact, key: Union[str, data_keys.SourceSink], location: str):
+def open_base_artifact(output_dir: Path) -> Union[Artifact, None]:
+    """Opens the base artifact in the output directory, if there is one."""
+    path = output_dir / metadata.BASE_ARTIFACT_NAME
+    return Artifact(path) if path.exists() else None
+
+
+def build_base_artifact(output_path: Path, location: str, keys: List[str] = None,
+                        storage: StorageOptions = None) -> Artifact:
+    """Builds the artifact of location invariant keys shared by the location
+    artifacts.
+
+    Parameters
+    ----------
+    output_path
+        Fully resolved path to the base artifact file.
+    location
+        Any location in the project, used to pull the data.
+    keys
+        The keys to build. All location invariant keys are built if not given.
+    storage
+        How to store draws. Draws are stored at full precision if not given.
+
+    Returns
+    -------
+        The base artifact.
+
+    """
+    logger.debug(f"Building base artifact at {str(output_path)}.")
+    artifact = Artifact(output_path)
+    for key in data_keys.LOCATION_INVARIANT_KEYS:
+        if keys is None or data_keys.get_sink(key) in keys:
+            load_and_write_data(artifact, key, location, storage=storage)
+    return artifact
+
+
+def load_and_write_data(artifact: Artifact, key: Union[str, data_keys.SourceSink], location: str,
+                        base_artifact: Artifact = None, storage: StorageOptions = None,
+                        return_data: bool = False) -> Union[pd.DataFrame, Any, None]:
     """Loads data and writes it to the artifact if not already present.
 
     Parameters
@@ -61,6 +100,19 @@ def load_and_write_data(artifact: Artifact, key: Union[str, data_keys.SourceSink
     location
         The location associated with the data to load and the artifact to
         write to.
+    base_artifact
+        An artifact of location invariant data to copy from rather than
+        loading the data again.
+    storage
+        How to store draws. Draws are stored at full precision if not given.
+    return_data
+        Whether to load the written data back from the artifact.
+
+    Returns
+    -------
+        If ``return_data`` is set, the data in the artifact, with data written
+        as a single value column broadcast to draws. Otherwise None, and
+        nothing is read back from the artifact.
 
     """
     if isinstance(key, data_keys.SourceSink):
@@ -69,15 +121,68 @@ def load_and_write_data(artifact: Artifact, key: Union[str, data_keys.SourceSink
     else:
         source = sink = key
 
-    if sink in artifact:
-        logger.debug(f'Data for {sink} already in artifact.  Skipping...')
-    else:
-        logger.debug(f'Loading data for {source} for location {location}.')
-        data = loader.get_data(key, location)
-        logger.debug(f'Writing data for {source} to artifact at location {sink}.')
-        artifact.write(sink, data)
-    return artifact.load(sink)
-
-
-def handle_special_cases(artifact: Artifact, location: str):
-    loader.handle_special_cases(artifact, location)
\ No newline at end of file
+    with telemetry.record_key(sink) as record:
+        if sink in artifact:
+            logger.debug(f'Data for {sink} already in artifact.  Skipping...')
+            record['source'] = 'artifact'
+            return load_written_data(artifact, sink) if return_data else None
+        elif base_artifact is not None and sink in base_artifact:
+            logger.debug(f'Copying data for {sink} from the base artifact.')
+            record['source'] = 'base_artifact'
+            with telemetry.stage(telemetry.FETCH):
+                data = base_artifact.load(sink)
+        else:
+            logger.debug(f'Loading data for {source} for location {location}.')
+            record['source'] = 'loader'
+            with telemetry.stage(telemetry.TRANSFORM):
+                data = loader.get_data(key, location)
+            logger.debug(f'Writing data for {source} to artifact at location {sink}.')
+        record['rows'], record['draws'] = telemetry.get_shape(data)
+        with telemetry.stage(telemetry.WRITE):
+            write_data(artifact, sink, data, storage)
+    return load_written_data(artifact, sink) if return_data else None
+
+
+def load_written_data(artifact: Artifact, key: str) -> Any:
+    """Loads data from the artifact with a single value column broadcast to draws."""
+    return expand_draws(artifact.load(key))
+
+
+def handle_special_cases(artifact: Artifact, location: str, storage: StorageOptions = None):
+    with telemetry.record_key('special_cases') as record:
+        record['source'] = 'artifact'
+        table_bytes = get_table_bytes(artifact) if storage is not None else {}
+        # The handlers replace keys in place, so their writes count as transforms.
+        with telemetry.stage(telemetry.TRANSFORM):
+            loader.handle_special_cases(artifact, location)
+        if storage is not None:
+            with telemetry.stage(telemetry.WRITE):
+                apply_storage_options(artifact, storage, table_bytes)
+
+
+def clear_data_caches():
+    loader.clear_data_caches()
+
+
+def start_telemetry(location: str, artifact_path: Path):
+    telemetry.start_build(location, artifact_path)
+
+
+def finish_telemetry() -> Union[Path, None]:
+    path = telemetry.finish_build()
+    if path is not None:
+        logger.debug(f'Wrote build telemetry to {str(path)}.')
+    return path
+
+
+def prefetch_me_draws(locations: List[str], directory: Path):
+    logger.debug(f'Prefetching modelable entity draws for {locations} to {str(directory)}.')
+    with telemetry.record_key('prefetch.me_draws') as record:
+        record['source'] = 'loader'
+        # Everything but the draws queries is storing the draws.
+        with telemetry.stage(telemetry.WRITE):
+            loader.prefetch_me_draws(locations, directory)
+
+
+def use_me_draw_store(directory: Union[Path, None]):
+    loader.use_me_draw_store(directory)
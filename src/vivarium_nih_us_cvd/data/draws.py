@@ -0,0 +1,125 @@
+"""Arithmetic on blocks of draws that share an index.
+
+Combining draw frames with pandas operators realigns their indices and
+allocates a new frame for every operation. A :class:`DrawBlock` checks that
+its operands line up once and then works on a contiguous NumPy array in
+place, converting back to a frame only when the data is written.
+
+Keys whose draws are all the same, like a cause specific mortality rate of
+zero, are written with a single ``value`` column instead of draw columns.
+The simulation reads a ``value`` column as it would the selected draw, and
+:func:`expand_draws` broadcasts it to draws for anything that needs them.
+
+"""
+from typing import Iterable, Union
+
+import numpy as np
+import pandas as pd
+
+DRAW_COUNT = 1000
+DRAW_COLUMNS = [f'draw_{i}' for i in range(DRAW_COUNT)]
+VALUE_COLUMN = 'value'
+
+_Operand = Union['DrawBlock', pd.DataFrame, float]
+
+
+class DrawBlock:
+    """A block of draws with a demographic index and draw columns."""
+
+    def __init__(self, index: pd.Index, columns: pd.Index, values: np.ndarray):
+        if values.shape != (len(index), len(columns)):
+            raise ValueError(f'Values of shape {values.shape} do not match an index of length {len(index)} '
+                             f'and {len(columns)} columns.')
+        self.index = index
+        self.columns = columns
+        self.values = values
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame) -> 'DrawBlock':
+        """Copies a draw frame into a new block."""
+        values = np.array(data.to_numpy(dtype=np.float64), order='C')
+        return cls(data.index, data.columns, values)
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.values, index=self.index, columns=self.columns)
+
+    def copy(self) -> 'DrawBlock':
+        return DrawBlock(self.index, self.columns, self.values.copy())
+
+    def _get_values(self, other: _Operand) -> Union[np.ndarray, float]:
+        """Gets the values of the other operand, lined up with this block."""
+        if isinstance(other, pd.DataFrame):
+            index, columns, values = other.index, other.columns, other
+        elif isinstance(other, DrawBlock):
+            index, columns, values = other.index, other.columns, other.values
+        else:
+            return other
+
+        if not columns.equals(self.columns):
+            raise ValueError('Draw blocks must have the same draw columns.')
+        if index is self.index or index.equals(self.index):
+            return values.to_numpy(dtype=np.float64) if isinstance(values, pd.DataFrame) else values
+        if len(index) != len(self.index) or not index.sort_values().equals(self.index.sort_values()):
+            raise ValueError('Draw blocks must have the same index.')
+        # Same rows in a different order, so line them up once.
+        if isinstance(values, pd.DataFrame):
+            return values.reindex(self.index).to_numpy(dtype=np.float64)
+        return values[index.get_indexer(self.index)]
+
+    def __iadd__(self, other: _Operand) -> 'DrawBlock':
+        np.add(self.values, self._get_values(other), out=self.values)
+        return self
+
+    def __isub__(self, other: _Operand) -> 'DrawBlock':
+        np.subtract(self.values, self._get_values(other), out=self.values)
+        return self
+
+    def __imul__(self, other: _Operand) -> 'DrawBlock':
+        np.multiply(self.values, self._get_values(other), out=self.values)
+        return self
+
+    def __itruediv__(self, other: _Operand) -> 'DrawBlock':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(self.values, self._get_values(other), out=self.values)
+        return self
+
+    def subtract_from(self, value: float) -> 'DrawBlock':
+        """Replaces the draws with the value minus the draws, in place."""
+        np.subtract(value, self.values, out=self.values)
+        return self
+
+    def fillna(self, value: float) -> 'DrawBlock':
+        self.values[np.isnan(self.values)] = value
+        return self
+
+
+def sum_draws(data: Iterable[Union[pd.DataFrame, DrawBlock]]) -> DrawBlock:
+    """Sums draw frames or blocks into a new block."""
+    total = None
+    for item in data:
+        if total is None:
+            total = DrawBlock.from_frame(item) if isinstance(item, pd.DataFrame) else item.copy()
+        else:
+            total += item
+    if total is None:
+        raise ValueError('No draws to sum.')
+    return total
+
+
+def get_constant_draws(index: pd.Index, value: Union[float, pd.Series]) -> pd.DataFrame:
+    """Gets data with the same value in every draw, as a single value column."""
+    return pd.DataFrame({VALUE_COLUMN: value}, index=index)
+
+
+def is_constant_draws(data) -> bool:
+    return isinstance(data, pd.DataFrame) and list(data.columns) == [VALUE_COLUMN]
+
+
+def expand_draws(data, draw_columns: Iterable[str] = None):
+    """Broadcasts data written as a single value column to draw columns.
+    Anything else is returned as is."""
+    if not is_constant_draws(data):
+        return data
+    columns = pd.Index(DRAW_COLUMNS if draw_columns is None else list(draw_columns))
+    values = np.repeat(data[VALUE_COLUMN].to_numpy(dtype=np.float64)[:, np.newaxis], len(columns), axis=1)
+    return pd.DataFrame(values, index=data.index, columns=columns)
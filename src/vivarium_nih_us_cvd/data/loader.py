@@ -12,6 +12,8 @@ for an example.
 
    No logging is done here. Logging is done in vivarium inputs itself and forwarded.
 """
+from pathlib import Path
+
 import pandas as pd
 from typing import Dict, Tuple, List, Union
 
@@ -22,7 +24,9 @@ from vivarium_gbd_access import gbd
 from vivarium_inputs import globals as vi_globals, interface, utilities as vi_utils, utility_data
 from vivarium_inputs.mapping_extension import alternative_risk_factors
 from vivarium_nih_us_cvd.constants import data_keys, models
-from vivarium_nih_us_cvd.paths import HD_PROPDATA_PATH
+from vivarium_nih_us_cvd.data import auxiliary, telemetry
+from vivarium_nih_us_cvd.data.draws import DrawBlock, get_constant_draws, sum_draws
+from vivarium_nih_us_cvd.utilities import sanitize_location
 
 
 def get_measure_wrapped(entity: ModelableEntity, key: Union[str, data_keys.SourceSink], location: str) -> pd.DataFrame:
@@ -30,7 +34,9 @@ def get_measure_wrapped(entity: ModelableEntity, key: Union[str, data_keys.Sourc
     All calls to get_measure() need to have the location dropped. For the time being,
     simply use this function.
     '''
-    return interface.get_measure(entity, key, location).droplevel('location')
+    with telemetry.stage(telemetry.FETCH):
+        data = interface.get_measure(entity, key, location)
+    return data.droplevel('location')
 
 
 def get_key(val: Union[str, data_keys.SourceSink]):
@@ -45,19 +51,23 @@ def load_population_location(key: str, location: str) -> str:
 
 
 def load_population_structure(key: str, location: str) -> pd.DataFrame:
-    return interface.get_population_structure(location)
+    with telemetry.stage(telemetry.FETCH):
+        return interface.get_population_structure(location)
 
 
 def load_age_bins(key: str, location: str) -> pd.DataFrame:
-    return interface.get_age_bins()
+    with telemetry.stage(telemetry.FETCH):
+        return interface.get_age_bins()
 
 
 def load_demographic_dimensions(key: str, location: str) -> pd.DataFrame:
-    return interface.get_demographic_dimensions(location)
+    with telemetry.stage(telemetry.FETCH):
+        return interface.get_demographic_dimensions(location)
 
 
 def load_theoretical_minimum_risk_life_expectancy(key: str, location: str) -> pd.DataFrame:
-    return interface.get_theoretical_minimum_risk_life_expectancy()
+    with telemetry.stage(telemetry.FETCH):
+        return interface.get_theoretical_minimum_risk_life_expectancy()
 
 
 def load_standard_data(key: str, location: str) -> pd.DataFrame:
@@ -212,30 +222,122 @@ def get_data(lookup_key: Union[str, data_keys.SourceSink], location: str) -> pd.
     return func(lookup_key, location)
 
 
+# Measures pulled from modelable entity draws. Everything else in the draws is
+# dropped as soon as they are downloaded.
+ME_MEASURES = ['Incidence rate', 'Excess mortality rate']
+
+# Modelable entities pulled as draws by load_incidence_ihd, load_emr and
+# load_emr_ischemic_stroke.
+MEIDS = [24694, 15755, 1817, 2412, 24714, 10837]
+
+# Directory of draws prefetched for all locations, if in use.
+_ME_DRAW_STORE_DIR = None  # type: Union[Path, None]
+
+# Draws for each (meid, location), split by measure and not yet transformed.
+# A measure is removed once it has been transformed and cached below.
+_ME_DRAWS = {}  # type: Dict[Tuple[int, str], Dict[str, pd.DataFrame]]
+# Transformed data for each (meid, measure, location).
+_ME_DATA = {}  # type: Dict[Tuple[int, str, str], pd.DataFrame]
+
+
+def clear_data_caches():
+    """Drops all cached modelable entity and auxiliary data."""
+    _ME_DRAWS.clear()
+    _ME_DATA.clear()
+    auxiliary.clear_auxiliary_data_cache()
+
+
+def get_me_draw_store_path(directory: Path, meid: int) -> Path:
+    return Path(directory) / f'{meid}.hdf'
+
+
+def prefetch_me_draws(locations: List[str], directory: Path):
+    """Pulls the draws of every modelable entity for all the locations in one
+    query per entity and stores them by location for the location builds."""
+    location_names = {utility_data.get_location_id(location): location for location in locations}
+    measure_ids = [vi_globals.MEASURES[measure] for measure in ME_MEASURES]
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for meid in MEIDS:
+        # The underlying draws query accepts a list of locations.
+        with telemetry.stage(telemetry.FETCH):
+            data = gbd.get_modelable_entity_draws(meid, list(location_names))
+        data = data[data.measure_id.isin(measure_ids)]
+        path = get_me_draw_store_path(directory, meid)
+        temp_path = path.with_name(path.stem + '_tmp' + path.suffix)
+        with pd.HDFStore(str(temp_path), mode='w') as store:
+            for location_id, location_data in data.groupby('location_id'):
+                store.put(sanitize_location(location_names[location_id]), location_data, format='table')
+        temp_path.replace(path)
+
+
+def use_me_draw_store(directory: Union[Path, None]):
+    """Reads modelable entity draws prefetched to the directory, if there,
+    instead of pulling them for each location."""
+    global _ME_DRAW_STORE_DIR
+    _ME_DRAW_STORE_DIR = directory
+
+
+def _pull_me_draws(meid: int, location: str) -> pd.DataFrame:
+    if _ME_DRAW_STORE_DIR is not None:
+        path = get_me_draw_store_path(_ME_DRAW_STORE_DIR, meid)
+        if path.exists():
+            with pd.HDFStore(str(path), mode='r') as store:
+                key = f'/{sanitize_location(location)}'
+                if key in store:
+                    return store.get(key)
+    return gbd.get_modelable_entity_draws(meid, utility_data.get_location_id(location))
+
+
+def _get_me_draws(meid: int, measure: str, location: str) -> pd.DataFrame:
+    key = (meid, location)
+    if key not in _ME_DRAWS:
+        with telemetry.stage(telemetry.FETCH):
+            data = _pull_me_draws(meid, location)
+        _ME_DRAWS[key] = {m: data[data.measure_id == vi_globals.MEASURES[m]] for m in ME_MEASURES}
+    draws = _ME_DRAWS[key].pop(measure)
+    if not _ME_DRAWS[key]:
+        del _ME_DRAWS[key]
+    return draws
+
+
 def _load_em_from_meid(meid: int, measure: str, location: str):
-    location_id = utility_data.get_location_id(location)
-    data = gbd.get_modelable_entity_draws(meid, location_id)
-    data = data[data.measure_id == vi_globals.MEASURES[measure]]
-    data = vi_utils.normalize(data, fill_value=0)
-    data = data.filter(vi_globals.DEMOGRAPHIC_COLUMNS + vi_globals.DRAW_COLUMNS)
-    data = vi_utils.reshape(data)
-    data = vi_utils.scrub_gbd_conventions(data, location)
-    data = vi_utils.split_interval(data, interval_column='age', split_column_prefix='age')
-    data = vi_utils.split_interval(data, interval_column='year', split_column_prefix='year')
-    return vi_utils.sort_hierarchical_data(data).droplevel('location')
+    # Each modelable entity is downloaded once per location and each measure
+    # is transformed once. Callers get a copy, as some modify what they load.
+    key = (meid, measure, location)
+    if key not in _ME_DATA:
+        data = _get_me_draws(meid, measure, location)
+        data = vi_utils.normalize(data, fill_value=0)
+        data = data.filter(vi_globals.DEMOGRAPHIC_COLUMNS + vi_globals.DRAW_COLUMNS)
+        data = vi_utils.reshape(data)
+        data = vi_utils.scrub_gbd_conventions(data, location)
+        data = vi_utils.split_interval(data, interval_column='age', split_column_prefix='age')
+        data = vi_utils.split_interval(data, interval_column='year', split_column_prefix='year')
+        _ME_DATA[key] = vi_utils.sort_hierarchical_data(data).droplevel('location')
+    return _ME_DATA[key].copy()
 
 
 #
 # project-specific data functions here
 #
-def get_prevalence_weighted_disability_weight(seq: List[Sequela], location: str) -> List[pd.DataFrame]:
-    assert len(seq), "Empty List - get_prevalence_weighted_disability_weight()"
-    prevalence_disability_weights = []
+def get_prevalence_and_weighted_disability_weight(seq: List[Sequela], location: str) -> Tuple[DrawBlock, DrawBlock]:
+    """Gets the total prevalence and prevalence weighted disability weight of the sequelae."""
+    assert len(seq), "Empty List - get_prevalence_and_weighted_disability_weight()"
+    prevalence = weighted_disability_weight = None
     for s in seq:
-        prevalence = get_measure_wrapped(s, 'prevalence', location)
-        disability_weight = get_measure_wrapped(s, 'disability_weight', location)
-        prevalence_disability_weights.append(prevalence * disability_weight)
-    return prevalence_disability_weights
+        seq_prevalence = DrawBlock.from_frame(get_measure_wrapped(s, 'prevalence', location))
+        seq_weighted_disability_weight = seq_prevalence.copy()
+        seq_weighted_disability_weight *= get_measure_wrapped(s, 'disability_weight', location)
+        if prevalence is None:
+            prevalence, weighted_disability_weight = seq_prevalence, seq_weighted_disability_weight
+        else:
+            prevalence += seq_prevalence
+            weighted_disability_weight += seq_weighted_disability_weight
+    return prevalence, weighted_disability_weight
+
+
+def get_prevalence_weighted_disability_weight(seq: List[Sequela], location: str) -> DrawBlock:
+    return get_prevalence_and_weighted_disability_weight(seq, location)[1]
 
 
 def get_ihd_sequelae() -> Tuple[Dict[str, List[Sequela]], Dict[int, Sequela]]:
@@ -266,8 +368,8 @@ def load_prevalence_ihd(key: data_keys.SourceSink, location: str) -> pd.DataFram
 
 
 def load_prevalence(seq: List[Sequela], location: str) -> pd.DataFrame:
-    prevalence = sum(get_measure_wrapped(s, 'prevalence', location) for s in seq)
-    return prevalence
+    prevalence = sum_draws(get_measure_wrapped(s, 'prevalence', location) for s in seq)
+    return prevalence.to_frame()
 
 
 def load_incidence_ihd(key: data_keys.SourceSink, location: str) -> pd.DataFrame:
@@ -279,9 +381,10 @@ def load_incidence_ihd(key: data_keys.SourceSink, location: str) -> pd.DataFrame
         data_keys.HF_IHD.INCIDENCE.sink: (ihd_seq['heart_failure'], 2412)
     }
     seq, meid = map[key.sink]
-    prevalence = sum(get_measure_wrapped(s, 'prevalence', location) for s in seq)
-    incidence = _load_em_from_meid(meid, 'Incidence rate', location)
-    return incidence / (1 - prevalence)
+    susceptible = sum_draws(get_measure_wrapped(s, 'prevalence', location) for s in seq).subtract_from(1)
+    incidence = DrawBlock.from_frame(_load_em_from_meid(meid, 'Incidence rate', location))
+    incidence /= susceptible
+    return incidence.to_frame()
 
 
 def load_emr(key: data_keys.SourceSink, location: str) -> pd.DataFrame:
@@ -305,10 +408,11 @@ def load_csmr_angina(key: str, location: str) -> pd.DataFrame:
     # ang_seq = ihd_seq["angina"]
     # ang_csmr = sum(get_measure_wrapped(s, 'cause_specific_mortality_rate', location) for s in ang_seq)
     # return ang_csmr
-    draws = [f'draw_{i}' for i in range(1000)]
-    df_zeros = load_emr(data_keys.ANGINA.EMR, location)
-    df_zeros[draws] = 0.0
-    return df_zeros
+    #
+    # Zero in every draw, so write it without pulling anything from GBD.
+    with telemetry.stage(telemetry.FETCH):
+        index = interface.get_demographic_dimensions(location).droplevel('location').index
+    return get_constant_draws(index, 0.0)
 
 
 def load_dw_ihd(key: data_keys.SourceSink, location: str) -> pd.DataFrame:
@@ -319,9 +423,9 @@ def load_dw_ihd(key: data_keys.SourceSink, location: str) -> pd.DataFrame:
         data_keys.HF_IHD.DW.sink: "heart_failure"
     }
     seq, _ = get_ihd_sequelae()
-    term_1 = 1 / load_prevalence(seq[map[key.sink]], location)
-    term_2 = get_prevalence_weighted_disability_weight(seq[map[key.sink]], location)
-    return term_1 * sum(term_2)
+    prevalence, disability_weight = get_prevalence_and_weighted_disability_weight(seq[map[key.sink]], location)
+    disability_weight /= prevalence
+    return disability_weight.to_frame()
 
 
 def get_ischemic_stroke_sequelae() ->  Tuple[pd.DataFrame, pd.DataFrame]:
@@ -336,8 +440,8 @@ def load_prevalence_ischemic_stroke(key: str, location: str) -> pd.DataFrame:
         data_keys.ISCHEMIC_STROKE.PREVALENCE_ACUTE: acute_sequelae,
         data_keys.ISCHEMIC_STROKE.PREVALENCE_CHRONIC: chronic_sequelae
     }
-    prevalence = sum(get_measure_wrapped(s, 'prevalence', location) for s in map[key])
-    return prevalence
+    prevalence = sum_draws(get_measure_wrapped(s, 'prevalence', location) for s in map[key])
+    return prevalence.to_frame()
 
 
 def load_disability_weight_ischemic_stroke_(key: str, location: str) -> pd.DataFrame:
@@ -346,10 +450,9 @@ def load_disability_weight_ischemic_stroke_(key: str, location: str) -> pd.DataF
         data_keys.ISCHEMIC_STROKE.DW_ACUTE: acute_sequelae,
         data_keys.ISCHEMIC_STROKE.DW_CHRONIC: chronic_sequelae
     }
-    prevalence_disability_weights = get_prevalence_weighted_disability_weight(map[key], location)
-    ischemic_stroke_prevalence = get_measure_wrapped(causes.ischemic_stroke, 'prevalence', location)
-    ischemic_stroke_disability_weight = (sum(prevalence_disability_weights) / ischemic_stroke_prevalence).fillna(0)
-    return ischemic_stroke_disability_weight
+    ischemic_stroke_disability_weight = get_prevalence_weighted_disability_weight(map[key], location)
+    ischemic_stroke_disability_weight /= get_measure_wrapped(causes.ischemic_stroke, 'prevalence', location)
+    return ischemic_stroke_disability_weight.fillna(0).to_frame()
 
 
 def load_emr_ischemic_stroke(key: str, location: str) -> pd.DataFrame:
@@ -362,7 +465,7 @@ def load_emr_ischemic_stroke(key: str, location: str) -> pd.DataFrame:
 
 def load_high_risk_ldl_threshold(key: str, location: str) -> pd.DataFrame:
     pass
-    # TODO:
+    # TODO: Register the thresholds as a data.auxiliary source once available.
     # data_path = paths.LDL_C_THRESHOLD_DIR / f'{sanitize_location(location)}.hdf'
     # ldl_exposure = pd.read_hdf(data_path)
     # return ldl_exposure
@@ -413,25 +516,27 @@ def match_rr_to_cause_name(artifact: Artifact):
         data_keys.FPG.RELATIVE_RISK,
         data_keys.FPG.PAF,
     ]:
-        modify_rr_affected_entity(artifact, key, map)
+        # Artifacts built from a model specification only have the risks it uses.
+        if key in artifact:
+            modify_rr_affected_entity(artifact, key, map)
 
 
 def use_correct_fpg_name(artifact: Artifact):
-    artifact.write(data_keys.FPG.TMRED_LOCAL, artifact.load(data_keys.FPG.TMRED))
-    artifact.write(data_keys.FPG.RELATIVE_RISK_SCALAR_LOCAL, artifact.load(data_keys.FPG.RELATIVE_RISK_SCALAR))
+    for local_key, (key,) in data_keys.SPECIAL_CASE_SOURCES.items():
+        if key in artifact and local_key not in artifact:
+            artifact.write(local_key, artifact.load(key))
 
 
 def modify_hd_incidence(artifact: Artifact, location: str) -> None:
-    tmp_df = pd.read_csv(HD_PROPDATA_PATH)
+    if data_keys.HF_IHD.INCIDENCE.sink not in artifact:
+        return
+    with telemetry.stage(telemetry.FETCH):
+        df_prop_data = auxiliary.load_auxiliary_data(auxiliary.HF_PROPORTIONS, location)
     # Produces:
     #      sex_id  age_group_id sim_cause  proportion
     # 0         1             2  residual    1.000000
     # 1         1             3  residual    1.000000
     # ...
-    df_prop_data = (tmp_df.drop(['Unnamed: 0','year_start','year_end', 'location_id'], axis=1)
-            .query(f'location_name=="{location}"')
-            .drop(['location_name'], axis=1)
-            .reset_index(drop=True))
     # Remove unused ages
     df_prop_data = df_prop_data[~df_prop_data.age_group_id.isin([2,3,6,7,8,9,34,238,388])].reset_index(drop=True)
     modify_components(artifact, df_prop_data)
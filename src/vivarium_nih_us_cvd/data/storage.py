@@ -0,0 +1,156 @@
+"""Reduced precision, compressed storage of artifact tables.
+
+Draw tables are cast to a smaller float type when that changes no value by
+more than a maximum relative error, and are written with a faster
+compression library than vivarium's default.
+
+``Artifact.write`` always compresses with zlib at level 9, so tables are
+registered in the artifact's keyspace with a placeholder and then written
+the way vivarium's hdf module does. That relies on the layout of vivarium's artifact
+tables, so it is done only in :func:`_write_table`, which checks the
+vivarium version that layout was checked against.
+
+.. admonition::
+
+   Logging in this module should be done at the ``debug`` level.
+
+"""
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Tuple
+
+from loguru import logger
+import numpy as np
+import pandas as pd
+import tables
+import vivarium
+from vivarium.framework.artifact import Artifact, ArtifactException, EntityKey
+
+from vivarium_nih_us_cvd.constants import data_keys, metadata
+
+# The vivarium version whose artifact internals _write_table relies on.
+ARTIFACT_INTERNALS_VIVARIUM_VERSION = '0.10.10'
+
+
+class StorageOptions(NamedTuple):
+    """How draws are stored in reduced precision artifacts."""
+    dtype: str = metadata.ARTIFACT_DRAW_DTYPE
+    complib: str = metadata.ARTIFACT_COMPLIB
+    complevel: int = metadata.ARTIFACT_COMPLEVEL
+    max_relative_error: float = metadata.ARTIFACT_MAX_RELATIVE_ERROR
+
+
+def get_max_relative_error(data: pd.DataFrame, reduced: pd.DataFrame) -> float:
+    original = data.to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        error = np.abs(reduced.to_numpy(dtype=np.float64) - original) / np.abs(original)
+    error = error[original != 0]
+    return float(np.nanmax(error)) if error.size and not np.isnan(error).all() else 0.0
+
+
+def can_hold(data: pd.DataFrame, dtype: str) -> bool:
+    """Whether every finite, non-zero value is within the normal range of the
+    float type."""
+    values = np.abs(data.to_numpy(dtype=np.float64))
+    values = values[np.isfinite(values) & (values != 0)]
+    info = np.finfo(dtype)
+    return not values.size or (info.tiny <= values.min() and values.max() <= info.max)
+
+
+def reduce_precision(key: str, data: pd.DataFrame, storage: StorageOptions) -> Tuple[pd.DataFrame, float]:
+    """Casts the float columns of the data to the storage type, unless the key
+    is kept at full precision or the cast changes the data too much.
+
+    Returns
+    -------
+        The data to store and the maximum relative error of the cast.
+
+    """
+    columns = [c for c in data.columns if data[c].dtype == np.float64]
+    if key in data_keys.FULL_PRECISION_KEYS or not columns:
+        return data, 0.0
+    if not can_hold(data[columns], storage.dtype):
+        logger.debug(f'Keeping {key} at full precision. It has values outside the range of {storage.dtype}.')
+        return data, 0.0
+    # Vivarium raises on all floating point errors, which casts can set when
+    # values round to the edges of the storage type's range.
+    with np.errstate(under='ignore', over='ignore'):
+        reduced = data.astype({c: storage.dtype for c in columns})
+    error = get_max_relative_error(data[columns], reduced[columns])
+    if error > storage.max_relative_error:
+        logger.debug(f'Keeping {key} at full precision. Casting to {storage.dtype} has a maximum relative '
+                     f'error of {error:.2e}.')
+        return data, 0.0
+    return reduced, error
+
+
+def write_data(artifact: Artifact, key: str, data: Any, storage: StorageOptions = None):
+    """Writes data to the artifact, with reduced precision and the storage
+    compression if storage options are given."""
+    if storage is None or not isinstance(data, pd.DataFrame) or data.empty:
+        artifact.write(key, data)
+        return
+    if key in artifact:
+        raise ArtifactException(f'{key} already in artifact.')
+
+    data, error = reduce_precision(key, data, storage)
+    logger.debug(f'Writing {key} with {storage.complib} compression. '
+                 f'Maximum relative error {error:.2e}.')
+    _write_table(artifact, key, data, storage)
+
+
+def _write_table(artifact: Artifact, key: str, data: pd.DataFrame, storage: StorageOptions):
+    """Writes a non-empty table to the artifact with the storage compression."""
+    if vivarium.__version__ != ARTIFACT_INTERNALS_VIVARIUM_VERSION:
+        raise ArtifactException(f'Compressed artifact storage relies on the artifact layout of vivarium '
+                                f'{ARTIFACT_INTERNALS_VIVARIUM_VERSION}, but vivarium {vivarium.__version__} '
+                                f'is installed.')
+    # Registers the key through the artifact, then replaces its one row
+    # placeholder table with the compressed table.
+    artifact.write(key, data.iloc[:1])
+    path = EntityKey(key).path
+    with pd.HDFStore(artifact.path, complib=storage.complib, complevel=storage.complevel) as store:
+        store.put(path, data, format='table')
+        store.get_storer(path).attrs.metadata = {'is_empty': False}
+
+
+def get_table_bytes(artifact: Artifact) -> Dict[str, Tuple[str, int]]:
+    """Gets the compression library and size on disk of each table in the
+    artifact, by key."""
+    table_bytes = {}
+    with tables.open_file(artifact.path, mode='r') as file:
+        for key in artifact.keys:
+            node = file.get_node(EntityKey(key).path)
+            if isinstance(node, tables.Group):
+                table_bytes[key] = (node.table.filters.complib, node.table.size_on_disk)
+    return table_bytes
+
+
+def apply_storage_options(artifact: Artifact, storage: StorageOptions,
+                          table_bytes_before: Dict[str, Tuple[str, int]]):
+    """Rewrites tables not yet stored with the storage options, like those
+    replaced by the special case handlers since ``table_bytes_before`` was
+    taken.
+
+    HDF files never shrink when nodes are removed, so the artifact is
+    repacked by copying out its live nodes, but only when the removed tables
+    took up a large enough part of the file to be worth a full copy.
+    """
+    freed = 0
+    for key, (complib, size) in get_table_bytes(artifact).items():
+        if complib == storage.complib:
+            continue
+        data = artifact.load(key)
+        if isinstance(data, pd.DataFrame) and not data.empty:
+            logger.debug(f'Rewriting {key} with the storage options.')
+            artifact.remove(key)
+            write_data(artifact, key, data, storage)
+            # Replaced tables also left their previous version behind.
+            freed += size + table_bytes_before.get(key, (None, 0))[1]
+    artifact.clear_cache()
+
+    path = Path(artifact.path)
+    if freed > metadata.ARTIFACT_REPACK_FREED_FRACTION * path.stat().st_size:
+        logger.debug(f'Repacking {str(path)} to reclaim {freed / 1e6:.1f} MB.')
+        temp_path = path.with_name(path.stem + '_repack' + path.suffix)
+        tables.copy_file(str(path), str(temp_path), overwrite=True)
+        temp_path.replace(path)
@@ -0,0 +1,280 @@
+"""Per-key telemetry for artifact builds.
+
+Each key built is recorded with the time spent fetching its inputs,
+transforming them and writing the result, its rows and draws, the bytes it
+added to the artifact, and the change and peak in resident memory while it
+was built. Stages are exclusive, so a fetch made while transforming counts
+only as a fetch. The records are written as JSON next to the artifact and can
+be summarized across locations to size cluster requests.
+
+Peak memory is sampled from ``/proc/self/statm`` in a background thread, as
+the process's ``ru_maxrss`` only ever grows and so can't give the peak of a
+single key, or of one artifact when several are built in one process.
+Samples are periodic, so very short spikes can be missed.
+
+Telemetry is only recorded between :func:`start_build` and
+:func:`finish_build`. Outside of a build the recording functions do nothing.
+
+Run with ``python -m vivarium_nih_us_cvd.data.telemetry OUTPUT_DIR`` to
+summarize the builds in an output directory.
+
+"""
+from contextlib import contextmanager
+import json
+import os
+from pathlib import Path
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Tuple, Union
+
+from loguru import logger
+
+FETCH = 'fetch'
+TRANSFORM = 'transform'
+WRITE = 'write'
+STAGES = [FETCH, TRANSFORM, WRITE]
+
+TELEMETRY_SUFFIX = '.telemetry.json'
+SUMMARY_FILE_NAME = 'telemetry_summary.json'
+RSS_SAMPLE_SECONDS = 0.05
+
+
+def get_rss() -> int:
+    """Gets the resident memory of this process in bytes, or zero where
+    ``/proc`` is not available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class PeakRSS:
+    """Samples the resident memory of this process in a background thread
+    and tracks its peak since the last reset."""
+
+    def __init__(self, interval: float = RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self._peak = get_rss()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name='peak_rss', daemon=True)
+        self._thread.start()
+
+    def _sample(self):
+        while not self._stopped.wait(self.interval):
+            rss = get_rss()
+            with self._lock:
+                self._peak = max(self._peak, rss)
+
+    def reset(self) -> int:
+        """Gets the peak since the last reset and starts the next peak from
+        the current memory."""
+        rss = get_rss()
+        with self._lock:
+            peak = max(self._peak, rss)
+            self._peak = rss
+        return peak
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+
+def get_file_size(path: Path) -> int:
+    return path.stat().st_size if path.exists() else 0
+
+
+def get_shape(data: Any) -> Tuple[int, int]:
+    """Gets the rows and draws of data written to an artifact."""
+    columns = getattr(data, 'columns', None)
+    if columns is not None:
+        draws = len([c for c in columns if str(c).startswith('draw_')])
+        # Data written as a single value column stands in for every draw.
+        return len(data), draws if draws else int('value' in columns)
+    return (len(data) if isinstance(data, list) else 1), 0
+
+
+def get_telemetry_path(artifact_path: Path) -> Path:
+    return artifact_path.with_name(artifact_path.stem + TELEMETRY_SUFFIX)
+
+
+def get_build_memory(build: Dict[str, Any]) -> int:
+    """Estimates the memory a build needs when run in its own process: the
+    memory of the process before its first build plus what this build added
+    at its peak."""
+    return build['process_start_rss_bytes'] + build['peak_rss_bytes'] - build['start_rss_bytes']
+
+
+class BuildTelemetry:
+    """Records the keys built into one artifact."""
+
+    def __init__(self, location: str, artifact_path: Path, process_start_rss: int):
+        self.location = location
+        self.artifact_path = Path(artifact_path)
+        self.keys = []  # type: List[Dict[str, Any]]
+        self.process_start_rss = process_start_rss
+        self.start_rss = get_rss()
+        self.peak_rss = self.start_rss
+        self._rss_sampler = PeakRSS()
+        self._start = time.perf_counter()
+        self._record = None  # type: Union[Dict[str, Any], None]
+        # Each frame is the stage name and the time spent in nested stages.
+        self._stack = []  # type: List[List]
+
+    @contextmanager
+    def record_key(self, key: str):
+        record = {'key': key, 'source': None, 'rows': 0, 'draws': 0}
+        record.update({f'{stage}_seconds': 0.0 for stage in STAGES})
+        size = get_file_size(self.artifact_path)
+        self._update_peak_rss()
+        rss = get_rss()
+        self._record = record
+        try:
+            yield record
+        finally:
+            self._record = None
+            record['bytes_on_disk'] = get_file_size(self.artifact_path) - size
+            record['rss_delta_bytes'] = get_rss() - rss
+            record['peak_rss_bytes'] = self._update_peak_rss()
+            self.keys.append(record)
+
+    def _update_peak_rss(self) -> int:
+        peak = self._rss_sampler.reset()
+        self.peak_rss = max(self.peak_rss, peak)
+        return peak
+
+    @contextmanager
+    def stage(self, name: str):
+        if self._record is None:
+            yield
+            return
+        self._stack.append([name, 0.0])
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            _, nested = self._stack.pop()
+            self._record[f'{name}_seconds'] += elapsed - nested
+            if self._stack:
+                self._stack[-1][1] += elapsed
+
+    def to_dict(self) -> Dict[str, Any]:
+        self._update_peak_rss()
+        return {
+            'location': self.location,
+            'artifact': str(self.artifact_path),
+            'total_seconds': time.perf_counter() - self._start,
+            'artifact_bytes': get_file_size(self.artifact_path),
+            'process_start_rss_bytes': self.process_start_rss,
+            'start_rss_bytes': self.start_rss,
+            'peak_rss_bytes': self.peak_rss,
+            'keys': self.keys,
+        }
+
+    def write(self) -> Path:
+        path = get_telemetry_path(self.artifact_path)
+        with path.open('w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+    def stop(self):
+        self._rss_sampler.stop()
+
+
+_TELEMETRY = None  # type: Union[BuildTelemetry, None]
+# The memory of the process when its first build started.
+_PROCESS_START_RSS = None  # type: Union[int, None]
+
+
+def start_build(location: str, artifact_path: Path) -> BuildTelemetry:
+    global _TELEMETRY, _PROCESS_START_RSS
+    if _PROCESS_START_RSS is None:
+        _PROCESS_START_RSS = get_rss()
+    if _TELEMETRY is not None:
+        # The last build failed before it finished.
+        _TELEMETRY.stop()
+    _TELEMETRY = BuildTelemetry(location, artifact_path, _PROCESS_START_RSS)
+    return _TELEMETRY
+
+
+def finish_build() -> Union[Path, None]:
+    """Writes the telemetry of the current build next to its artifact."""
+    global _TELEMETRY
+    if _TELEMETRY is None:
+        return None
+    path = _TELEMETRY.write()
+    _TELEMETRY.stop()
+    _TELEMETRY = None
+    return path
+
+
+@contextmanager
+def record_key(key: str):
+    """Records a key built inside the block. Yields the record so the caller
+    can fill in the source and shape of the data."""
+    if _TELEMETRY is None:
+        yield {}
+        return
+    with _TELEMETRY.record_key(key) as record:
+        yield record
+
+
+@contextmanager
+def stage(name: str):
+    """Times the block as a stage of the key being recorded."""
+    if _TELEMETRY is None:
+        yield
+        return
+    with _TELEMETRY.stage(name):
+        yield
+
+
+def read_telemetry(output_dir: Path) -> List[Dict[str, Any]]:
+    return [json.loads(path.read_text()) for path in sorted(Path(output_dir).glob(f'*{TELEMETRY_SUFFIX}'))]
+
+
+def summarize_telemetry(output_dir: Union[str, Path]) -> Path:
+    """Summarizes the telemetry of every build in the output directory by
+    artifact and by key, and writes the summary there."""
+    output_dir = Path(output_dir)
+    builds = read_telemetry(output_dir)
+    fields = [f'{stage}_seconds' for stage in STAGES] + ['bytes_on_disk', 'rss_delta_bytes', 'peak_rss_bytes']
+
+    keys = {}  # type: Dict[str, Dict[str, List]]
+    for build in builds:
+        for record in build['keys']:
+            key = keys.setdefault(record['key'], {field: [] for field in fields + ['cells']})
+            for field in fields:
+                key[field].append(record[field])
+            key['cells'].append(record['rows'] * record['draws'])
+
+    summary = {
+        # By artifact, as the base artifact is built from one of the locations.
+        'artifacts': {
+            Path(build['artifact']).stem: dict(
+                {field: build[field] for field in
+                 ['location', 'total_seconds', 'artifact_bytes', 'peak_rss_bytes']},
+                memory_bytes=get_build_memory(build),
+            )
+            for build in builds
+        },
+        'max_total_seconds': max([build['total_seconds'] for build in builds], default=0.0),
+        'max_memory_bytes': max([get_build_memory(build) for build in builds], default=0),
+        'keys': {
+            key: {f'{stat}_{field}': func(values)
+                  for field, values in key_values.items()
+                  for stat, func in [('mean', lambda v: sum(v) / len(v)), ('max', max)]}
+            for key, key_values in keys.items()
+        },
+    }
+    path = output_dir / SUMMARY_FILE_NAME
+    with path.open('w') as f:
+        json.dump(summary, f, indent=2)
+    return path
+
+
+if __name__ == '__main__':
+    logger.info(f'Wrote build telemetry summary to {str(summarize_telemetry(sys.argv[1]))}.')
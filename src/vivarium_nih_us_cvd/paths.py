@@ -10,3 +10,4 @@ MODEL_SPEC_DIR = BASE_DIR / 'model_specifications'
 RESULTS_ROOT = Path(f'/share/costeffectiveness/results/{metadata.PROJECT_NAME}/')
 
 HD_PROPDATA_PATH = '/share/scratch/projects/cvd_gbd/cvd_re/simulation_science/hf_props_2021_08_18.csv'
+AUXILIARY_DATA_DIR = ARTIFACT_ROOT / 'auxiliary_data'
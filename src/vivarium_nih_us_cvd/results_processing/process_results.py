@@ -1,12 +1,13 @@
 import itertools
 from pathlib import Path
-from typing import NamedTuple, List
+from typing import Dict, Iterable, Iterator, NamedTuple, List, Set, Tuple, Union
 
+import numpy as np
 import pandas as pd
 from loguru import logger
 import yaml
 
-from vivarium_nih_us_cvd.constants import results
+from vivarium_nih_us_cvd.constants import models, results
 
 
 SCENARIO_COLUMN = 'scenario'
@@ -27,9 +28,29 @@ RENAME_COLUMNS = {
     'age_group': 'age',
     'cause_of_death': 'cause',
 }
+AGGREGATION_CHUNKSIZE = 1_000
+BASELINE_SCENARIO = 'baseline'
+SUMMARY_QUANTILES = {
+    'lower': 0.025,
+    'upper': 0.975,
+}
 
 
-def make_measure_data(data):
+def make_measure_data(data, risk_stratification: Dict[str, Tuple[str, ...]] = None,
+                      sparse_strata_counts: Dict[str, int] = None):
+    """Computes each measure from the data aggregated over seed.
+
+    ``sparse_strata_counts`` maps the diseases whose observers emitted sparse
+    metrics to the number of strata each tracked, as recorded by
+    :func:`read_data`.  Only their strata are filled with zeros.
+    """
+    sparse_strata_counts = sparse_strata_counts or {}
+    check_sparse_strata(data.columns, sparse_strata_counts, risk_stratification)
+    sparse_columns = set(get_sparse_columns(
+        results.RESULT_COLUMNS('state_person_time', risk_stratification)
+        + results.RESULT_COLUMNS('transition_count', risk_stratification),
+        sparse_strata_counts
+    ))
     measure_data = MeasureData(
         population=get_population_data(data),
         person_time=get_measure_data(data, 'person_time'),
@@ -37,8 +58,10 @@ def make_measure_data(data):
         ylds=get_by_cause_measure_data(data, 'ylds'),
         deaths=get_by_cause_measure_data(data, 'deaths'),
         # TODO duplicate for each model
-        state_person_time=get_state_person_time_measure_data(data, 'state_person_time'),
-        transition_count=get_transition_count_measure_data(data, 'transition_count'),
+        state_person_time=get_state_person_time_measure_data(data, 'state_person_time', risk_stratification,
+                                                             sparse_columns),
+        transition_count=get_transition_count_measure_data(data, 'transition_count', risk_stratification,
+                                                           sparse_columns),
     )
     return measure_data
 
@@ -59,11 +82,29 @@ class MeasureData(NamedTuple):
             df.to_csv(output_dir / f'{key}.csv')
 
 
-def read_data(path: Path, single_run: bool) -> (pd.DataFrame, List[str]):
-    data = pd.read_hdf(path)
+def read_data(path: Path, single_run: bool, chunksize: int = AGGREGATION_CHUNKSIZE) -> ('OutputData', Dict):
+    """Opens the output data to be streamed a row chunk at a time, along
+    with the keyspace of the runs."""
+    data = OutputData(path, single_run, chunksize)
+    sparse_schema_columns = data.columns.intersection(results.SPARSE_METRICS_SCHEMA_COLUMNS)
+    if not sparse_schema_columns.empty:
+        logger.info(f'Outputs contain sparse metrics for {sparse_schema_columns.size} observers. '
+                    f'Missing strata will be filled with zeros as measures are computed.')
+    if single_run:
+        keyspace = {results.INPUT_DRAW_COLUMN: [0],
+                    results.RANDOM_SEED_COLUMN: [0],
+                    results.OUTPUT_SCENARIO_COLUMN: ['baseline']}
+    else:
+        with (path.parent / 'keyspace.yaml').open() as f:
+            keyspace = yaml.full_load(f)
+    return data, keyspace
+
+
+def clean_data(data: pd.DataFrame, single_run: bool) -> pd.DataFrame:
+    sparse_schema_columns = data.columns.intersection(results.SPARSE_METRICS_SCHEMA_COLUMNS)
     # noinspection PyUnresolvedReferences
     data = (data
-            .drop(columns=data.columns.intersection(results.THROWAWAY_COLUMNS))
+            .drop(columns=data.columns.intersection(results.THROWAWAY_COLUMNS + list(sparse_schema_columns)))
             .reset_index(drop=True)
             .rename(columns={results.OUTPUT_SCENARIO_COLUMN: SCENARIO_COLUMN})
             )
@@ -71,44 +112,246 @@ def read_data(path: Path, single_run: bool) -> (pd.DataFrame, List[str]):
         data[results.INPUT_DRAW_COLUMN] = 0
         data[results.RANDOM_SEED_COLUMN] = 0
         data[SCENARIO_COLUMN] = 'baseline'
-        keyspace = {results.INPUT_DRAW_COLUMN: [0],
-                    results.RANDOM_SEED_COLUMN: [0],
-                    results.OUTPUT_SCENARIO_COLUMN: ['baseline']}
     else:
         data[results.INPUT_DRAW_COLUMN] = data[results.INPUT_DRAW_COLUMN].astype(int)
         data[results.RANDOM_SEED_COLUMN] = data[results.RANDOM_SEED_COLUMN].astype(int)
-        with (path.parent / 'keyspace.yaml').open() as f:
-            keyspace = yaml.full_load(f)
-    return data, keyspace
+    return data
 
 
-def filter_out_incomplete(data, keyspace):
-    output = []
+class OutputData:
+    """Output data on disk, read a row chunk at a time.
+
+    Iterating yields the cleaned row chunks of the selected rows.  Each pass
+    re-reads the file, so peak memory is a single chunk however many passes
+    are made over the data.
+
+    """
+
+    def __init__(self, path: Path, single_run: bool, chunksize: int = AGGREGATION_CHUNKSIZE,
+                 rows: np.ndarray = None):
+        self.path = Path(path)
+        self.single_run = single_run
+        self.chunksize = chunksize
+        # Mask of the selected rows of the file, or None for all of them.
+        self.rows = rows
+        with pd.HDFStore(str(self.path), mode='r') as store:
+            self._key = store.keys()[0]
+            storer = store.get_storer(self._key)
+            self._nrows = storer.nrows if storer.nrows is not None else storer.shape[0]
+            first_row = store.select(self._key, start=0, stop=1)
+        self.columns = first_row.columns
+        # Every run of an observer tracks the same strata.
+        self.sparse_strata_counts = {
+            disease: int(first_row[results.SPARSE_METRICS_SCHEMA_COLUMN_TEMPLATE.format(DISEASE=disease)].iloc[0])
+            for disease in models.STATE_MACHINE_MAP
+            if results.SPARSE_METRICS_SCHEMA_COLUMN_TEMPLATE.format(DISEASE=disease) in self.columns
+        }
+
+    def __len__(self) -> int:
+        return self._nrows if self.rows is None else int(self.rows.sum())
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        with pd.HDFStore(str(self.path), mode='r') as store:
+            for start in range(0, self._nrows, self.chunksize):
+                chunk = store.select(self._key, start=start, stop=start + self.chunksize)
+                if self.rows is not None:
+                    chunk = chunk.loc[self.rows[start:start + len(chunk)]]
+                if not chunk.empty:
+                    yield clean_data(chunk, self.single_run)
+
+    def get_runs(self) -> pd.DataFrame:
+        """Gets the input draw, random seed and scenario of each selected row."""
+        run_columns = [results.INPUT_DRAW_COLUMN, results.RANDOM_SEED_COLUMN, SCENARIO_COLUMN]
+        runs = [chunk[run_columns] for chunk in self]
+        return pd.concat(runs, ignore_index=True) if runs else pd.DataFrame(columns=run_columns)
+
+    def select(self, mask: np.ndarray) -> 'OutputData':
+        """Selects from the currently selected rows."""
+        rows = np.ones(self._nrows, dtype=bool) if self.rows is None else self.rows.copy()
+        rows[rows] = mask
+        return OutputData(self.path, self.single_run, self.chunksize, rows)
+
+
+def read_risk_stratification(path: Path) -> Dict[str, Tuple[str, ...]]:
+    """Reads the risk stratification of each disease observer from the model
+    specification written alongside the output data.  Observers without
+    one configured, or outputs without a model specification, use the
+    default stratification."""
+    model_spec_path = path.parent / 'model_specification.yaml'
+    metrics_config = {}
+    if model_spec_path.exists():
+        with model_spec_path.open() as f:
+            model_spec = yaml.full_load(f)
+        metrics_config = model_spec.get('configuration', {}).get('metrics', {})
+    risk_stratification = {}
+    for disease in models.STATE_MACHINE_MAP:
+        observer_config = metrics_config.get(f'{disease}_observer', {})
+        risk_stratification[disease] = tuple(observer_config.get('risk_stratification',
+                                                                 results.DEFAULT_RISK_STRATIFICATION))
+    return risk_stratification
+
+
+def filter_out_incomplete(data: Union[pd.DataFrame, OutputData], keyspace) -> Union[pd.DataFrame, OutputData]:
+    """Keeps, for each draw, the random seeds completed for all scenarios."""
+    if isinstance(data, OutputData):
+        return data.select(get_complete_rows(data.get_runs(), keyspace))
+    return data.loc[get_complete_rows(data, keyspace)].reset_index(drop=True)
+
+
+def get_complete_rows(runs: pd.DataFrame, keyspace) -> np.ndarray:
+    complete = np.zeros(len(runs), dtype=bool)
     for draw in keyspace[results.INPUT_DRAW_COLUMN]:
         # For each draw, gather all random seeds completed for all scenarios.
         random_seeds = set(keyspace[results.RANDOM_SEED_COLUMN])
-        draw_data = data.loc[data[results.INPUT_DRAW_COLUMN] == draw]
+        in_draw = (runs[results.INPUT_DRAW_COLUMN] == draw).to_numpy()
         for scenario in keyspace[results.OUTPUT_SCENARIO_COLUMN]:
-            seeds_in_data = draw_data.loc[data[SCENARIO_COLUMN] == scenario,
-                                          results.RANDOM_SEED_COLUMN].unique()
+            seeds_in_data = runs.loc[in_draw & (runs[SCENARIO_COLUMN] == scenario).to_numpy(),
+                                     results.RANDOM_SEED_COLUMN].unique()
             random_seeds = random_seeds.intersection(seeds_in_data)
-        draw_data = draw_data.loc[draw_data[results.RANDOM_SEED_COLUMN].isin(random_seeds)]
-        output.append(draw_data)
-    return pd.concat(output, ignore_index=True).reset_index(drop=True)
-
-
-def aggregate_over_seed(data):
+        complete |= in_draw & runs[results.RANDOM_SEED_COLUMN].isin(random_seeds).to_numpy()
+    return complete
+
+
+def aggregate_over_seed(data: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+                        dtype: np.dtype = np.float64,
+                        compensated: bool = False,
+                        chunksize: int = AGGREGATION_CHUNKSIZE,
+                        sparse_diseases: Iterable[str] = None) -> pd.DataFrame:
+    """Sums count columns over random seeds within each draw and scenario.
+
+    Parameters
+    ----------
+    data
+        Either the full output data or an iterable of row chunks of it,
+        e.g. the :class:`OutputData` from :func:`read_data`.  Every chunk
+        must have the count columns of the first.
+    dtype
+        The accumulator data type.
+    compensated
+        Whether to use Kahan compensated summation in the accumulators.
+        Recommended when accumulating in ``float32``.
+    chunksize
+        Number of rows to reduce at a time when ``data`` is a single frame.
+    sparse_diseases
+        Diseases whose observers emitted sparse metrics.  Missing values in
+        their columns are counts of zero, while missing values in any other
+        column propagate to the sums.  Defaults to the diseases recorded in
+        ``data`` if it is an :class:`OutputData`, or none.
+
+    Returns
+    -------
+        The summed count data with one row per draw and scenario.
+
+    """
+    if sparse_diseases is None:
+        sparse_diseases = getattr(data, 'sparse_strata_counts', {})
+    if isinstance(data, pd.DataFrame):
+        frame = data
+        data = (frame.iloc[start:start + chunksize] for start in range(0, len(frame), chunksize))
+
+    aggregator = None
+    for chunk in data:
+        if aggregator is None:
+            count_columns = get_count_columns(chunk)
+            aggregator = SeedAggregator(count_columns, dtype, compensated,
+                                        fill_columns=get_sparse_columns(count_columns, sparse_diseases))
+        else:
+            aggregator.check_columns(chunk)
+        aggregator.update(chunk)
+    if aggregator is None:
+        return pd.DataFrame(columns=GROUPBY_COLUMNS)
+    return aggregator.to_frame()
+
+
+def get_count_columns(data: pd.DataFrame) -> List[str]:
     non_count_columns = []
     for non_count_template in results.NON_COUNT_TEMPLATES:
         non_count_columns += results.RESULT_COLUMNS(non_count_template)
-    count_columns = [c for c in data.columns if c not in non_count_columns + GROUPBY_COLUMNS]
-
-    # non_count_data = data[non_count_columns + GROUPBY_COLUMNS].groupby(GROUPBY_COLUMNS).mean()
-    count_data = data[count_columns + GROUPBY_COLUMNS].groupby(GROUPBY_COLUMNS).sum()
-    return pd.concat([
-        count_data,
-        # non_count_data
-    ], axis=1).reset_index()
+    excluded = set(non_count_columns + GROUPBY_COLUMNS + [results.RANDOM_SEED_COLUMN])
+    return [c for c, column_dtype in data.dtypes.items()
+            if c not in excluded and pd.api.types.is_numeric_dtype(column_dtype)]
+
+
+class SeedAggregator:
+    """Accumulates count columns by (input draw, scenario) group codes.
+
+    Rows are reduced a chunk at a time directly on the numeric block, so
+    peak memory is the accumulators plus a single chunk rather than copies
+    of the full output data.
+
+    """
+
+    def __init__(self, count_columns: List[str], dtype: np.dtype = np.float64, compensated: bool = False,
+                 fill_columns: List[str] = None):
+        self.count_columns = count_columns
+        self.dtype = np.dtype(dtype)
+        self.compensated = compensated
+        # Columns where missing values are counts of zero.
+        self._fill = np.isin(count_columns, fill_columns) if fill_columns else None
+        self._group_codes = {}
+        self._sums = np.zeros((0, len(count_columns)), dtype=self.dtype)
+        self._compensation = np.zeros_like(self._sums) if compensated else None
+
+    def check_columns(self, chunk: pd.DataFrame):
+        count_columns = set(get_count_columns(chunk))
+        if count_columns != set(self.count_columns):
+            missing = set(self.count_columns).difference(count_columns)
+            extra = count_columns.difference(self.count_columns)
+            raise ValueError(f'Chunk count columns do not match those being aggregated. '
+                             f'Missing: {sorted(missing)[:10]}. Unexpected: {sorted(extra)[:10]}.')
+
+    def update(self, chunk: pd.DataFrame):
+        if chunk.empty:
+            return
+        groups = zip(chunk[results.INPUT_DRAW_COLUMN], chunk[SCENARIO_COLUMN])
+        codes = np.fromiter((self._group_codes.setdefault(group, len(self._group_codes)) for group in groups),
+                            dtype=np.intp, count=len(chunk))
+        self._reserve(len(self._group_codes))
+
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        group_codes = sorted_codes[starts]
+        block = chunk[self.count_columns].to_numpy(dtype=self.dtype)
+        if self._fill is not None:
+            # Sparse metrics are missing from runs where they were zero.
+            block[:, self._fill] = np.nan_to_num(block[:, self._fill], nan=0.0)
+
+        if self.compensated:
+            # Reduce the chunk at full precision and compensate only when
+            # folding it into the (possibly reduced precision) accumulators.
+            partial_sums = np.add.reduceat(block[order], starts, axis=0, dtype=np.float64).astype(self.dtype)
+            sums = self._sums[group_codes]
+            corrected = partial_sums - self._compensation[group_codes]
+            total = sums + corrected
+            self._compensation[group_codes] = (total - sums) - corrected
+            self._sums[group_codes] = total
+        else:
+            self._sums[group_codes] += np.add.reduceat(block[order], starts, axis=0)
+
+    def to_frame(self) -> pd.DataFrame:
+        groups = sorted(self._group_codes)
+        order = [self._group_codes[group] for group in groups]
+        count_data = pd.DataFrame(self._sums[order], columns=self.count_columns)
+        group_data = pd.DataFrame(groups, columns=GROUPBY_COLUMNS)
+        for i, column in enumerate(GROUPBY_COLUMNS):
+            count_data.insert(i, column, group_data[column].to_numpy())
+        return count_data
+
+    def _reserve(self, n_groups: int):
+        capacity = len(self._sums)
+        if n_groups <= capacity:
+            return
+        new_capacity = max(n_groups, 2 * capacity)
+        self._sums = self._grow(self._sums, new_capacity)
+        if self.compensated:
+            self._compensation = self._grow(self._compensation, new_capacity)
+
+    @staticmethod
+    def _grow(array: np.ndarray, capacity: int) -> np.ndarray:
+        grown = np.zeros((capacity, array.shape[1]), dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
 
 
 def pivot_data(data):
@@ -126,9 +369,9 @@ def sort_data(data):
     return data.reset_index(drop=True)
 
 
-def apply_results_map(data, kind):
+def apply_results_map(data, kind, risk_stratification: Dict[str, Tuple[str, ...]] = None):
     logger.info(f"Mapping {kind} data to stratifications.")
-    map_df = results.RESULTS_MAP(kind)
+    map_df = results.RESULTS_MAP(kind, risk_stratification)
     data = data.set_index('key')
     data = data.join(map_df).reset_index(drop=True)
     data = data.rename(columns=RENAME_COLUMNS)
@@ -136,17 +379,47 @@ def apply_results_map(data, kind):
     return data
 
 
+def get_sparse_columns(columns: Iterable[str], diseases: Iterable[str]) -> List[str]:
+    """Gets the columns emitted by the observers of the given diseases."""
+    prefixes = tuple([f'{state}_person_time' for disease in diseases
+                      for state in models.STATE_MACHINE_MAP[disease]['states']]
+                     + [f'{transition}_event_count' for disease in diseases
+                        for transition in models.STATE_MACHINE_MAP[disease]['transitions']])
+    return [c for c in columns if c.startswith(prefixes)] if prefixes else []
+
+
+def check_sparse_strata(columns: Iterable[str], sparse_strata_counts: Dict[str, int],
+                        risk_stratification: Dict[str, Tuple[str, ...]] = None):
+    """Checks that each sparse observer tracked at least the strata its
+    results are densified to, along with any it emitted outside them."""
+    expected_columns = (results.RESULT_COLUMNS('state_person_time', risk_stratification)
+                        + results.RESULT_COLUMNS('transition_count', risk_stratification))
+    for disease, strata_count in sparse_strata_counts.items():
+        strata = set(get_sparse_columns(expected_columns, [disease])).union(get_sparse_columns(columns, [disease]))
+        if len(strata) > strata_count:
+            raise ValueError(f'The {disease} observer tracked {strata_count} strata, but its results have '
+                             f'{len(strata)}. Check the observer configuration matches the results schema.')
+
+
+def densify(data: pd.DataFrame, columns: List[str], sparse_columns: Set[str] = frozenset()) -> pd.DataFrame:
+    """Selects result columns and the group columns from the data, filling
+    sparse metric strata that were never emitted with zeros."""
+    missing = [c for c in pd.Index(columns).difference(data.columns) if c not in sparse_columns]
+    if missing:
+        raise KeyError(f'Results are missing {len(missing)} columns, e.g. {sorted(missing)[:5]}.')
+    return data.reindex(columns=columns + GROUPBY_COLUMNS, fill_value=0.0)
+
+
 def get_population_data(data):
-    total_pop = pivot_data(data[[results.TOTAL_POPULATION_COLUMN]
-                                + results.RESULT_COLUMNS('population')
-                                + GROUPBY_COLUMNS])
+    total_pop = pivot_data(densify(data, [results.TOTAL_POPULATION_COLUMN] + results.RESULT_COLUMNS('population')))
     total_pop = total_pop.rename(columns={'key': 'measure'})
     return sort_data(total_pop)
 
 
-def get_measure_data(data, measure):
-    data = pivot_data(data[results.RESULT_COLUMNS(measure) + GROUPBY_COLUMNS])
-    data = apply_results_map(data, measure)
+def get_measure_data(data, measure, risk_stratification: Dict[str, Tuple[str, ...]] = None,
+                     sparse_columns: Set[str] = frozenset()):
+    data = pivot_data(densify(data, results.RESULT_COLUMNS(measure, risk_stratification), sparse_columns))
+    data = apply_results_map(data, measure, risk_stratification)
     return sort_data(data)
 
 
@@ -155,13 +428,132 @@ def get_by_cause_measure_data(data, measure):
     return sort_data(data)
 
 
-def get_state_person_time_measure_data(data, measure):
-    data = get_measure_data(data, measure)
+def get_state_person_time_measure_data(data, measure, risk_stratification: Dict[str, Tuple[str, ...]] = None,
+                                       sparse_columns: Set[str] = frozenset()):
+    data = get_measure_data(data, measure, risk_stratification, sparse_columns)
     return sort_data(data)
 
 
-def get_transition_count_measure_data(data, measure):
+def get_transition_count_measure_data(data, measure, risk_stratification: Dict[str, Tuple[str, ...]] = None,
+                                      sparse_columns: Set[str] = frozenset()):
     # Oops, edge case.
     data = data.drop(columns=[c for c in data.columns if 'event_count' in c and '2041' in c])
-    data = get_measure_data(data, measure)
+    data = get_measure_data(data, measure, risk_stratification, sparse_columns)
     return sort_data(data)
+
+
+def make_summary_data(measure_data: MeasureData) -> Dict[str, pd.DataFrame]:
+    """Summarizes each measure across draws, along with the differences
+    between each scenario and baseline."""
+    summary_data = {}
+    for key, data in measure_data._asdict().items():
+        logger.info(f'Summarizing {key} data over draws.')
+        summary_data[key] = summarize_over_draws(data)
+        differences = summarize_scenario_differences(data)
+        if not differences.empty:
+            summary_data[f'{key}_difference'] = differences
+    return summary_data
+
+
+def dump_summary_data(summary_data: Dict[str, pd.DataFrame], output_dir: Path):
+    for key, df in summary_data.items():
+        df.to_hdf(output_dir / f'{key}.hdf', key=key)
+        df.to_csv(output_dir / f'{key}.csv', index=False)
+
+
+def summarize_over_draws(data: pd.DataFrame) -> pd.DataFrame:
+    """Computes the mean, median and quantiles of ``value`` across input draws.
+
+    Parameters
+    ----------
+    data
+        Long-format measure data with an ``input_draw`` column and a
+        ``value`` column.  Every other column is treated as a stratum.
+
+    Returns
+    -------
+        One row per stratum with the summary statistics as columns.
+
+    """
+    strata_columns = [c for c in data.columns if c not in [results.INPUT_DRAW_COLUMN, 'value']]
+    strata, draw_matrix = get_draw_matrix(data, strata_columns)
+    return strata.join(summarize_draw_matrix(draw_matrix)).reset_index(drop=True)
+
+
+def summarize_scenario_differences(data: pd.DataFrame) -> pd.DataFrame:
+    """Summarizes the scenario minus baseline differences across input draws.
+
+    Differences are paired by draw.  :func:`filter_out_incomplete` keeps
+    only the seeds each draw completed in every scenario, so every draw
+    sums the same seeds in each scenario and the difference of the sums is
+    the sum of the differences paired by draw and seed.
+
+    Parameters
+    ----------
+    data
+        Long-format measure data with ``input_draw``, ``scenario`` and
+        ``value`` columns.
+
+    Returns
+    -------
+        One row per non-baseline scenario and stratum with the summary
+        statistics of the paired differences as columns.  Empty if there
+        are no scenarios besides baseline.
+
+    """
+    strata_columns = [c for c in data.columns
+                      if c not in [results.INPUT_DRAW_COLUMN, SCENARIO_COLUMN, 'value']]
+    scenarios = [s for s in data[SCENARIO_COLUMN].unique() if s != BASELINE_SCENARIO]
+    if not scenarios or BASELINE_SCENARIO not in set(data[SCENARIO_COLUMN]):
+        return pd.DataFrame()
+
+    strata_codes, strata = _factorize_strata(data, strata_columns)
+    draw_codes, draws = pd.factorize(data[results.INPUT_DRAW_COLUMN])
+    scenario_codes, scenario_names = pd.factorize(data[SCENARIO_COLUMN])
+    draw_cube = np.full((len(scenario_names), len(strata), len(draws)), np.nan)
+    draw_cube[scenario_codes, strata_codes, draw_codes] = data['value'].to_numpy()
+
+    baseline = draw_cube[list(scenario_names).index(BASELINE_SCENARIO)]
+    summaries = []
+    for scenario in scenarios:
+        difference = draw_cube[list(scenario_names).index(scenario)] - baseline
+        summary = strata.join(summarize_draw_matrix(difference))
+        summary.insert(len(strata_columns), SCENARIO_COLUMN, scenario)
+        summaries.append(summary)
+    return pd.concat(summaries, ignore_index=True)
+
+
+def get_draw_matrix(data: pd.DataFrame, strata_columns: List[str]) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Arranges long-format draw data as a (strata x draw) matrix.
+
+    Returns
+    -------
+        The unique strata as a data frame whose row order matches the rows
+        of the matrix, and the matrix itself.  Strata missing a draw are
+        filled with ``NaN``.
+
+    """
+    strata_codes, strata = _factorize_strata(data, strata_columns)
+    draw_codes, draws = pd.factorize(data[results.INPUT_DRAW_COLUMN])
+    draw_matrix = np.full((len(strata), len(draws)), np.nan)
+    draw_matrix[strata_codes, draw_codes] = data['value'].to_numpy()
+    return strata, draw_matrix
+
+
+def summarize_draw_matrix(draw_matrix: np.ndarray) -> pd.DataFrame:
+    summary = {
+        'mean': np.nanmean(draw_matrix, axis=1),
+        'median': np.nanmedian(draw_matrix, axis=1),
+    }
+    quantiles = np.nanquantile(draw_matrix, list(SUMMARY_QUANTILES.values()), axis=1)
+    for name, values in zip(SUMMARY_QUANTILES, quantiles):
+        summary[name] = values
+    return pd.DataFrame(summary)
+
+
+def _factorize_strata(data: pd.DataFrame, strata_columns: List[str]) -> Tuple[np.ndarray, pd.DataFrame]:
+    if not strata_columns:
+        return np.zeros(len(data), dtype=int), pd.DataFrame(index=pd.RangeIndex(1))
+    codes, strata = pd.MultiIndex.from_frame(data[strata_columns]).factorize()
+    # The factorized uniques lose the level names.
+    return codes, pd.DataFrame(list(strata), columns=strata_columns)
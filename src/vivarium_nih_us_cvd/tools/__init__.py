@@ -1,3 +1,27 @@
-from .app_logging import configure_logging_to_terminal
-from .make_artifacts import build_artifacts
-from .make_results import build_results
+import importlib
+
+# The command line entry points live in this package, so the tools are only
+# imported when first used. Otherwise every command would pay for the imports
+# of every other command.
+_TOOLS = {
+    'configure_logging_to_terminal': '.app_logging',
+    'build_artifacts': '.make_artifacts',
+    'build_results': '.make_results',
+    'run_checkpointed': '.run_checkpointed',
+    'run_paired': '.run_paired',
+    'run_sharded': '.run_sharded',
+}
+
+__all__ = list(_TOOLS)
+
+
+def __getattr__(name: str):
+    if name not in _TOOLS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    tool = getattr(importlib.import_module(_TOOLS[name], __name__), name)
+    globals()[name] = tool
+    return tool
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,104 @@
+"""Resolves which artifact keys a model specification uses.
+
+The model is set up against an existing artifact while recording every key
+its components load. Only those keys, and the keys the special case handlers
+derive them from, need to be built.
+
+.. admonition::
+
+   Logging in this module should typically be done at the ``info`` level.
+   Use your best judgement.
+
+"""
+from pathlib import Path
+from typing import List, Set, Union
+
+from loguru import logger
+import yaml
+from vivarium.framework.artifact import Artifact, ArtifactManager
+from vivarium.framework.configuration import build_model_specification
+from vivarium.framework.engine import SimulationContext
+
+from vivarium_nih_us_cvd.constants import data_keys
+
+ARTIFACT_KEYS_FILE_NAME = 'artifact_keys.yaml'
+
+
+class RecordingArtifactManager(ArtifactManager):
+    """Artifact manager that records every key loaded during setup."""
+
+    def setup(self, builder):
+        self.loaded_keys = set()
+        super().setup(builder)
+
+    def load(self, entity_key: str, **column_filters):
+        self.loaded_keys.add(entity_key)
+        return super().load(entity_key, **column_filters)
+
+
+def get_reference_artifact_path(model_specification: Union[str, Path]) -> Path:
+    """Gets the artifact the model specification runs against."""
+    return Path(build_model_specification(str(model_specification)).configuration.input_data.artifact_path)
+
+
+def get_loaded_keys(model_specification: Union[str, Path], artifact_path: Union[str, Path]) -> Set[str]:
+    """Sets up the model against the artifact and returns every key it loads."""
+    simulation = SimulationContext(
+        str(model_specification),
+        configuration={'input_data': {'artifact_path': str(artifact_path)}},
+        plugin_configuration={'required': {'data': {
+            'controller': 'vivarium_nih_us_cvd.tools.artifact_keys.RecordingArtifactManager',
+            'builder_interface': 'vivarium.framework.artifact.ArtifactInterface',
+        }}},
+    )
+    simulation.setup()
+    return simulation._data.loaded_keys
+
+
+def get_required_keys(loaded_keys: Set[str]) -> List[str]:
+    """Gets the keys to build, in artifact build order, for the loaded keys."""
+    required = set(loaded_keys)
+    for key in loaded_keys:
+        required.update(data_keys.SPECIAL_CASE_SOURCES.get(key, []))
+    return [data_keys.get_sink(key) for key_group in data_keys.MAKE_ARTIFACT_KEY_GROUPS
+            for key in key_group if data_keys.get_sink(key) in required]
+
+
+def resolve_artifact_keys(model_specification: Union[str, Path],
+                          reference_artifact: Union[str, Path] = None) -> List[str]:
+    """Resolves the keys to build for the model specification and reports
+    the keys that are built or present but not used."""
+    if reference_artifact is None:
+        reference_artifact = get_reference_artifact_path(model_specification)
+    reference_artifact = Path(reference_artifact)
+    if not reference_artifact.exists():
+        raise FileNotFoundError(f'Resolving artifact keys needs an existing artifact to set the model up against. '
+                                f'No artifact found at {str(reference_artifact)}.')
+
+    logger.info(f'Resolving the artifact keys {str(model_specification)} uses '
+                f'by setting it up against {str(reference_artifact)}.')
+    loaded_keys = get_loaded_keys(model_specification, reference_artifact)
+    required_keys = get_required_keys(loaded_keys)
+
+    skipped_keys = [data_keys.get_sink(key) for key_group in data_keys.MAKE_ARTIFACT_KEY_GROUPS
+                    for key in key_group if data_keys.get_sink(key) not in required_keys]
+    unused_keys = sorted(set(Artifact(reference_artifact).keys)
+                         .difference(required_keys, loaded_keys, [data_keys.METADATA_LOCATIONS]))
+    logger.info(f'Building {len(required_keys)} keys and skipping {len(skipped_keys)}.')
+    for key in skipped_keys:
+        logger.info(f'   - Skipping {key}')
+    if unused_keys:
+        logger.info(f'{len(unused_keys)} keys in {str(reference_artifact)} are not used by the model:')
+        for key in unused_keys:
+            logger.info(f'   - {key}')
+    return required_keys
+
+
+def write_artifact_keys(path: Path, keys: List[str]):
+    with path.open('w') as f:
+        yaml.dump(keys, f)
+
+
+def read_artifact_keys(path: Union[str, Path]) -> List[str]:
+    with Path(path).open() as f:
+        return yaml.safe_load(f)
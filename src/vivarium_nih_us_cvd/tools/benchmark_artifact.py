@@ -0,0 +1,83 @@
+"""Compares a full precision artifact with a reduced precision copy.
+
+Reports the maximum relative error of every key, the size of both files and
+the time to load every key for a single draw, as a simulation does when it
+starts up.
+
+Run with ``python -m vivarium_nih_us_cvd.tools.benchmark_artifact ARTIFACT OUTPUT_DIR``.
+"""
+import sys
+import time
+from pathlib import Path
+from typing import Tuple, Union
+
+from loguru import logger
+import numpy as np
+import pandas as pd
+from vivarium.framework.artifact import Artifact
+
+from vivarium_nih_us_cvd.data.storage import StorageOptions, get_max_relative_error, write_data
+
+KEYSPACE_KEY = 'metadata.keyspace'
+
+
+def write_reduced_copy(artifact_path: Path, output_path: Path, storage: StorageOptions) -> Path:
+    if output_path.exists():
+        output_path.unlink()
+    source = Artifact(artifact_path)
+    target = Artifact(output_path)
+    for key in source.keys:
+        if key != KEYSPACE_KEY:
+            write_data(target, key, source.load(key), storage)
+            source.clear_cache()
+    return output_path
+
+
+def get_relative_errors(reference_path: Path, reduced_path: Path) -> pd.Series:
+    reference = Artifact(reference_path)
+    reduced = Artifact(reduced_path)
+    errors = {}
+    for key in reference.keys:
+        data = reference.load(key)
+        if isinstance(data, pd.DataFrame) and not data.empty:
+            columns = [c for c in data.columns if data[c].dtype == np.float64]
+            if columns:
+                errors[key] = get_max_relative_error(data[columns], reduced.load(key)[columns])
+        reference.clear_cache()
+        reduced.clear_cache()
+    return pd.Series(errors, name='max_relative_error').sort_values(ascending=False)
+
+
+def time_startup_load(path: Path, draw: int = 0, repeats: int = 3) -> float:
+    """Times loading every key for one draw."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        artifact = Artifact(path, filter_terms=[f'draw == {draw}'])
+        for key in artifact.keys:
+            artifact.load(key)
+    return (time.perf_counter() - start) / repeats
+
+
+def benchmark_artifact(artifact_path: Union[str, Path],
+                       output_dir: Union[str, Path]) -> Tuple[pd.Series, pd.DataFrame]:
+    artifact_path = Path(artifact_path)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    storage = StorageOptions()
+    reduced_path = write_reduced_copy(artifact_path, output_dir / artifact_path.name, storage)
+
+    errors = get_relative_errors(artifact_path, reduced_path)
+    summary = pd.DataFrame([
+        {'storage': label,
+         'size_mb': path.stat().st_size / 1e6,
+         'load_seconds': time_startup_load(path)}
+        for label, path in [('float64', artifact_path), (f'{storage.dtype} {storage.complib}', reduced_path)]
+    ]).set_index('storage')
+    return errors, summary
+
+
+if __name__ == '__main__':
+    key_errors, storage_summary = benchmark_artifact(sys.argv[1], sys.argv[2])
+    with pd.option_context('display.max_rows', None):
+        logger.info(f'Maximum relative error by key:\n{key_errors}')
+    logger.info(f'Storage summary:\n{storage_summary}')
@@ -0,0 +1,58 @@
+"""Compares state table memory and per step copy time for object and
+categorical disease state columns.
+
+Run with ``python -m vivarium_nih_us_cvd.tools.benchmark_state_table``.
+"""
+import time
+
+from loguru import logger
+import numpy as np
+import pandas as pd
+
+from vivarium_nih_us_cvd.constants import models
+
+DISEASES = [
+    models.MI_MODEL_NAME,
+    models.ISCHEMIC_STROKE_MODEL_NAME,
+    models.ANGINA_MODEL_NAME,
+    models.HF_IHD_MODEL_NAME,
+]
+
+
+def make_state_table(population_size: int, categorical: bool, seed: int = 0) -> pd.DataFrame:
+    """Builds the disease and previous disease state columns of a state table."""
+    random_state = np.random.RandomState(seed)
+    columns = {}
+    for disease in DISEASES:
+        dtype = pd.CategoricalDtype(models.STATE_MACHINE_MAP[disease]['states'])
+        codes = random_state.randint(len(dtype.categories), size=population_size).astype(np.int8)
+        state = pd.Categorical.from_codes(codes, dtype=dtype)
+        columns[disease] = state if categorical else np.asarray(state, dtype=object)
+        columns[f'previous_{disease}'] = columns[disease].copy()
+    return pd.DataFrame(columns)
+
+
+def time_previous_state_copy(state_table: pd.DataFrame, repeats: int = 5) -> float:
+    """Times copying every disease column into its previous state column, as
+    the disease observers do each step."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for disease in DISEASES:
+            state_table[f'previous_{disease}'] = state_table[disease].values.copy()
+    return (time.perf_counter() - start) / repeats
+
+
+def benchmark_state_table(population_size: int = 1_000_000) -> pd.DataFrame:
+    results = []
+    for label, categorical in [('object', False), ('categorical', True)]:
+        state_table = make_state_table(population_size, categorical)
+        results.append({
+            'dtype': label,
+            'memory_mb': state_table.memory_usage(index=False, deep=True).sum() / 1e6,
+            'copy_seconds': time_previous_state_copy(state_table),
+        })
+    return pd.DataFrame(results).set_index('dtype')
+
+
+if __name__ == '__main__':
+    logger.info(f'State table benchmark:\n{benchmark_state_table()}')
@@ -1,10 +1,19 @@
+from datetime import datetime
+from typing import Tuple
+
 import click
 from loguru import logger
-from vivarium.framework.utilities import handle_exceptions
 
 from vivarium_nih_us_cvd import paths
 from vivarium_nih_us_cvd.constants import metadata
-from vivarium_nih_us_cvd.tools import build_artifacts, build_results, configure_logging_to_terminal
+from vivarium_nih_us_cvd.tools.app_logging import configure_logging_to_terminal
+from vivarium_nih_us_cvd.tools.import_profiler import profile_imports
+
+# Each command imports what it needs when it runs, so ``--help`` and the
+# lighter commands don't pay for the framework or the cluster tooling.
+profile_import_option = click.option('--profile-import', 'profile_import',
+                                     is_flag=True,
+                                     help='Log a breakdown of the time spent importing modules.')
 
 
 @click.command()
@@ -22,16 +31,38 @@ from vivarium_nih_us_cvd.tools import build_artifacts, build_results, configure_
 @click.option('-a', '--append',
               is_flag=True,
               help='Append to the artifact instead of overwriting.')
+@click.option('-s', '--model-specification',
+              default=None,
+              type=click.Path(exists=True, dir_okay=False),
+              help='Only build the keys this model specification uses.')
+@click.option('-r', '--reference-artifact',
+              default=None,
+              type=click.Path(exists=True, dir_okay=False),
+              help=('Existing artifact to resolve the keys the model specification uses against. '
+                    'Defaults to the artifact in the model specification.'))
+@click.option('--reduced-precision',
+              is_flag=True,
+              help='Store draws as float32 with blosc:zstd compression.')
+@click.option('--batch-fetch',
+              is_flag=True,
+              help='Pull modelable entity draws for all locations at once. Only used with location "all".')
 @click.option('-v', 'verbose',
               count=True,
               help='Configure logging verbosity.')
 @click.option('--pdb', 'with_debugger',
               is_flag=True,
               help='Drop into python debugger if an error occurs.')
-def make_artifacts(location: str, output_dir: str, append: bool, verbose: int, with_debugger: bool) -> None:
+@profile_import_option
+def make_artifacts(location: str, output_dir: str, append: bool, model_specification: str,
+                   reference_artifact: str, reduced_precision: bool, batch_fetch: bool, verbose: int,
+                   with_debugger: bool, profile_import: bool) -> None:
     configure_logging_to_terminal(verbose)
+    with profile_imports(profile_import):
+        from vivarium.framework.utilities import handle_exceptions
+        from vivarium_nih_us_cvd.tools.make_artifacts import build_artifacts
     main = handle_exceptions(build_artifacts, logger, with_debugger=with_debugger)
-    main(location, output_dir, append, verbose)
+    main(location, output_dir, append, verbose, model_specification, reference_artifact, reduced_precision,
+         batch_fetch)
 
 
 @click.command()
@@ -42,11 +73,187 @@ def make_artifacts(location: str, output_dir: str, append: bool, verbose: int, w
 @click.option('--pdb', 'with_debugger',
               is_flag=True,
               help='Drop into python debugger if an error occurs.')
+@profile_import_option
 @click.option('-s', '--single', 'single_run',
               default=False,
               is_flag=True,
               help='Results are from a single, non-parallel run.')
-def make_results(output_file: str, verbose: int, with_debugger: bool, single_run: bool) -> None:
+@click.option('--accumulator-dtype',
+              default='float64',
+              show_default=True,
+              type=click.Choice(['float64', 'float32']),
+              help='Data type to sum count data over seeds in. float32 halves the memory of the sums.')
+@click.option('--compensated',
+              is_flag=True,
+              help='Use compensated summation over seeds. Recommended with float32 accumulators.')
+def make_results(output_file: str, verbose: int, with_debugger: bool, profile_import: bool,
+                 single_run: bool, accumulator_dtype: str, compensated: bool) -> None:
     configure_logging_to_terminal(verbose)
+    with profile_imports(profile_import):
+        from vivarium.framework.utilities import handle_exceptions
+        from vivarium_nih_us_cvd.tools.make_results import build_results
     main = handle_exceptions(build_results, logger, with_debugger=with_debugger)
-    main(output_file, single_run)
+    main(output_file, single_run, accumulator_dtype, compensated)
+
+
+@click.command()
+@click.argument('model_specification',
+                default=str(paths.MODEL_SPEC_DIR / 'nih_us_cvd.yaml'),
+                type=click.Path(exists=True, dir_okay=False))
+@click.option('-o', '--output-dir',
+              required=True,
+              type=click.Path(file_okay=False),
+              help='Directory to write the merged outputs to.')
+@click.option('-n', '--shards',
+              default=1,
+              show_default=True,
+              type=click.IntRange(min=1),
+              help='Number of population shards to split the run into.')
+@click.option('-p', '--processes',
+              default=None,
+              type=click.IntRange(min=1),
+              help='Number of worker processes. Defaults to the number of cores.')
+@click.option('--population-size',
+              default=None,
+              type=click.IntRange(min=1),
+              help='Total population size across shards. Defaults to the model specification.')
+@click.option('--input-draw',
+              default=0,
+              show_default=True,
+              type=int,
+              help='Input draw to run.')
+@click.option('--random-seed',
+              default=0,
+              show_default=True,
+              type=int,
+              help='Random seed of the run. Each shard derives its own seed from it.')
+@click.option('--scenario',
+              default='baseline',
+              show_default=True,
+              help='Scenario to run.')
+@click.option('-v', 'verbose',
+              count=True,
+              help='Configure logging verbosity.')
+@click.option('--pdb', 'with_debugger',
+              is_flag=True,
+              help='Drop into python debugger if an error occurs.')
+@profile_import_option
+def run_sharded_simulation(model_specification: str, output_dir: str, shards: int, processes: int,
+                           population_size: int, input_draw: int, random_seed: int, scenario: str,
+                           verbose: int, with_debugger: bool, profile_import: bool) -> None:
+    configure_logging_to_terminal(verbose)
+    with profile_imports(profile_import):
+        from vivarium.framework.utilities import handle_exceptions
+        from vivarium_nih_us_cvd.tools.run_sharded import run_sharded
+    main = handle_exceptions(run_sharded, logger, with_debugger=with_debugger)
+    main(model_specification, output_dir, shards, input_draw, random_seed, scenario, population_size, processes)
+
+
+@click.command()
+@click.argument('model_specification',
+                default=str(paths.MODEL_SPEC_DIR / 'nih_us_cvd.yaml'),
+                type=click.Path(exists=True, dir_okay=False))
+@click.option('-o', '--output-dir',
+              required=True,
+              type=click.Path(file_okay=False),
+              help='Directory to write the outputs and per step divergence to.')
+@click.option('-s', '--scenario', 'scenarios',
+              multiple=True,
+              required=True,
+              help='Intervention scenario to run alongside baseline. May be given more than once.')
+@click.option('--population-size',
+              default=None,
+              type=click.IntRange(min=1),
+              help='Population size. Defaults to the model specification.')
+@click.option('--input-draw',
+              default=0,
+              show_default=True,
+              type=int,
+              help='Input draw to run.')
+@click.option('--random-seed',
+              default=0,
+              show_default=True,
+              type=int,
+              help='Random seed shared by all scenarios.')
+@click.option('--intervention-start',
+              default=None,
+              type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Date the interventions start. Steps before it are simulated only in baseline.')
+@click.option('--allow-uncaptured-state',
+              is_flag=True,
+              help='Run even if components have state that forking scenarios will not copy.')
+@click.option('-v', 'verbose',
+              count=True,
+              help='Configure logging verbosity.')
+@click.option('--pdb', 'with_debugger',
+              is_flag=True,
+              help='Drop into python debugger if an error occurs.')
+@profile_import_option
+def run_paired_simulation(model_specification: str, output_dir: str, scenarios: Tuple[str, ...],
+                          population_size: int, input_draw: int, random_seed: int, intervention_start: datetime,
+                          allow_uncaptured_state: bool, verbose: int, with_debugger: bool,
+                          profile_import: bool) -> None:
+    configure_logging_to_terminal(verbose)
+    with profile_imports(profile_import):
+        from vivarium.framework.utilities import handle_exceptions
+        from vivarium_nih_us_cvd.tools.run_paired import run_paired
+    main = handle_exceptions(run_paired, logger, with_debugger=with_debugger)
+    main(model_specification, output_dir, list(scenarios), input_draw, random_seed, population_size,
+         intervention_start, allow_uncaptured_state)
+
+
+@click.command()
+@click.argument('model_specification',
+                default=str(paths.MODEL_SPEC_DIR / 'nih_us_cvd.yaml'),
+                type=click.Path(exists=True, dir_okay=False))
+@click.option('-o', '--output-dir',
+              required=True,
+              type=click.Path(file_okay=False),
+              help='Directory to write outputs and checkpoints to.')
+@click.option('-i', '--checkpoint-interval',
+              default=12,
+              show_default=True,
+              type=click.IntRange(min=1),
+              help='Number of time steps between checkpoints.')
+@click.option('-r', '--resume',
+              is_flag=True,
+              help='Resume from the checkpoint in the output directory, if there is one.')
+@click.option('--population-size',
+              default=None,
+              type=click.IntRange(min=1),
+              help='Population size. Defaults to the model specification.')
+@click.option('--input-draw',
+              default=0,
+              show_default=True,
+              type=int,
+              help='Input draw to run.')
+@click.option('--random-seed',
+              default=0,
+              show_default=True,
+              type=int,
+              help='Random seed of the run.')
+@click.option('--scenario',
+              default='baseline',
+              show_default=True,
+              help='Scenario to run.')
+@click.option('--allow-uncaptured-state',
+              is_flag=True,
+              help='Run even if components have state that checkpoints will not save.')
+@click.option('-v', 'verbose',
+              count=True,
+              help='Configure logging verbosity.')
+@click.option('--pdb', 'with_debugger',
+              is_flag=True,
+              help='Drop into python debugger if an error occurs.')
+@profile_import_option
+def run_checkpointed_simulation(model_specification: str, output_dir: str, checkpoint_interval: int, resume: bool,
+                                population_size: int, input_draw: int, random_seed: int, scenario: str,
+                                allow_uncaptured_state: bool, verbose: int, with_debugger: bool,
+                                profile_import: bool) -> None:
+    configure_logging_to_terminal(verbose)
+    with profile_imports(profile_import):
+        from vivarium.framework.utilities import handle_exceptions
+        from vivarium_nih_us_cvd.tools.run_checkpointed import run_checkpointed
+    main = handle_exceptions(run_checkpointed, logger, with_debugger=with_debugger)
+    main(model_specification, output_dir, input_draw, random_seed, scenario, checkpoint_interval, resume,
+         population_size, allow_uncaptured_state)
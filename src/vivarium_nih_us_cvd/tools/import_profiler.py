@@ -0,0 +1,95 @@
+"""Measures how long the command line entry points spend importing modules.
+
+Every module imported for the first time while profiling is timed. Its
+cumulative time includes the modules it imports in turn and its self time
+excludes them, as with ``python -X importtime``.
+
+"""
+import builtins
+from contextlib import contextmanager
+import importlib.util
+import sys
+import time
+from typing import Dict, List
+
+from loguru import logger
+
+
+class ImportProfiler:
+    """Times first imports by wrapping ``builtins.__import__``."""
+
+    def __init__(self):
+        self.cumulative = {}  # type: Dict[str, float]
+        self.self_time = {}  # type: Dict[str, float]
+        self._stack = []  # type: List[List]
+        self._original_import = None
+
+    def __enter__(self) -> 'ImportProfiler':
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+        return self
+
+    def __exit__(self, *args):
+        builtins.__import__ = self._original_import
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        module = self._resolve_name(name, globals, level)
+        if module in sys.modules:
+            # ``from package import submodule`` loads the submodule without
+            # going through this hook.
+            module = self._get_unloaded_submodule(module, fromlist)
+        if module is None:
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        # Each frame is the module name and the time spent in its children.
+        self._stack.append([module, 0.0])
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            _, children = self._stack.pop()
+            self.cumulative[module] = self.cumulative.get(module, 0.0) + elapsed
+            self.self_time[module] = self.self_time.get(module, 0.0) + elapsed - children
+            if self._stack:
+                self._stack[-1][1] += elapsed
+
+    @staticmethod
+    def _resolve_name(name: str, globals: Dict, level: int):
+        if not level:
+            return name
+        try:
+            return importlib.util.resolve_name('.' * level + name, (globals or {}).get('__package__'))
+        except (ImportError, ValueError):
+            return None
+
+    @staticmethod
+    def _get_unloaded_submodule(package: str, fromlist):
+        for item in fromlist or ():
+            submodule = f'{package}.{item}'
+            if item != '*' and submodule not in sys.modules and item not in vars(sys.modules[package]):
+                return submodule
+        return None
+
+    @property
+    def total(self) -> float:
+        """Wall time spent importing."""
+        return sum(self.self_time.values())
+
+    def report(self, limit: int = 25):
+        logger.info(f'Imported {len(self.cumulative)} modules in {self.total:.3f}s.')
+        logger.info(f'{"cumulative (s)":>15} {"self (s)":>10}  module')
+        slowest = sorted(self.cumulative.items(), key=lambda item: item[1], reverse=True)[:limit]
+        for module, cumulative in slowest:
+            logger.info(f'{cumulative:>15.3f} {self.self_time[module]:>10.3f}  {module}')
+
+
+@contextmanager
+def profile_imports(enabled: bool = True):
+    """Logs a breakdown of the imports made inside the block, if enabled."""
+    if not enabled:
+        yield
+        return
+    with ImportProfiler() as profiler:
+        yield
+    profiler.report()
@@ -6,24 +6,26 @@
    Use your best judgement.
 
 """
-import shutil
-import sys
-import time
+import argparse
+import json
 import click
 
 from pathlib import Path
-from typing import Union
+from typing import List, Union
 from loguru import logger
 
-import vivarium_cluster_tools as vct
-
 from vivarium_nih_us_cvd.constants import data_keys, metadata
-from vivarium_nih_us_cvd.data.builder import handle_special_cases
 from vivarium_nih_us_cvd.utilities import sanitize_location, delete_if_exists, len_longest_location
-from vivarium_nih_us_cvd.tools.app_logging import add_logging_sink, decode_status
+from vivarium_nih_us_cvd.data.telemetry import get_build_memory, get_telemetry_path
+from vivarium_nih_us_cvd.tools import scheduling
+from vivarium_nih_us_cvd.tools.app_logging import add_logging_sink
+
+ME_DRAWS_DIR_NAME = 'me_draws'
 
 
 def running_from_cluster() -> bool:
+    # Local import so local builds don't pay for the cluster tooling
+    import vivarium_cluster_tools as vct
     on_cluster = True
     try:
         vct.get_cluster_name()
@@ -49,12 +51,16 @@ def check_for_existing(output_dir: Path, location: str, append: bool):
             path.unlink()
 
 
-def build_single(location: str, output_dir: str, append: bool):
+def build_single(location: str, output_dir: str, append: bool, keys: List[str] = None,
+                 reduced_precision: bool = False, me_draws_dir: Path = None):
     path = Path(output_dir) / f'{sanitize_location(location)}.hdf'
-    build_single_location_artifact(path, location)
+    build_single_location_artifact(path, location, keys=keys, reduced_precision=reduced_precision,
+                                   me_draws_dir=me_draws_dir)
 
 
-def build_artifacts(location: str, output_dir: str, append: bool, verbose: int):
+def build_artifacts(location: str, output_dir: str, append: bool, verbose: int,
+                    model_specification: str = None, reference_artifact: str = None,
+                    reduced_precision: bool = False, batch_fetch: bool = False):
     """Main application function for building artifacts.
     Parameters
     ----------
@@ -71,84 +77,147 @@ def build_artifacts(location: str, output_dir: str, append: bool, verbose: int):
         directory.  Has no effect if artifacts are not found.
     verbose
         How noisy the logger should be.
+    model_specification
+        If given, only the keys the model specification uses are built.
+    reference_artifact
+        An existing artifact to resolve the keys the model specification uses
+        against. Defaults to the artifact in the model specification.
+    reduced_precision
+        Whether to store draws at reduced precision with the project's
+        artifact compression.
+    batch_fetch
+        Whether to pull modelable entity draws for all locations at once
+        before building them. Only used when building all locations.
     """
+    import vivarium_cluster_tools as vct
     output_dir = Path(output_dir)
     vct.mkdir(output_dir, parents=True, exists_ok=True)
 
     check_for_existing(output_dir, location, append)
 
+    keys = keys_path = None
+    if model_specification is not None:
+        from vivarium_nih_us_cvd.tools.artifact_keys import (ARTIFACT_KEYS_FILE_NAME, resolve_artifact_keys,
+                                                             write_artifact_keys)
+        keys = resolve_artifact_keys(model_specification, reference_artifact)
+        keys_path = output_dir / ARTIFACT_KEYS_FILE_NAME
+        write_artifact_keys(keys_path, keys)
+
+    # Convert external inputs once here rather than in every location's build.
+    from vivarium_nih_us_cvd.data import auxiliary
+    auxiliary.build_stale_stores()
+
+    base_path = output_dir / metadata.BASE_ARTIFACT_NAME
+    if base_path.exists() and not append:
+        logger.info(f'Deleting base artifact at {str(base_path)}.')
+        base_path.unlink()
+
     if location in metadata.LOCATIONS:
-        build_single(location, output_dir, append)
+        build_base_artifact(base_path, location, keys=keys, reduced_precision=reduced_precision)
+        build_single(location, output_dir, append, keys, reduced_precision)
+        summarize_telemetry(output_dir)
     elif location == 'all':
+        me_draws_dir = output_dir / ME_DRAWS_DIR_NAME if batch_fetch else None
         if running_from_cluster():
             # parallel build when on cluster
-            build_all_artifacts(output_dir, verbose)
+            build_all_artifacts(output_dir, verbose, keys_path, reduced_precision, me_draws_dir)
         else:
             # serial build when not on cluster
+            build_base_artifact(base_path, metadata.LOCATIONS[0], keys=keys, reduced_precision=reduced_precision,
+                                me_draws_dir=me_draws_dir)
             for loc in metadata.LOCATIONS:
-                build_single(loc, output_dir, append)
+                build_single(loc, output_dir, append, keys, reduced_precision, me_draws_dir)
+            summarize_telemetry(output_dir)
     else:
         raise ValueError(f'Location must be one of {metadata.LOCATIONS} or the string "all". '
                          f'You specified {location}.')
 
 
-def build_all_artifacts(output_dir: Path, verbose: int):
+def summarize_telemetry(output_dir: Path):
+    from vivarium_nih_us_cvd.data.telemetry import summarize_telemetry as summarize
+    logger.info(f'Wrote build telemetry summary to {str(summarize(output_dir))}.')
+
+
+def build_all_artifacts(output_dir: Path, verbose: int, keys_path: Path = None, reduced_precision: bool = False,
+                        me_draws_dir: Path = None, scheduler: scheduling.Scheduler = None):
     """Builds artifacts for all locations in parallel.
+
+    Artifacts are built by job arrays grouped by memory request, sized from
+    the telemetry of their last build. Failed builds are resubmitted with
+    more memory.
+
     Parameters
     ----------
     output_dir
         The directory where the artifacts will be built.
     verbose
         How noisy the logger should be.
+    keys_path
+        A file listing the keys to build. All keys are built if not given.
+    reduced_precision
+        Whether to store draws at reduced precision.
+    me_draws_dir
+        If given, the base artifact job pulls modelable entity draws for all
+        locations into this directory and the location jobs read them there.
+    scheduler
+        The scheduler to submit the builds to. Defaults to the cluster.
     Note
     ----
         This function should not be called directly.  It is intended to be
         called by the :func:`build_artifacts` function located in the same
         module.
     """
-    from vivarium_cluster_tools.psimulate.utilities import get_drmaa
-    drmaa = get_drmaa()
-
-    jobs = {}
-    with drmaa.Session() as session:
+    def get_task(path: Path, location: str) -> scheduling.Task:
+        args = [__file__, str(path), location]
+        if keys_path is not None:
+            args += ['--keys', str(keys_path)]
+        if reduced_precision:
+            args += ['--reduced-precision']
+        if me_draws_dir is not None:
+            args += ['--me-draws', str(me_draws_dir)]
+        return scheduling.Task(name=location if path.name != metadata.BASE_ARTIFACT_NAME else 'base', args=args)
+
+    def get_resources(path: Path) -> scheduling.Resources:
+        # Size from the last build of this artifact, if there was one.
+        telemetry_path = get_telemetry_path(path)
+        if not telemetry_path.exists():
+            return scheduling.Resources()
+        build = json.loads(telemetry_path.read_text())
+        return scheduling.size_resources(get_build_memory(build), build['total_seconds'])
+
+    if scheduler is None:
+        scheduler = scheduling.DrmaaScheduler(output_dir / 'tasks')
+    with scheduler:
+        # Location jobs wait for the base artifact. If it fails they load
+        # everything themselves.
+        base_path = output_dir / metadata.BASE_ARTIFACT_NAME
+        jobs = scheduling.submit_tasks(scheduler, f'{metadata.PROJECT_NAME}_base_artifact',
+                                       [(get_task(base_path, metadata.LOCATIONS[0]), get_resources(base_path))])
+        base_job_ids = list(jobs)
+
+        location_tasks = []
         for location in metadata.LOCATIONS:
             path = output_dir / f'{sanitize_location(location)}.hdf'
-
-            job_template = session.createJobTemplate()
-            job_template.remoteCommand = shutil.which("python")
-            job_template.args = [__file__, str(path), f'"{location}"']
-            job_template.nativeSpecification = (f'-V '  # Export all environment variables
-                                                f'-b y '  # Command is a binary (python)
-                                                f'-P {metadata.CLUSTER_PROJECT} '  
-                                                f'-q {metadata.CLUSTER_QUEUE} '  
-                                                f'-l fmem={metadata.MAKE_ARTIFACT_MEM} '
-                                                f'-l fthread={metadata.MAKE_ARTIFACT_CPU} '
-                                                f'-l h_rt={metadata.MAKE_ARTIFACT_RUNTIME} '
-                                                f'-l archive=TRUE '  # Need J-drive access for data
-                                                f'-N {sanitize_location(location)}_artifact')  # Name of the job
-            jobs[location] = (session.runJob(job_template), drmaa.JobState.UNDETERMINED)
-            logger.info(f'Submitted job {jobs[location][0]} to build artifact for {location}.')
-            session.deleteJobTemplate(job_template)
+            location_tasks.append((get_task(path, location), get_resources(path)))
+        jobs.update(scheduling.submit_tasks(scheduler, f'{metadata.PROJECT_NAME}_artifacts',
+                                            location_tasks, hold_job_ids=base_job_ids))
 
         if verbose:
-            logger.info('Entering monitoring loop.')
-            logger.info('-------------------------')
+            logger.info('Waiting for jobs.')
+            logger.info('-----------------')
             logger.info('')
+        failed = scheduling.wait_for_tasks(scheduler, f'{metadata.PROJECT_NAME}_artifacts', jobs)
 
-            while any([job[1] not in [drmaa.JobState.DONE, drmaa.JobState.FAILED] for job in jobs.values()]):
-                for location, (job_id, status) in jobs.items():
-                    jobs[location] = (job_id, session.jobStatus(job_id))
-                    logger.info(f'{location:<35}: {decode_status(drmaa, jobs[location][1]):>15}')
-                logger.info('')
-                time.sleep(metadata.MAKE_ARTIFACT_SLEEP)
-                logger.info('Checking status again')
-                logger.info('---------------------')
-                logger.info('')
-
+    if failed:
+        logger.warning(f'Failed to build {[task.name for task in failed]}. '
+                       f'See the logs in {str(output_dir / "logs")}.')
+    summarize_telemetry(output_dir)
     logger.info('**Done**')
 
 
-def build_single_location_artifact(path: Union[str, Path], location: str, log_to_file: bool = False):
+def build_single_location_artifact(path: Union[str, Path], location: str, log_to_file: bool = False,
+                                   keys: List[str] = None, reduced_precision: bool = False,
+                                   me_draws_dir: Path = None):
     """Builds an artifact for a single location.
     Parameters
     ----------
@@ -159,6 +228,12 @@ def build_single_location_artifact(path: Union[str, Path], location: str, log_to
         specified in the project globals.
     log_to_file
         Whether we should write the application logs to a file.
+    keys
+        The keys to build. All keys are built if not given.
+    reduced_precision
+        Whether to store draws at reduced precision.
+    me_draws_dir
+        A directory of modelable entity draws prefetched for all locations.
     Note
     ----
         This function should not be called directly.  It is intended to be
@@ -177,21 +252,93 @@ def build_single_location_artifact(path: Union[str, Path], location: str, log_to
     from vivarium_nih_us_cvd.data import builder
 
     logger.info(f'Building artifact for {location} at {str(path)}.')
+    storage = builder.StorageOptions() if reduced_precision else None
+    builder.use_me_draw_store(me_draws_dir)
+    builder.start_telemetry(location, path)
     artifact = builder.open_artifact(path, location)
+    base_artifact = builder.open_base_artifact(path.parent)
+    if base_artifact is not None:
+        logger.info(f'Copying location invariant data from {base_artifact.path}.')
 
     for key_group in data_keys.MAKE_ARTIFACT_KEY_GROUPS:
         logger.info(f'Loading and writing {key_group.log_name} data')
         for key in key_group:
+            if keys is not None and data_keys.get_sink(key) not in keys:
+                continue
             logger.info(f'   - Loading and writing {key} data')
-            builder.load_and_write_data(artifact, key, location)
+            builder.load_and_write_data(artifact, key, location, base_artifact, storage)
             
     logger.info(f'Running special case handler... -- {location}')
-    handle_special_cases(artifact, location)
+    builder.handle_special_cases(artifact, location, storage)
+    builder.clear_data_caches()
+    builder.finish_telemetry()
 
     logger.info(f'**Done building -- {location}**')
 
 
+def build_base_artifact(path: Union[str, Path], location: str, log_to_file: bool = False,
+                        keys: List[str] = None, reduced_precision: bool = False, me_draws_dir: Path = None):
+    """Builds the base artifact of location invariant data.
+    Parameters
+    ----------
+    path
+        The full path to the base artifact to build.
+    location
+        Any location specified in the project globals, used to pull the data.
+    log_to_file
+        Whether we should write the application logs to a file.
+    keys
+        The keys to build. All location invariant keys are built if not given.
+    reduced_precision
+        Whether to store draws at reduced precision.
+    me_draws_dir
+        If given, modelable entity draws for all locations are pulled into
+        this directory for the location builds.
+    Note
+    ----
+        This function should not be called directly.  It is intended to be
+        called by the :func:`build_artifacts` function located in the same
+        module.
+    """
+    location = location.strip('"')
+    path = Path(path)
+    if log_to_file:
+        log_file = path.parent / 'logs' / f'{path.stem}.log'
+        if log_file.exists():
+            log_file.unlink()
+        add_logging_sink(log_file, verbose=2)
+
+    # Local import to avoid data dependencies
+    from vivarium_nih_us_cvd.data import builder
+
+    logger.info(f'Building base artifact at {str(path)} from {location} data.')
+    storage = builder.StorageOptions() if reduced_precision else None
+    builder.start_telemetry(location, path)
+    builder.build_base_artifact(path, location, keys, storage)
+    builder.clear_data_caches()
+    if me_draws_dir is not None:
+        logger.info(f'Prefetching modelable entity draws for all locations to {str(me_draws_dir)}.')
+        builder.prefetch_me_draws(metadata.LOCATIONS, Path(me_draws_dir))
+    builder.finish_telemetry()
+    logger.info('**Done building base artifact**')
+
+
 if __name__ == "__main__":
-    artifact_path = sys.argv[1]
-    artifact_location = sys.argv[2]
-    build_single_location_artifact(artifact_path, artifact_location, log_to_file=True)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('path')
+    parser.add_argument('location')
+    parser.add_argument('--keys', default=None)
+    parser.add_argument('--reduced-precision', action='store_true')
+    parser.add_argument('--me-draws', default=None)
+    args = parser.parse_args()
+
+    artifact_keys = None
+    if args.keys is not None:
+        from vivarium_nih_us_cvd.tools.artifact_keys import read_artifact_keys
+        artifact_keys = read_artifact_keys(args.keys)
+    if Path(args.path).name == metadata.BASE_ARTIFACT_NAME:
+        build_base_artifact(args.path, args.location, log_to_file=True, keys=artifact_keys,
+                            reduced_precision=args.reduced_precision, me_draws_dir=args.me_draws)
+    else:
+        build_single_location_artifact(args.path, args.location, log_to_file=True, keys=artifact_keys,
+                                       reduced_precision=args.reduced_precision, me_draws_dir=args.me_draws)
@@ -6,23 +6,32 @@ from loguru import logger
 from vivarium_nih_us_cvd.results_processing import process_results
 
 
-def build_results(output_file: str, single_run: bool):
+def build_results(output_file: str, single_run: bool, accumulator_dtype: str = 'float64',
+                  compensated: bool = False):
     output_file = Path(output_file)
     measure_dir = output_file.parent / 'count_data'
-    if measure_dir.exists():
-        shutil.rmtree(measure_dir)
-    measure_dir.mkdir(exist_ok=True, mode=0o775)
+    summary_dir = output_file.parent / 'summary_data'
+    for output_dir in [measure_dir, summary_dir]:
+        if output_dir.exists():
+            shutil.rmtree(output_dir)
+        output_dir.mkdir(exist_ok=True, mode=0o775)
 
-    logger.info(f'Reading in output data from {str(output_file)}.')
+    logger.info(f'Streaming output data from {str(output_file)}.')
     data, keyspace = process_results.read_data(output_file, single_run)
+    sparse_strata_counts = data.sparse_strata_counts
     logger.info(f'Filtering incomplete data from outputs.')
     rows = len(data)
     data = process_results.filter_out_incomplete(data, keyspace)
     new_rows = len(data)
     logger.info(f'Filtered {rows - new_rows} from data due to incomplete information.  {new_rows} remaining.')
-    data = process_results.aggregate_over_seed(data)
+    data = process_results.aggregate_over_seed(data, accumulator_dtype, compensated)
     logger.info(f'Computing raw count and proportion data.')
-    measure_data = process_results.make_measure_data(data)
+    risk_stratification = process_results.read_risk_stratification(output_file)
+    measure_data = process_results.make_measure_data(data, risk_stratification, sparse_strata_counts)
     logger.info(f'Writing raw count and proportion data to {str(measure_dir)}')
     measure_data.dump(measure_dir)
+    logger.info('Summarizing count data over draws.')
+    summary_data = process_results.make_summary_data(measure_data)
+    logger.info(f'Writing summary data to {str(summary_dir)}')
+    process_results.dump_summary_data(summary_data, summary_dir)
     logger.info('**DONE**')
@@ -0,0 +1,90 @@
+"""Runs a simulation with periodic checkpoints and resumes from the latest one.
+
+A checkpoint holds the simulation state described in
+:mod:`vivarium_nih_us_cvd.tools.simulation`, so resuming from one gives the
+same metrics as an uninterrupted run. Components with mutable state that a
+checkpoint would not save are an error unless the caller allows them.
+
+.. admonition::
+
+   Logging in this module should typically be done at the ``info`` level.
+   Use your best judgement.
+
+"""
+import gzip
+from pathlib import Path
+import pickle
+from typing import Dict, Union
+
+from loguru import logger
+from vivarium.framework.engine import SimulationContext
+
+from vivarium_nih_us_cvd.tools.simulation import (build_simulation, check_uncaptured_state, get_output_row,
+                                                  get_run_configuration, get_simulation_state,
+                                                  set_simulation_state, write_outputs)
+
+CHECKPOINT_VERSION = 2
+CHECKPOINT_FILE_NAME = 'checkpoint.pkl.gz'
+
+
+def save_checkpoint(simulation: SimulationContext, path: Path, run: Dict, step: int):
+    checkpoint = {
+        'version': CHECKPOINT_VERSION,
+        'run': run,
+        'step': step,
+        'simulation': get_simulation_state(simulation),
+    }
+    # Write then rename so a job preempted mid write keeps its last checkpoint.
+    temp_path = path.with_name(path.name + '.tmp')
+    with gzip.open(temp_path, 'wb') as f:
+        pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+    temp_path.replace(path)
+
+
+def load_checkpoint(simulation: SimulationContext, path: Path, run: Dict) -> int:
+    """Restores a checkpoint into a set up and initialized simulation and
+    returns the number of steps already taken."""
+    with gzip.open(path, 'rb') as f:
+        checkpoint = pickle.load(f)
+    if checkpoint['version'] != CHECKPOINT_VERSION:
+        raise ValueError(f'Checkpoint version {checkpoint["version"]} is not supported.')
+    if checkpoint['run'] != run:
+        raise ValueError(f'Checkpoint is for run {checkpoint["run"]}, not {run}.')
+
+    set_simulation_state(simulation, checkpoint['simulation'])
+    return checkpoint['step']
+
+
+def run_checkpointed(model_specification: Union[str, Path], output_dir: Union[str, Path], input_draw: int,
+                     random_seed: int, scenario: str, checkpoint_interval: int, resume: bool,
+                     population_size: int = None, allow_uncaptured_state: bool = False):
+    """Runs a simulation, checkpointing every ``checkpoint_interval`` steps
+    to the output directory, optionally resuming from a checkpoint there."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint_path = output_dir / CHECKPOINT_FILE_NAME
+    run = {'input_draw': input_draw, 'random_seed': random_seed,
+           'scenario': scenario, 'population_size': population_size}
+
+    configuration = get_run_configuration(input_draw, random_seed, scenario, population_size)
+    simulation = build_simulation(model_specification, configuration)
+    check_uncaptured_state(simulation, allow_uncaptured_state)
+    step = 0
+    if resume and checkpoint_path.exists():
+        step = load_checkpoint(simulation, checkpoint_path, run)
+        logger.info(f'Resumed from checkpoint at step {step}, {simulation._clock.time}.')
+    elif resume:
+        logger.info(f'No checkpoint found at {str(checkpoint_path)}. Starting from the beginning.')
+
+    clock = simulation._clock
+    while clock.time < clock.stop_time:
+        simulation.step()
+        step += 1
+        if step % checkpoint_interval == 0:
+            save_checkpoint(simulation, checkpoint_path, run, step)
+            logger.info(f'Checkpointed step {step}.')
+
+    simulation.finalize()
+    metrics = simulation.report(print_results=False)
+    write_outputs(output_dir, model_specification, [get_output_row(metrics, input_draw, random_seed, scenario)])
+    logger.info(f'Wrote outputs to {str(output_dir)}.')
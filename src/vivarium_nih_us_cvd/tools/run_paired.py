@@ -0,0 +1,117 @@
+"""Runs baseline and intervention scenarios in lockstep for paired comparisons.
+
+The population is initialized once, in baseline. Steps before the
+interventions start are also simulated once, in baseline. Each intervention
+scenario is then set up with its own components and forked from the
+baseline state, as described in :mod:`vivarium_nih_us_cvd.tools.simulation`.
+All scenarios share the draw and random seed, and so common random numbers,
+so scenario differences come only from where an intervention alters state.
+Each step records how many simulants have diverged from baseline.
+
+A scenario whose components create state table columns baseline doesn't
+have initializes its own population so those columns are filled in, and the
+columns it shares with baseline are then forked from baseline. Its columns
+are initialized from the starting population, so such a scenario must fork
+when the population is initialized.
+
+.. admonition::
+
+   Logging in this module should typically be done at the ``info`` level.
+   Use your best judgement.
+
+"""
+from pathlib import Path
+from typing import Dict, List, Union
+
+import pandas as pd
+from loguru import logger
+from vivarium.framework.engine import SimulationContext
+
+from vivarium_nih_us_cvd.constants import models
+from vivarium_nih_us_cvd.results_processing.process_results import BASELINE_SCENARIO
+from vivarium_nih_us_cvd.tools.simulation import (build_simulation, check_uncaptured_state, get_created_columns,
+                                                  get_output_row, get_run_configuration, get_simulation_state,
+                                                  set_simulation_state, write_outputs)
+
+DIVERGENCE_COLUMNS = ['alive'] + list(models.STATE_MACHINE_MAP)
+
+
+def fork_scenario(model_specification: Union[str, Path], configuration: Dict,
+                  baseline_state: Dict) -> SimulationContext:
+    """Sets up a scenario and forks it from the baseline state, initializing
+    only the columns baseline doesn't have."""
+    simulation = SimulationContext(str(model_specification), configuration=configuration)
+    simulation.setup()
+    baseline_population = baseline_state['population']
+    added_columns = [c for c in get_created_columns(simulation) if c not in baseline_population]
+    if added_columns:
+        if simulation._clock.time != baseline_state['time']:
+            raise ValueError(f'Scenario {configuration["branch_name"]["scenario"]} creates columns '
+                             f'{added_columns} that baseline does not have, so it must fork when the '
+                             f'population is initialized.')
+        simulation.initialize_simulants()
+        population = simulation.get_population(untracked=True)[added_columns]
+        baseline_state = dict(baseline_state, population=pd.concat([baseline_population, population], axis=1))
+    set_simulation_state(simulation, baseline_state)
+    return simulation
+
+
+def get_divergence(baseline: pd.DataFrame, scenario: pd.DataFrame) -> int:
+    """Counts simulants whose alive status or any disease state differs."""
+    columns = baseline.columns.intersection(scenario.columns).intersection(DIVERGENCE_COLUMNS)
+    return int((baseline[columns] != scenario[columns]).any(axis=1).sum())
+
+
+def run_paired(model_specification: Union[str, Path], output_dir: Union[str, Path], scenarios: List[str],
+               input_draw: int, random_seed: int, population_size: int = None,
+               intervention_start: pd.Timestamp = None, allow_uncaptured_state: bool = False):
+    """Runs the baseline and each intervention scenario in lockstep from one
+    population and writes their outputs along with the per step divergence
+    from baseline.
+
+    Steps before ``intervention_start`` are simulated only in baseline, and
+    every scenario is forked from baseline when they are done.
+    """
+    scenarios = [BASELINE_SCENARIO] + [s for s in scenarios if s != BASELINE_SCENARIO]
+    logger.info(f'Building baseline simulation for scenarios {scenarios}.')
+    baseline = build_simulation(model_specification,
+                                get_run_configuration(input_draw, random_seed, BASELINE_SCENARIO, population_size))
+    check_uncaptured_state(baseline, allow_uncaptured_state)
+
+    clock = baseline._clock
+    if intervention_start is not None:
+        while clock.time < min(pd.Timestamp(intervention_start), clock.stop_time):
+            baseline.step()
+        logger.info(f'Simulated baseline to {clock.time}, where the interventions start.')
+
+    baseline_state = get_simulation_state(baseline)
+    simulations = {BASELINE_SCENARIO: baseline}  # type: Dict[str, SimulationContext]
+    for scenario in scenarios[1:]:
+        logger.info(f'Forking scenario {scenario} from baseline.')
+        configuration = get_run_configuration(input_draw, random_seed, scenario, population_size)
+        simulations[scenario] = fork_scenario(model_specification, configuration, baseline_state)
+        check_uncaptured_state(simulations[scenario], allow_uncaptured_state)
+    del baseline_state
+
+    divergence = []
+    while clock.time < clock.stop_time:
+        step_time = clock.time
+        for simulation in simulations.values():
+            simulation.step()
+        baseline_pop = baseline.get_population()
+        divergence.append({
+            'time': step_time,
+            **{scenario: get_divergence(baseline_pop, simulations[scenario].get_population())
+               for scenario in scenarios[1:]},
+        })
+        logger.info(f'Step {step_time} divergence: {divergence[-1]}')
+
+    rows = []
+    for scenario, simulation in simulations.items():
+        simulation.finalize()
+        rows.append(get_output_row(simulation.report(print_results=False), input_draw, random_seed, scenario))
+    write_outputs(output_dir, model_specification, rows)
+    pd.DataFrame(divergence, columns=['time'] + scenarios[1:]).set_index('time').to_csv(
+        Path(output_dir) / 'divergence.csv'
+    )
+    logger.info(f'Wrote paired outputs to {str(output_dir)}.')
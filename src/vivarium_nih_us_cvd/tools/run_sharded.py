@@ -0,0 +1,86 @@
+"""Runs a single (draw, seed, scenario) simulation split into population
+shards across processes.
+
+Each shard simulates an equal part of the population with its own random
+seed and the same draw and scenario. Shards share no simulants, so the sum
+of their metrics is a run of the full population.
+
+.. admonition::
+
+   Logging in this module should typically be done at the ``info`` level.
+   Use your best judgement.
+
+"""
+from concurrent.futures import ProcessPoolExecutor
+import math
+from pathlib import Path
+from typing import Dict, List, Union
+
+from loguru import logger
+
+from vivarium_nih_us_cvd.constants import results
+from vivarium_nih_us_cvd.tools.simulation import (build_simulation, get_output_row, get_population_size,
+                                                  get_run_configuration, write_outputs)
+
+
+def get_shard_sizes(population_size: int, shards: int) -> List[int]:
+    """Splits the population into shards whose sizes differ by at most one."""
+    size, remainder = divmod(population_size, shards)
+    return [size + (shard < remainder) for shard in range(shards)]
+
+
+def get_shard_seed(random_seed: int, shard: int, shards: int) -> int:
+    """Gets a distinct random seed for each (random seed, shard) pair."""
+    return random_seed * shards + shard
+
+
+def run_shard(model_specification: str, configuration: Dict) -> Dict[str, float]:
+    simulation = build_simulation(model_specification, configuration)
+    simulation.run()
+    simulation.finalize()
+    return simulation.report(print_results=False)
+
+
+def merge_metrics(shard_metrics: List[Dict[str, float]]) -> Dict[str, float]:
+    """Sums shard metrics key by key.
+
+    Sums are exactly rounded, so the merge does not depend on shard order.
+    Sparse metrics schema columns describe the observers rather than count
+    anything and are taken as is.
+    """
+    values = {}
+    for metrics in shard_metrics:
+        for key, value in metrics.items():
+            values.setdefault(key, []).append(value)
+
+    merged = {}
+    for key, key_values in values.items():
+        if key in results.SPARSE_METRICS_SCHEMA_COLUMNS:
+            merged[key] = max(key_values)
+        else:
+            merged[key] = math.fsum(key_values)
+    return merged
+
+
+def run_sharded(model_specification: Union[str, Path], output_dir: Union[str, Path], shards: int,
+                input_draw: int, random_seed: int, scenario: str, population_size: int = None,
+                processes: int = None):
+    """Runs one simulation as population shards in parallel processes and
+    writes the merged metrics as a single ``psimulate`` style output row."""
+    if population_size is None:
+        population_size = get_population_size(model_specification)
+    shard_sizes = get_shard_sizes(population_size, shards)
+    logger.info(f'Running {population_size} simulants as {shards} shards of sizes {shard_sizes}.')
+
+    configurations = [
+        get_run_configuration(input_draw, get_shard_seed(random_seed, shard, shards), scenario, shard_size)
+        for shard, shard_size in enumerate(shard_sizes)
+    ]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        shard_metrics = list(executor.map(run_shard, [str(model_specification)] * shards, configurations))
+
+    logger.info('Merging shard metrics.')
+    metrics = merge_metrics(shard_metrics)
+    write_outputs(output_dir, model_specification, [get_output_row(metrics, input_draw, random_seed, scenario)])
+    logger.info(f'Wrote merged outputs to {str(output_dir)}.')
+
@@ -0,0 +1,261 @@
+"""Submits build tasks to a job scheduler.
+
+Tasks with the same resource request are submitted together as a job array.
+Each task of an array runs ``python -m vivarium_nih_us_cvd.tools.scheduling
+TASK_FILE``, which looks its command up in the task file by the array task id.
+Failed tasks are resubmitted a memory tier up.
+
+:class:`DrmaaScheduler` submits to the cluster. :class:`LocalScheduler` runs
+the tasks one after another as local processes, so the submission logic can
+be run off the cluster.
+
+.. admonition::
+
+   Logging in this module should typically be done at the ``info`` level.
+   Use your best judgement.
+
+"""
+import abc
+import json
+import math
+import os
+from pathlib import Path
+import shutil
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple, Tuple
+
+from loguru import logger
+
+from vivarium_nih_us_cvd.constants import metadata
+
+TASK_ID_VARIABLE = 'SGE_TASK_ID'
+_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+class Resources(NamedTuple):
+    memory: str = metadata.MAKE_ARTIFACT_MEM
+    runtime: str = metadata.MAKE_ARTIFACT_RUNTIME
+    cpu: str = metadata.MAKE_ARTIFACT_CPU
+
+
+class Task(NamedTuple):
+    name: str
+    # Arguments to the python interpreter.
+    args: List[str]
+
+
+def parse_memory(memory: str) -> int:
+    """Converts a memory request like ``10G`` to bytes."""
+    unit = memory[-1].upper()
+    if unit in _UNITS:
+        return int(float(memory[:-1]) * _UNITS[unit])
+    return int(memory)
+
+
+def parse_runtime(runtime: str) -> int:
+    hours, minutes, seconds = (int(part) for part in runtime.split(':'))
+    return 3600 * hours + 60 * minutes + seconds
+
+
+def format_runtime(seconds: float) -> str:
+    seconds = int(math.ceil(seconds))
+    return f'{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}'
+
+
+def size_resources(memory_bytes: int, total_seconds: float) -> Resources:
+    """Sizes a request from the memory and run time of a previous run."""
+    needed = memory_bytes * metadata.MAKE_ARTIFACT_MEM_HEADROOM
+    tiers = metadata.MAKE_ARTIFACT_MEM_TIERS
+    memory = next((tier for tier in tiers if parse_memory(tier) >= needed), tiers[-1])
+    runtime = max(total_seconds * metadata.MAKE_ARTIFACT_RUNTIME_HEADROOM,
+                  metadata.MAKE_ARTIFACT_MIN_RUNTIME_SECONDS)
+    return Resources(memory=memory, runtime=format_runtime(runtime))
+
+
+def escalate(resources: Resources) -> Resources:
+    """Gets the request for a retry, a memory tier up and with at least the
+    default run time."""
+    memory = parse_memory(resources.memory)
+    tiers = metadata.MAKE_ARTIFACT_MEM_TIERS
+    next_memory = next((tier for tier in tiers if parse_memory(tier) > memory), resources.memory)
+    runtime = max(parse_runtime(resources.runtime), parse_runtime(metadata.MAKE_ARTIFACT_RUNTIME))
+    return resources._replace(memory=next_memory, runtime=format_runtime(runtime))
+
+
+class Scheduler(abc.ABC):
+    """Interface to a job scheduler. Use as a context manager."""
+
+    def __init__(self, task_dir: Path):
+        self.task_dir = Path(task_dir)
+
+    def __enter__(self) -> 'Scheduler':
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def write_task_file(self, job_name: str, tasks: List[Task]) -> Path:
+        self.task_dir.mkdir(parents=True, exist_ok=True)
+        path = self.task_dir / f'{job_name}.json'
+        with path.open('w') as f:
+            json.dump([task._asdict() for task in tasks], f, indent=2)
+        return path
+
+    @abc.abstractmethod
+    def submit_array(self, job_name: str, tasks: List[Task], resources: Resources,
+                     hold_job_ids: List[str] = None) -> List[str]:
+        """Submits the tasks as one job array, held until the given jobs
+        finish, and returns the job id of each task."""
+        pass
+
+    @abc.abstractmethod
+    def wait(self, job_ids: List[str]) -> Dict[str, bool]:
+        """Waits for the jobs to finish and returns whether each succeeded."""
+        pass
+
+
+class DrmaaScheduler(Scheduler):
+    """Submits to the cluster through drmaa."""
+
+    def __init__(self, task_dir: Path):
+        super().__init__(task_dir)
+        from vivarium_cluster_tools.psimulate.utilities import get_drmaa
+        self._drmaa = get_drmaa()
+        self._session = None
+
+    def __enter__(self) -> 'DrmaaScheduler':
+        self._session = self._drmaa.Session()
+        self._session.initialize()
+        return self
+
+    def __exit__(self, *args):
+        self._session.exit()
+        self._session = None
+
+    def submit_array(self, job_name: str, tasks: List[Task], resources: Resources,
+                     hold_job_ids: List[str] = None) -> List[str]:
+        task_file = self.write_task_file(job_name, tasks)
+        # Task ids look like JOB.TASK, and holds are on whole jobs.
+        holds = sorted({job_id.split('.')[0] for job_id in hold_job_ids or []})
+        job_template = self._session.createJobTemplate()
+        job_template.remoteCommand = shutil.which("python")
+        job_template.args = ['-m', __name__, str(task_file)]
+        job_template.nativeSpecification = (f'-V '  # Export all environment variables
+                                            f'-b y '  # Command is a binary (python)
+                                            f'-P {metadata.CLUSTER_PROJECT} '
+                                            f'-q {metadata.CLUSTER_QUEUE} '
+                                            f'-l fmem={resources.memory} '
+                                            f'-l fthread={resources.cpu} '
+                                            f'-l h_rt={resources.runtime} '
+                                            f'-l archive=TRUE '  # Need J-drive access for data
+                                            + (f'-hold_jid {",".join(holds)} ' if holds else '')
+                                            + f'-N {job_name}')  # Name of the job
+        job_ids = self._session.runBulkJobs(job_template, 1, len(tasks), 1)
+        self._session.deleteJobTemplate(job_template)
+        return list(job_ids)
+
+    def wait(self, job_ids: List[str]) -> Dict[str, bool]:
+        results = {}
+        for job_id in job_ids:
+            info = self._session.wait(job_id, self._drmaa.Session.TIMEOUT_WAIT_FOREVER)
+            results[job_id] = info.hasExited and info.exitStatus == 0 and not info.wasAborted
+        return results
+
+
+class LocalScheduler(Scheduler):
+    """Runs tasks one after another as local processes when submitted.
+
+    Tasks run in submission order, so holds are always met. If memory is
+    enforced, each task's address space is limited to its memory request.
+
+    """
+
+    def __init__(self, task_dir: Path, enforce_memory: bool = False):
+        super().__init__(task_dir)
+        self.enforce_memory = enforce_memory
+        self.submitted = []  # type: List[Tuple[str, List[Task], Resources]]
+        self._results = {}  # type: Dict[str, bool]
+
+    def submit_array(self, job_name: str, tasks: List[Task], resources: Resources,
+                     hold_job_ids: List[str] = None) -> List[str]:
+        task_file = self.write_task_file(job_name, tasks)
+        self.submitted.append((job_name, tasks, resources))
+        job_id = len(self.submitted)
+        job_ids = []
+        for task_id in range(1, len(tasks) + 1):
+            env = dict(os.environ, **{TASK_ID_VARIABLE: str(task_id)})
+            process = subprocess.run([sys.executable, '-m', __name__, str(task_file)], env=env,
+                                     preexec_fn=self._limit_memory(resources) if self.enforce_memory else None)
+            job_ids.append(f'{job_id}.{task_id}')
+            self._results[job_ids[-1]] = process.returncode == 0
+        return job_ids
+
+    @staticmethod
+    def _limit_memory(resources: Resources):
+        def limit():
+            import resource
+            memory = parse_memory(resources.memory)
+            resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+        return limit
+
+    def wait(self, job_ids: List[str]) -> Dict[str, bool]:
+        return {job_id: self._results[job_id] for job_id in job_ids}
+
+
+def submit_tasks(scheduler: Scheduler, job_name: str, tasks: List[Tuple[Task, Resources]],
+                 hold_job_ids: List[str] = None) -> Dict[str, Tuple[Task, Resources]]:
+    """Submits the tasks as one job array per resource request.
+
+    Returns
+    -------
+        The task and resources of each job id.
+
+    """
+    tiers = {}  # type: Dict[Resources, List[Task]]
+    for task, resources in tasks:
+        tiers.setdefault(resources, []).append(task)
+
+    jobs = {}
+    for resources, tier_tasks in sorted(tiers.items(), key=lambda item: parse_memory(item[0].memory)):
+        tier_name = f'{job_name}_{resources.memory}' if len(tiers) > 1 else job_name
+        job_ids = scheduler.submit_array(tier_name, tier_tasks, resources, hold_job_ids)
+        logger.info(f'Submitted {len(tier_tasks)} tasks as {tier_name} with {resources.memory} memory '
+                    f'and a run time of {resources.runtime}.')
+        jobs.update({job_id: (task, resources) for job_id, task in zip(job_ids, tier_tasks)})
+    return jobs
+
+
+def wait_for_tasks(scheduler: Scheduler, job_name: str, jobs: Dict[str, Tuple[Task, Resources]],
+                   max_attempts: int = metadata.MAKE_ARTIFACT_MAX_ATTEMPTS) -> List[Task]:
+    """Waits for the jobs and resubmits failed tasks with escalated resources
+    until they succeed or run out of attempts.
+
+    Returns
+    -------
+        The tasks that never succeeded.
+
+    """
+    failed = []
+    for attempt in range(1, max_attempts + 1):
+        results = scheduler.wait(list(jobs))
+        failed = [jobs[job_id] for job_id, succeeded in results.items() if not succeeded]
+        for job_id, succeeded in results.items():
+            logger.info(f'{jobs[job_id][0].name:<35}: {"finished" if succeeded else "failed":>15}')
+        if not failed or attempt == max_attempts:
+            break
+        logger.info(f'Resubmitting {len(failed)} failed tasks, attempt {attempt + 1} of {max_attempts}.')
+        jobs = submit_tasks(scheduler, f'{job_name}_retry_{attempt}',
+                            [(task, escalate(resources)) for task, resources in failed])
+    return [task for task, _ in failed]
+
+
+def run_task(task_file: Path):
+    """Replaces this process with the command of the current array task."""
+    tasks = json.loads(Path(task_file).read_text())
+    task = tasks[int(os.environ[TASK_ID_VARIABLE]) - 1]
+    os.execv(sys.executable, [sys.executable] + task['args'])
+
+
+if __name__ == '__main__':
+    run_task(sys.argv[1])
@@ -0,0 +1,182 @@
+"""Helpers for running the model outside of ``psimulate``.
+
+Outputs are written in the same layout ``psimulate`` uses so they can be
+processed with ``make_results``.
+
+The state of a running simulation is the state table, the randomness key
+mapping, the clock and the accumulated state of every component. Randomness
+in vivarium is a function of the seed, the simulant keys and the clock, so
+restoring these into a freshly set up simulation continues the run exactly.
+Reading and writing them relies on private parts of vivarium, so it is done
+only in :func:`get_simulation_state` and :func:`set_simulation_state`, which
+check the vivarium version those internals were checked against.
+
+Components hold their accumulators in memory. A component can provide
+``get_checkpoint_state`` and ``set_checkpoint_state`` to say what should be
+saved. Otherwise, any ``Counter`` attributes it has are saved, which covers
+the vivarium public health observers. Other mutable attributes of such a
+component would be lost, so they are an error unless the caller allows them.
+
+"""
+from collections import Counter
+import copy
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Union
+
+from loguru import logger
+import numpy as np
+import pandas as pd
+import vivarium
+import yaml
+from vivarium.framework.configuration import build_model_specification
+from vivarium.framework.engine import SimulationContext
+
+from vivarium_nih_us_cvd.constants import results
+
+# The vivarium version whose simulation internals get_simulation_state and
+# set_simulation_state rely on.
+SIMULATION_INTERNALS_VIVARIUM_VERSION = '0.10.10'
+MUTABLE_TYPES = (dict, list, set, np.ndarray, pd.Series, pd.DataFrame)
+
+
+def get_run_configuration(input_draw: int, random_seed: int, scenario: str,
+                          population_size: int = None) -> Dict:
+    """Builds the configuration overrides for a single run, as ``psimulate``
+    would for a (draw, seed, branch) job."""
+    configuration = {
+        'input_data': {'input_draw_number': input_draw},
+        'randomness': {'random_seed': random_seed},
+        'branch_name': {'scenario': scenario},
+    }
+    if population_size is not None:
+        configuration['population'] = {'population_size': population_size}
+    return configuration
+
+
+def get_population_size(model_specification: Union[str, Path]) -> int:
+    return build_model_specification(str(model_specification)).configuration.population.population_size
+
+
+def build_simulation(model_specification: Union[str, Path], configuration: Dict) -> SimulationContext:
+    """Builds, sets up and initializes a simulation, ready to step."""
+    simulation = SimulationContext(str(model_specification), configuration=configuration)
+    simulation.setup()
+    simulation.initialize_simulants()
+    return simulation
+
+
+def get_output_row(metrics: Dict[str, float], input_draw: int, random_seed: int, scenario: str) -> Dict:
+    row = dict(metrics)
+    row[results.INPUT_DRAW_COLUMN] = input_draw
+    row[results.RANDOM_SEED_COLUMN] = random_seed
+    row[results.OUTPUT_SCENARIO_COLUMN] = scenario
+    return row
+
+
+def write_outputs(output_dir: Union[str, Path], model_specification: Union[str, Path], rows: List[Dict]):
+    """Writes run outputs, the model specification and the keyspace the way
+    ``psimulate`` lays out a results directory."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    shutil.copy(str(model_specification), str(output_dir / 'model_specification.yaml'))
+
+    data = pd.DataFrame(rows).fillna(0.0)
+    data.to_hdf(output_dir / 'output.hdf', key='data')
+
+    keyspace = {column: sorted(data[column].unique().tolist())
+                for column in [results.INPUT_DRAW_COLUMN, results.RANDOM_SEED_COLUMN,
+                               results.OUTPUT_SCENARIO_COLUMN]}
+    with (output_dir / 'keyspace.yaml').open('w') as f:
+        yaml.dump(keyspace, f)
+
+
+def get_component_state(component: Any) -> Dict:
+    if hasattr(component, 'get_checkpoint_state'):
+        return component.get_checkpoint_state()
+    return {name: value for name, value in getattr(component, '__dict__', {}).items() if isinstance(value, Counter)}
+
+
+def set_component_state(component: Any, state: Dict):
+    if hasattr(component, 'set_checkpoint_state'):
+        component.set_checkpoint_state(state)
+    else:
+        for name, value in state.items():
+            setattr(component, name, Counter(value))
+
+
+def get_uncaptured_state(component: Any) -> List[str]:
+    """Gets the mutable attributes of a component that won't be saved."""
+    if hasattr(component, 'get_checkpoint_state'):
+        return []
+    return sorted(name for name, value in getattr(component, '__dict__', {}).items()
+                  if isinstance(value, MUTABLE_TYPES) and not isinstance(value, Counter))
+
+
+def check_uncaptured_state(simulation: SimulationContext, allow_uncaptured_state: bool = False):
+    """Raises if any component has state that won't be saved, or logs it if
+    the caller allows it."""
+    uncaptured = {}
+    for name, component in _list_components(simulation).items():
+        attributes = get_uncaptured_state(component)
+        if attributes:
+            uncaptured[name] = attributes
+    if uncaptured and not allow_uncaptured_state:
+        raise ValueError(f'Simulation state will not include component attributes {uncaptured}. Give the '
+                         f'components get_checkpoint_state and set_checkpoint_state methods, or allow '
+                         f'uncaptured state if those attributes do not change during the run.')
+    for name, attributes in uncaptured.items():
+        logger.warning(f'Simulation state will not include attributes {attributes} of component {name}. '
+                       f'If they change during the run, restored results will differ.')
+
+
+def check_simulation_internals():
+    if vivarium.__version__ != SIMULATION_INTERNALS_VIVARIUM_VERSION:
+        raise RuntimeError(f'Saving and restoring simulation state relies on the simulation internals of '
+                           f'vivarium {SIMULATION_INTERNALS_VIVARIUM_VERSION}, but vivarium '
+                           f'{vivarium.__version__} is installed.')
+
+
+def _list_components(simulation: SimulationContext) -> Dict[str, Any]:
+    check_simulation_internals()
+    return simulation._component_manager.list_components()
+
+
+def get_created_columns(simulation: SimulationContext) -> List[str]:
+    """Gets the state table columns the simulation's components create."""
+    check_simulation_internals()
+    return [name.split('.', 1)[1] for name, group in simulation._resource._resource_group_map.items()
+            if group.type == 'column']
+
+
+def get_simulation_state(simulation: SimulationContext) -> Dict:
+    """Gets a copy of the state of a simulation."""
+    check_simulation_internals()
+    return copy.deepcopy({
+        'vivarium_version': vivarium.__version__,
+        'time': simulation._clock._time,
+        'population': simulation._population._population,
+        'key_mapping': simulation._randomness._key_mapping._map,
+        'components': {name: get_component_state(component)
+                       for name, component in _list_components(simulation).items()},
+    })
+
+
+def set_simulation_state(simulation: SimulationContext, state: Dict):
+    """Restores state into a simulation that has been set up, in place of or
+    after initializing its population. Components the simulation doesn't
+    have are skipped."""
+    check_simulation_internals()
+    if state['vivarium_version'] != vivarium.__version__:
+        raise RuntimeError(f'Simulation state is from vivarium {state["vivarium_version"]}, but vivarium '
+                           f'{vivarium.__version__} is installed.')
+    state = copy.deepcopy(state)
+    if simulation._lifecycle.current_state == 'post_setup':
+        simulation._lifecycle.set_state('population_creation')
+    simulation._clock._time = state['time']
+    simulation._population._population = state['population']
+    simulation._randomness._key_mapping._map = state['key_mapping']
+    components = _list_components(simulation)
+    for name, component_state in state['components'].items():
+        if component_state and name in components:
+            set_component_state(components[name], component_state)
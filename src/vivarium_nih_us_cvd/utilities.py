@@ -5,8 +5,6 @@ from typing import NamedTuple, Union, List
 from pathlib import Path
 from loguru import logger
 
-from vivarium_public_health.risks.data_transformations import pivot_categorical
-
 from vivarium_nih_us_cvd.constants import metadata
 
 
@@ -67,6 +65,9 @@ def read_data_by_draw(artifact_path: str, key : str, draw: int) -> pd.DataFrame:
         The data to retrieve.
 
     """
+    # Local import to keep the framework out of the command line entry points
+    from vivarium_public_health.risks.data_transformations import pivot_categorical
+
     key = key.replace(".", "/")
     with pd.HDFStore(artifact_path, mode='r') as store:
         index = store.get(f'{key}/index')
@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+import yaml
+
+from vivarium.interface import InteractiveContext
+
+from mock_artifact import PLUGIN_CONFIGURATION
+
+
+@pytest.fixture
+def base_config():
+    return {
+        'randomness': {'key_columns': ['entrance_time', 'age']},
+        'time': {
+            'start': {'year': 2021, 'month': 11, 'day': 1},
+            'end': {'year': 2022, 'month': 3, 'day': 1},
+            'step_size': 28,  # Days
+        },
+        'population': {
+            'population_size': 2_000,
+            'age_start': 20,
+            'age_end': 100,
+        },
+    }
+
+
+@pytest.fixture
+def age_bins():
+    return pd.DataFrame({
+        'age_group_id': [5, 6, 7, 8],
+        'age_group_name': ['Under 25', '25 to 49', '50 to 74', '75 to 94'],
+        'age_start': [0.0, 25.0, 50.0, 75.0],
+        'age_end': [25.0, 50.0, 75.0, 95.0],
+    })
+
+
+@pytest.fixture
+def make_simulation(base_config, age_bins):
+    """Builds a simulation from components and configuration, serving the
+    age bins and any other given data from a mock artifact."""
+    def make(components, configuration=None, data=None) -> InteractiveContext:
+        sim = InteractiveContext(components=components, configuration=base_config,
+                                 plugin_configuration=PLUGIN_CONFIGURATION, setup=False)
+        if configuration:
+            sim.configuration.update(configuration)
+        artifact = sim._data
+        artifact.write('population.age_bins', age_bins)
+        for key, value in (data or {}).items():
+            artifact.write(key, value)
+        sim.setup()
+        return sim
+    return make
+
+
+@pytest.fixture
+def model_specification(tmp_path, base_config):
+    """Writes a model specification for the test population and the
+    simulation components in ``simulation_components``."""
+    path = tmp_path / 'model_specification.yaml'
+    with path.open('w') as f:
+        yaml.dump({
+            'plugins': PLUGIN_CONFIGURATION,
+            'components': {
+                'vivarium.testing_utilities': ['TestPopulation()'],
+                'simulation_components': ['Deaths()', 'Treatment()'],
+            },
+            'configuration': dict(base_config, branch_name={'scenario': 'baseline'}),
+        }, f)
+    return path
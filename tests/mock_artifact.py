@@ -0,0 +1,32 @@
+from typing import Any, Dict
+
+from vivarium.framework.artifact import ArtifactManager
+
+PLUGIN_CONFIGURATION = {
+    'required': {
+        'data': {
+            'controller': 'mock_artifact.MockArtifactManager',
+            'builder_interface': 'vivarium.framework.artifact.ArtifactInterface',
+        }
+    }
+}
+
+
+class MockArtifactManager(ArtifactManager):
+    """Serves artifact data written in memory by the test."""
+
+    def __init__(self):
+        self.data = {}  # type: Dict[str, Any]
+
+    @property
+    def name(self):
+        return 'mock_artifact_manager'
+
+    def setup(self, builder):
+        builder.lifecycle.add_constraint(self.load, allow_during=['setup'])
+
+    def load(self, entity_key: str, **column_filters) -> Any:
+        return self.data[entity_key]
+
+    def write(self, entity_key: str, data: Any):
+        self.data[entity_key] = data
@@ -0,0 +1,50 @@
+from collections import Counter
+
+import pandas as pd
+
+
+class Deaths:
+    """Kills simulants at random each step, fewer of them outside the
+    baseline scenario, and counts deaths by step."""
+
+    @property
+    def name(self):
+        return 'deaths'
+
+    def setup(self, builder):
+        self.probability = 0.1 if builder.configuration.branch_name.scenario == 'baseline' else 0.05
+        self.randomness = builder.randomness.get_stream('deaths')
+        self.clock = builder.time.clock()
+        self.counts = Counter()
+        self.population_view = builder.population.get_view(['alive'], query='alive == "alive"')
+        builder.event.register_listener('time_step', self.on_time_step)
+        builder.value.register_value_modifier('metrics', self.metrics)
+
+    def on_time_step(self, event):
+        dies = self.randomness.filter_for_probability(self.population_view.get(event.index).index, self.probability)
+        self.population_view.update(pd.Series('dead', index=dies, name='alive'))
+        self.counts[f'deaths_in_{self.clock().date()}'] += len(dies)
+
+    def metrics(self, index, metrics):
+        metrics.update(self.counts)
+        return metrics
+
+
+class Treatment:
+    """Creates a treatment column, only in the treated scenario."""
+
+    @property
+    def name(self):
+        return 'treatment'
+
+    def setup(self, builder):
+        if builder.configuration.branch_name.scenario != 'treated':
+            return
+        self.randomness = builder.randomness.get_stream('treatment')
+        self.population_view = builder.population.get_view(['treated'])
+        builder.population.initializes_simulants(self.on_initialize_simulants, creates_columns=['treated'],
+                                                 requires_columns=['age'])
+
+    def on_initialize_simulants(self, pop_data):
+        treated = self.randomness.get_draw(pop_data.index) < 0.5
+        self.population_view.update(pd.Series(treated, index=pop_data.index, name='treated'))
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+from vivarium.testing_utilities import TestPopulation
+
+from vivarium_nih_us_cvd.components import AdaptiveStepping, DemographicBins, IschemicStroke, MyocardialInfarction
+from vivarium_nih_us_cvd.components.adaptive_stepping import ACUTE_STATES, STEP_MULTIPLE_COLUMN
+from vivarium_nih_us_cvd.components.disease import BinnedRateTransition
+from vivarium_nih_us_cvd.constants import data_keys, models
+
+INCIDENCE_RATE = 0.5
+RECURRENCE_RATE = 1.0
+MODELS = [models.MI_MODEL_NAME, models.ISCHEMIC_STROKE_MODEL_NAME]
+
+
+def make_rate(value):
+    rows = [(sex, age_start, age_end, year, year + 1)
+            for sex in ['Male', 'Female']
+            for age_start, age_end in [(0, 25), (25, 50), (50, 75), (75, 95)]
+            for year in [2021, 2022]]
+    data = pd.DataFrame(rows, columns=['sex', 'age_start', 'age_end', 'year_start', 'year_end'])
+    return data.assign(value=value)
+
+
+def make_data():
+    data = {
+        data_keys.MI.RESTRICTIONS.sink: {'yld_only': True},
+        data_keys.MI.INCIDENCE_ACUTE.sink: make_rate(INCIDENCE_RATE),
+        data_keys.MI.INCIDENCE_POST.sink: make_rate(RECURRENCE_RATE),
+        data_keys.ISCHEMIC_STROKE.RESTRICTIONS: {'yld_only': True},
+        data_keys.ISCHEMIC_STROKE.INCIDENCE_ACUTE: make_rate(INCIDENCE_RATE),
+    }
+    for prevalence, disability_weight, value in [
+        (data_keys.MI.PREVALENCE_ACUTE.sink, data_keys.MI.DW_ACUTE.sink, 0.05),
+        (data_keys.MI.PREVALENCE_POST.sink, data_keys.MI.DW_POST.sink, 0.2),
+        (data_keys.ISCHEMIC_STROKE.PREVALENCE_ACUTE, data_keys.ISCHEMIC_STROKE.DW_ACUTE, 0.05),
+        (data_keys.ISCHEMIC_STROKE.PREVALENCE_CHRONIC, data_keys.ISCHEMIC_STROKE.DW_CHRONIC, 0.2),
+    ]:
+        data[prevalence] = value
+        data[disability_weight] = 0.1
+    return data
+
+
+def make_simulation_with(make_simulation, components, step_multiple=None):
+    configuration = {}
+    if step_multiple is not None:
+        components = components + [AdaptiveStepping()]
+        configuration = {'adaptive_stepping': {'non_acute_step_multiple': step_multiple}}
+    return make_simulation([TestPopulation(), DemographicBins()] + components,
+                           configuration=configuration, data=make_data())
+
+
+def get_states(sim):
+    return sim.get_population()[MODELS + ['alive']]
+
+
+def test_unit_step_multiple_matches_no_adaptive_stepping(make_simulation):
+    sims = [make_simulation_with(make_simulation, [MyocardialInfarction(), IschemicStroke()], step_multiple)
+            for step_multiple in [None, 1]]
+    pd.testing.assert_frame_equal(get_states(sims[0]), get_states(sims[1]))
+    initial_states = get_states(sims[0])
+    while sims[0]._clock.time < sims[0]._clock.stop_time:
+        for sim in sims:
+            sim.step()
+        pd.testing.assert_frame_equal(get_states(sims[0]), get_states(sims[1]))
+    assert (get_states(sims[0])[MODELS] != initial_states[MODELS]).any().all()
+
+
+@pytest.mark.parametrize('step_multiple', [2, 3])
+def test_transition_probabilities_compound_over_skipped_steps(make_simulation, base_config, step_multiple):
+    base_config['time']['end'] = {'year': 2022, 'month': 11, 'day': 1}
+    mi = MyocardialInfarction()
+    sim = make_simulation_with(make_simulation, [mi, IschemicStroke()], step_multiple)
+    transitions = {(transition.input_state.state_id, transition.output_state.state_id): transition
+                   for state in mi.states for transition in state.transition_set.transitions
+                   if isinstance(transition, BinnedRateTransition)}
+    # Vivarium rescales rates by steps in 365 day years.
+    step_years = base_config['time']['step_size'] / 365
+    base_probability = {
+        (models.MI_SUSCEPTIBLE_STATE_NAME, models.ACUTE_MI_STATE_NAME): 1 - np.exp(-INCIDENCE_RATE * step_years),
+        (models.POST_MI_STATE_NAME, models.ACUTE_MI_STATE_NAME): 1 - np.exp(-RECURRENCE_RATE * step_years),
+    }
+    assert set(transitions) == set(base_probability)
+
+    def is_acute(pop):
+        return pd.concat([pop[model] == state for model, state in ACUTE_STATES.items()], axis=1).any(axis=1)
+
+    previous_acute = is_acute(sim.get_population())
+    steps_since_active = pd.Series(0, index=previous_acute.index)
+    seen_multiples = set()
+    while sim._clock.time < sim._clock.stop_time:
+        sim.step()
+        steps_since_active += 1
+        pop = sim.get_population()
+        multiple = pop[STEP_MULTIPLE_COLUMN]
+        seen_multiples |= set(multiple.unique())
+        # Simulants in an acute state at the start of the step are active
+        # for that step alone.
+        assert (multiple[previous_acute] == 1).all()
+        assert multiple[~previous_acute].isin(range(step_multiple + 1)).all()
+        # Active simulants take exactly the steps since they were last
+        # active, including the shorter staggered first window.
+        active = multiple > 0
+        pd.testing.assert_series_equal(multiple[active], steps_since_active[active], check_names=False)
+        steps_since_active[active] = 0
+        for key, transition in transitions.items():
+            expected = 1 - (1 - base_probability[key]) ** multiple
+            np.testing.assert_allclose(transition._probability(pop.index), expected, rtol=1e-12)
+        previous_acute = is_acute(pop)
+    assert seen_multiples == set(range(step_multiple + 1))
+
+
+def test_adaptive_stepping_configuration_alone_skips_nothing(make_simulation):
+    sims = [make_simulation_with(make_simulation, [MyocardialInfarction(), IschemicStroke()]),
+            make_simulation([TestPopulation(), DemographicBins(), MyocardialInfarction(), IschemicStroke()],
+                            configuration={'adaptive_stepping': {'non_acute_step_multiple': 3}},
+                            data=make_data())]
+    for _ in range(3):
+        for sim in sims:
+            sim.step()
+        pd.testing.assert_frame_equal(get_states(sims[0]), get_states(sims[1]))
+    assert STEP_MULTIPLE_COLUMN not in sims[1].get_population()
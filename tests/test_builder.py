@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+from vivarium.framework.artifact import Artifact
+
+# The builder pulls GBD data through the loader.
+pytest.importorskip('vivarium_gbd_access')
+from vivarium_nih_us_cvd.data import builder, loader  # noqa: E402
+from vivarium_nih_us_cvd.data.draws import DRAW_COLUMNS, get_constant_draws  # noqa: E402
+
+LOCATION = 'Alabama'
+KEY = 'cause.angina.cause_specific_mortality_rate'
+
+
+def make_index():
+    return pd.MultiIndex.from_product([[LOCATION], ['Female', 'Male'], [25.0, 50.0]],
+                                      names=['location', 'sex', 'age_start'])
+
+
+def test_load_and_write_data_reads_back_only_when_asked(tmp_path, monkeypatch):
+    artifact = Artifact(tmp_path / 'artifact.hdf')
+    data = get_constant_draws(make_index(), 0.5)
+    loaded = []
+    monkeypatch.setattr(loader, 'get_data', lambda key, location: loaded.append(key) or data)
+    assert builder.load_and_write_data(artifact, KEY, LOCATION) is None
+    assert loaded == [KEY]
+
+    def load(*_, **__):
+        raise AssertionError('Skipped keys should not be read back from the artifact.')
+
+    with monkeypatch.context() as m:
+        m.setattr(Artifact, 'load', load)
+        assert builder.load_and_write_data(artifact, KEY, LOCATION) is None
+
+    expanded = builder.load_and_write_data(artifact, KEY, LOCATION, return_data=True)
+    assert loaded == [KEY]
+    assert list(expanded.columns) == DRAW_COLUMNS
+    assert np.all(expanded.to_numpy() == 0.5)
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+from vivarium.testing_utilities import TestPopulation
+from vivarium_public_health.metrics.utilities import get_age_bins
+
+from vivarium_nih_us_cvd.components import DemographicBins
+from vivarium_nih_us_cvd.components.demography import (AGE_BIN_COLUMN, SEX_CODE_COLUMN, SEXES, get_age_bin_codes,
+                                                       get_age_bin_code_map)
+
+
+def get_age_bin_codes_by_query(age: pd.Series, age_bins: pd.DataFrame) -> pd.Series:
+    """Bins ages with the age filter the vph observers query with."""
+    pop = pd.DataFrame({'age': age})
+    codes = pd.Series(-1, index=age.index)
+    for code, age_bin in age_bins.iterrows():
+        in_bin = pop.query(f'{age_bin.age_start} <= age and age < {age_bin.age_end}').index
+        codes.loc[in_bin] = code
+    return codes
+
+
+def test_get_age_bin_codes_matches_query(age_bins):
+    edges = np.append(age_bins.age_start, age_bins.age_end.iloc[-1])
+    age = pd.Series(np.concatenate([np.random.RandomState(0).uniform(0, 120, 1000),
+                                    edges, edges[1:] - 1e-9, edges + 1e-9]))
+    expected = get_age_bin_codes_by_query(age, age_bins)
+    np.testing.assert_array_equal(get_age_bin_codes(age, age_bins), expected.to_numpy())
+
+
+def test_demographic_bins_track_aging(make_simulation, base_config, age_bins):
+    # Long steps so plenty of simulants age into new bins and past the last one.
+    base_config['time']['step_size'] = 365
+    base_config['time']['end'] = {'year': 2025, 'month': 11, 'day': 1}
+    sim = make_simulation([TestPopulation(), DemographicBins()])
+    initial_codes = sim.get_population()[AGE_BIN_COLUMN].copy()
+    sim.run()
+
+    pop = sim.get_population()
+    alive = pop.alive == 'alive'
+    assert (pop.loc[alive, AGE_BIN_COLUMN] != initial_codes[alive]).any()
+    assert (pop.loc[alive, AGE_BIN_COLUMN] == -1).any()
+    expected = get_age_bin_codes_by_query(pop.loc[alive, 'age'], age_bins)
+    np.testing.assert_array_equal(pop.loc[alive, AGE_BIN_COLUMN].to_numpy(), expected.to_numpy())
+    np.testing.assert_array_equal(pop[SEX_CODE_COLUMN].to_numpy(), pop.sex.map(SEXES.index).to_numpy())
+
+
+def test_age_bin_code_map_matches_trimmed_bins(make_simulation, age_bins):
+    class AgeBins:
+        name = 'age_bins'
+
+        def setup(self, builder):
+            self.age_bins = get_age_bins(builder)
+
+    component = AgeBins()
+    make_simulation([TestPopulation(), component])
+    trimmed = component.age_bins.reset_index(drop=True)
+    # The first bin starts at the simulation's entrance age.
+    assert trimmed.age_start.iloc[0] > age_bins.age_start.iloc[0]
+
+    age = pd.Series(np.random.RandomState(1).uniform(0, 120, 1000))
+    code_map = get_age_bin_code_map(age_bins, trimmed)
+    expected = get_age_bin_codes_by_query(age, trimmed)
+    codes = code_map[get_age_bin_codes(age, age_bins)]
+    # Ages in the trimmed part of the first bin keep the bin, as entrance
+    # ages only go up.
+    trimmed_away = age < trimmed.age_start.iloc[0]
+    np.testing.assert_array_equal(codes[~trimmed_away], expected[~trimmed_away].to_numpy())
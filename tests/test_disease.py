@@ -0,0 +1,37 @@
+from vivarium.testing_utilities import TestPopulation
+
+from vivarium_nih_us_cvd.components.disease import DiseaseModel, SusceptibleState, get_state_dtype
+from vivarium_nih_us_cvd.constants import models
+
+
+class NewSimulants:
+    """Adds simulants on the first time step."""
+
+    @property
+    def name(self):
+        return 'new_simulants'
+
+    def setup(self, builder):
+        self.simulant_creator = builder.population.get_simulant_creator()
+        builder.event.register_listener('time_step', self.on_time_step)
+
+    def on_time_step(self, event):
+        if event.time.month == 11:
+            self.simulant_creator(10, population_configuration={'age_start': 20, 'age_end': 30,
+                                                               'sim_state': 'time_step'})
+
+
+def test_disease_model_state_column_is_categorical_without_prevalence(make_simulation):
+    # Without a state that has prevalence data, every simulant starts in the
+    # initial state, written as objects.
+    model = models.MI_MODEL_NAME
+    disease_model = DiseaseModel(model, states=[SusceptibleState(model)],
+                                 get_data_functions={'cause_specific_mortality_rate': lambda *_: 0})
+    sim = make_simulation([TestPopulation(), NewSimulants(), disease_model])
+    initial_size = len(sim.get_population())
+    sim.step()
+
+    pop = sim.get_population()
+    assert len(pop) > initial_size
+    assert pop[model].dtype == get_state_dtype(model)
+    assert (pop[model] == f'susceptible_to_{model}').all()
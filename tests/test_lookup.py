@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from vivarium_nih_us_cvd.components import DemographicBins
+from vivarium_nih_us_cvd.components.lookup import BinnedLookupTable
+
+AGES = [0.0, 10.0, 24.999, 25.0, 25.001, 49.999, 50.0, 74.999, 75.0, 94.999, 95.0, 95.001, 100.0, 125.0]
+TIMES = [
+    pd.Timestamp('2020-06-01'),  # Before the first year bin.
+    pd.Timestamp('2021-01-01'),
+    pd.Timestamp('2021-12-31'),
+    pd.Timestamp('2022-01-01'),
+    pd.Timestamp('2023-07-02'),
+    pd.Timestamp('2024-12-31'),  # A leap day's fractional year spills into the next year.
+    pd.Timestamp('2025-01-01'),
+    pd.Timestamp('2025-12-31'),
+    pd.Timestamp('2027-06-01'),  # After the last year bin.
+]
+
+
+class Population:
+
+    @property
+    def name(self):
+        return 'population'
+
+    def setup(self, builder):
+        self.population_view = builder.population.get_view(['age', 'sex', 'alive'])
+        builder.population.initializes_simulants(self.on_initialize_simulants,
+                                                 creates_columns=['age', 'sex', 'alive'])
+
+    def on_initialize_simulants(self, pop_data):
+        n_ages = len(AGES)
+        pop = pd.DataFrame({
+            'age': np.resize(AGES, len(pop_data.index)),
+            'sex': np.where(np.arange(len(pop_data.index)) // n_ages % 2, 'Female', 'Male'),
+            'alive': 'alive',
+        }, index=pop_data.index)
+        self.population_view.update(pop)
+
+
+class Tables:
+
+    def __init__(self, data, value_columns):
+        self.data = data
+        self.value_columns = value_columns
+
+    @property
+    def name(self):
+        return 'tables'
+
+    def setup(self, builder):
+        self.binned = BinnedLookupTable(builder, self.data, self.value_columns)
+        value_columns = [self.value_columns] if isinstance(self.value_columns, str) else self.value_columns
+        self.interpolated = builder.lookup.build_table(self.data, key_columns=['sex'],
+                                                       parameter_columns=['age', 'year'],
+                                                       value_columns=value_columns)
+
+
+def make_data(age_edges, value_columns):
+    rows = [(sex, age_start, age_end, year, year + 1)
+            for sex in ['Male', 'Female']
+            for age_start, age_end in zip(age_edges[:-1], age_edges[1:])
+            for year in range(2021, 2026)]
+    data = pd.DataFrame(rows, columns=['sex', 'age_start', 'age_end', 'year_start', 'year_end'])
+    random = np.random.RandomState(0)
+    for column in value_columns:
+        data[column] = random.uniform(size=len(data))
+    return data
+
+
+@pytest.mark.parametrize('age_edges', [
+    [0, 25, 50, 75, 95],  # The demographic age bins.
+    [0, 50, 95],  # Coarser bins aligned with them.
+])
+@pytest.mark.parametrize('value_columns', ['value', ['value', 'other_value']])
+def test_binned_lookup_table_matches_interpolation(make_simulation, base_config, age_edges, value_columns):
+    base_config['population']['population_size'] = 2 * len(AGES)
+    base_config['time']['start'] = {'year': TIMES[0].year, 'month': TIMES[0].month, 'day': TIMES[0].day}
+    data = make_data(age_edges, [value_columns] if isinstance(value_columns, str) else value_columns)
+    tables = Tables(data, value_columns)
+    sim = make_simulation([Population(), DemographicBins(), tables])
+
+    index = sim.get_population().index
+    assert (sim.get_population().age > age_edges[-1]).any()
+    for time in TIMES:
+        if time > sim._clock.time:
+            sim.step(time - sim._clock.time)
+        assert sim._clock.time == time
+        expected = tables.interpolated(index)
+        binned = tables.binned(index)
+        if isinstance(value_columns, str):
+            pd.testing.assert_series_equal(binned, expected, check_names=False)
+        else:
+            pd.testing.assert_frame_equal(binned[value_columns], expected[value_columns])
+
+
+def test_binned_lookup_table_rejects_misaligned_age_bins(make_simulation):
+    data = make_data([0, 30, 95], ['value'])
+    with pytest.raises(ValueError, match='align'):
+        make_simulation([Population(), DemographicBins(), Tables(data, 'value')])
@@ -0,0 +1,183 @@
+from collections import Counter
+from functools import reduce
+from itertools import product
+import operator as op
+
+import numpy as np
+import pandas as pd
+import pytest
+from vivarium.testing_utilities import TestPopulation
+from vivarium_public_health.metrics.utilities import get_age_bins, get_state_person_time, get_transition_count
+
+from vivarium_nih_us_cvd.components import DemographicBins, DiseaseObserver
+from vivarium_nih_us_cvd.components.disease import get_state_dtype
+from vivarium_nih_us_cvd.constants import data_values, models
+
+
+class Exposures:
+    """Serves each risk stratification exposure as a fixed value per
+    simulant, spread around the threshold."""
+
+    @property
+    def name(self):
+        return 'exposures'
+
+    def setup(self, builder):
+        self.randomness = builder.randomness.get_stream('exposures')
+        self.values = {}
+        builder.population.initializes_simulants(self.on_initialize_simulants, requires_columns=['age'])
+        for layer in data_values.RISK_STRATIFICATION_LAYERS.values():
+            builder.value.register_value_producer(layer.exposure, source=self.get_source(layer))
+
+    def on_initialize_simulants(self, pop_data):
+        for layer in data_values.RISK_STRATIFICATION_LAYERS.values():
+            draw = self.randomness.get_draw(pop_data.index, additional_key=layer.exposure)
+            self.values[layer.exposure] = layer.threshold * (0.5 + draw)
+
+    def get_source(self, layer):
+        return lambda index: self.values[layer.exposure].loc[index]
+
+
+class DiseaseStates:
+    """Moves simulants along random modeled transitions each step, and kills
+    some of them."""
+
+    @property
+    def name(self):
+        return 'disease_states'
+
+    def setup(self, builder):
+        self.models = [models.MI_MODEL_NAME, models.ISCHEMIC_STROKE_MODEL_NAME]
+        self.randomness = builder.randomness.get_stream('disease_states')
+        self.population_view = builder.population.get_view(self.models + ['alive'])
+        builder.population.initializes_simulants(self.on_initialize_simulants, creates_columns=self.models,
+                                                 requires_columns=['age'])
+        builder.event.register_listener('time_step', self.on_time_step)
+
+    def on_initialize_simulants(self, pop_data):
+        states = pd.DataFrame(index=pop_data.index)
+        for model in self.models:
+            choice = self.randomness.choice(pop_data.index, list(models.STATE_MACHINE_MAP[model]['states']),
+                                            additional_key=model)
+            states[model] = choice.astype(get_state_dtype(model))
+        self.population_view.update(states)
+
+    def on_time_step(self, event):
+        pop = self.population_view.get(event.index, query='alive == "alive"')
+        for model in self.models:
+            state = pop[model].astype(object)
+            for transition in models.STATE_MACHINE_MAP[model]['transitions']:
+                moves = self.randomness.filter_for_probability(
+                    state.index[state == transition.from_state.lower()], 0.3, additional_key=transition
+                )
+                pop.loc[moves, model] = transition.to_state.lower()
+        dies = self.randomness.filter_for_probability(pop.index, 0.05, additional_key='death')
+        pop.loc[dies, 'alive'] = 'dead'
+        self.population_view.update(pop)
+
+
+class ReferenceObserver:
+    """Observes as the disease observer did with the vph metrics utilities,
+    one query per risk group, state or transition, sex and age group."""
+
+    def __init__(self, disease):
+        self.disease = disease
+
+    @property
+    def name(self):
+        return f'reference_observer.{self.disease}'
+
+    def setup(self, builder):
+        self.config = builder.configuration['metrics'][f'{self.disease}_observer'].to_dict()
+        self.clock = builder.time.clock()
+        self.age_bins = get_age_bins(builder)
+        self.counts = Counter()
+        self.person_time = Counter()
+        self.states = models.STATE_MACHINE_MAP[self.disease]['states']
+        self.transitions = models.STATE_MACHINE_MAP[self.disease]['transitions']
+        self.exposures = {name: builder.value.get_value(layer.exposure)
+                          for name, layer in data_values.RISK_STRATIFICATION_LAYERS.items()}
+
+        self.previous_state_column = f'reference_previous_{self.disease}'
+        self.population_view = builder.population.get_view(['alive', 'age', 'sex', self.disease,
+                                                            self.previous_state_column])
+        builder.population.initializes_simulants(self.on_initialize_simulants,
+                                                 creates_columns=[self.previous_state_column],
+                                                 requires_values=[layer.exposure for layer in
+                                                                  data_values.RISK_STRATIFICATION_LAYERS.values()])
+        builder.event.register_listener('time_step__prepare', self.on_time_step_prepare)
+        builder.event.register_listener('collect_metrics', self.on_collect_metrics)
+
+    def on_initialize_simulants(self, pop_data):
+        self.population_view.update(pd.Series('', index=pop_data.index, name=self.previous_state_column))
+        groups = []
+        for name, layer in data_values.RISK_STRATIFICATION_LAYERS.items():
+            is_high = self.exposures[name](pop_data.index) > layer.threshold
+            groups.append([(is_high, f'{name}_high'), (~is_high, f'{name}_normal')])
+        self.risk_group_ids = ['_'.join(label for _, label in group) for group in product(*groups)]
+        self.risk_groups = pd.Series('', index=pop_data.index)
+        for group in product(*groups):
+            mask = reduce(op.and_, [mask for mask, _ in group])
+            self.risk_groups.loc[mask] = '_'.join(label for _, label in group)
+
+    def group(self, pop):
+        risk_groups = self.risk_groups.loc[pop.index]
+        for risk_group in self.risk_group_ids:
+            yield risk_group, pop.loc[risk_groups == risk_group]
+
+    def get_population(self, index):
+        pop = self.population_view.get(index)
+        pop[self.disease] = pop[self.disease].astype(object)
+        return pop.rename(columns={self.previous_state_column: f'previous_{self.disease}'})
+
+    def on_time_step_prepare(self, event):
+        pop = self.get_population(event.index)
+        for risk_group, pop_in_group in self.group(pop):
+            for state in self.states:
+                person_time = get_state_person_time(pop_in_group, self.config, self.disease, state,
+                                                    self.clock().year, event.step_size, self.age_bins)
+                self.person_time.update({f'{k}_{risk_group}': v for k, v in person_time.items()})
+        previous_state = pop[self.disease].rename(self.previous_state_column)
+        self.population_view.update(previous_state)
+
+    def on_collect_metrics(self, event):
+        pop = self.get_population(event.index)
+        for risk_group, pop_in_group in self.group(pop):
+            for transition in self.transitions:
+                counts = get_transition_count(pop_in_group, self.config, self.disease, transition,
+                                              event.time, self.age_bins)
+                self.counts.update({f'{k}_{risk_group}': v for k, v in counts.items()})
+
+
+@pytest.mark.parametrize('disease, by_age, by_sex, by_year', [
+    (models.MI_MODEL_NAME, True, True, True),
+    (models.MI_MODEL_NAME, False, False, False),
+    (models.ISCHEMIC_STROKE_MODEL_NAME, True, False, True),
+    (models.ISCHEMIC_STROKE_MODEL_NAME, False, True, False),
+])
+def test_disease_observer_matches_vph_utilities(make_simulation, disease, by_age, by_sex, by_year):
+    observer = DiseaseObserver(disease)
+    reference = ReferenceObserver(disease)
+    sim = make_simulation(
+        [TestPopulation(), DemographicBins(), Exposures(), DiseaseStates(), observer, reference],
+        configuration={'metrics': {f'{disease}_observer': {'by_age': by_age, 'by_sex': by_sex,
+                                                           'by_year': by_year}}},
+    )
+    sim.run()
+
+    # The run spans a new year and ages simulants past the last age bin.
+    if by_year:
+        assert {key.split('_in_')[1][:4] for key in reference.person_time} == {'2021', '2022'}
+    assert (sim.get_population().age >= 95).any()
+    assert sum(reference.counts.values()) > 0
+
+    metrics = observer.metrics(sim.get_population().index, {})
+    expected = dict(reference.counts, **reference.person_time)
+    assert set(metrics) == set(expected)
+    for key, value in expected.items():
+        assert metrics[key] == pytest.approx(value, rel=1e-12, abs=1e-12), key
+
+    # Person time is accrued in years of the step size.
+    step_years = 28 / 365.25
+    person_time = np.array(list(observer.person_time.values()))
+    assert np.allclose(person_time / step_years, np.round(person_time / step_years))
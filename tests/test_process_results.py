@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+
+from vivarium_nih_us_cvd.constants import models, results
+from vivarium_nih_us_cvd.results_processing import process_results
+
+COUNT_COLUMNS = [
+    results.TOTAL_POPULATION_COLUMN,
+    'person_time_in_2021_among_male_in_age_group_25_to_29',
+    'person_time_in_2021_among_female_in_age_group_25_to_29',
+]
+
+
+@pytest.fixture
+def output_path(tmp_path):
+    keyspace = {
+        results.INPUT_DRAW_COLUMN: [1, 2],
+        results.RANDOM_SEED_COLUMN: [0, 1, 2],
+        results.OUTPUT_SCENARIO_COLUMN: ['baseline', 'treatment'],
+    }
+    runs = pd.DataFrame([(draw, seed, scenario)
+                         for draw in keyspace[results.INPUT_DRAW_COLUMN]
+                         for seed in keyspace[results.RANDOM_SEED_COLUMN]
+                         for scenario in keyspace[results.OUTPUT_SCENARIO_COLUMN]],
+                        columns=[results.INPUT_DRAW_COLUMN, results.RANDOM_SEED_COLUMN,
+                                 results.OUTPUT_SCENARIO_COLUMN])
+    # Seed 2 of draw 2 only finished in baseline.
+    runs = runs.loc[~((runs[results.INPUT_DRAW_COLUMN] == 2) & (runs[results.RANDOM_SEED_COLUMN] == 2)
+                      & (runs[results.OUTPUT_SCENARIO_COLUMN] == 'treatment'))]
+    runs = runs.sample(frac=1, random_state=0).reset_index(drop=True)
+    data = runs.copy()
+    random = np.random.RandomState(0)
+    for column in COUNT_COLUMNS:
+        data[column] = random.uniform(0, 100, len(data))
+    data[results.THROWAWAY_COLUMNS[0]] = 1.0
+    data[results.INPUT_DRAW_COLUMN] = data[results.INPUT_DRAW_COLUMN].astype(float)
+
+    path = tmp_path / 'output.hdf'
+    data.to_hdf(path, 'data')
+    with (tmp_path / 'keyspace.yaml').open('w') as f:
+        yaml.dump(keyspace, f)
+    return path
+
+
+def aggregate_in_memory(path):
+    data = pd.read_hdf(path).rename(columns={results.OUTPUT_SCENARIO_COLUMN: process_results.SCENARIO_COLUMN})
+    data[results.INPUT_DRAW_COLUMN] = data[results.INPUT_DRAW_COLUMN].astype(int)
+    data = data.loc[~((data[results.INPUT_DRAW_COLUMN] == 2) & (data[results.RANDOM_SEED_COLUMN] == 2))]
+    return (data
+            .groupby(process_results.GROUPBY_COLUMNS)[COUNT_COLUMNS]
+            .sum()
+            .reset_index())
+
+
+@pytest.mark.parametrize('chunksize', [1, 4, 100])
+def test_streamed_aggregation_matches_in_memory(output_path, chunksize):
+    data, keyspace = process_results.read_data(output_path, single_run=False, chunksize=chunksize)
+    assert len(data) == 11
+
+    data = process_results.filter_out_incomplete(data, keyspace)
+    assert len(data) == 10
+
+    aggregated = process_results.aggregate_over_seed(data)
+    expected = aggregate_in_memory(output_path)
+    pd.testing.assert_frame_equal(aggregated[expected.columns], expected, check_dtype=False)
+    assert results.THROWAWAY_COLUMNS[0] not in aggregated
+
+
+def test_filter_out_incomplete_frame_matches_streamed(output_path):
+    streamed, keyspace = process_results.read_data(output_path, single_run=False, chunksize=3)
+    in_memory = pd.concat(list(streamed), ignore_index=True)
+
+    expected = pd.concat(list(process_results.filter_out_incomplete(streamed, keyspace)), ignore_index=True)
+    pd.testing.assert_frame_equal(process_results.filter_out_incomplete(in_memory, keyspace), expected)
+
+
+def test_aggregate_over_seed_raises_on_column_mismatch(output_path):
+    data, _ = process_results.read_data(output_path, single_run=False)
+    data = pd.concat(list(data), ignore_index=True)
+    chunks = [data.iloc[:5], data.iloc[5:].drop(columns=COUNT_COLUMNS[1])]
+    with pytest.raises(ValueError, match='count columns'):
+        process_results.aggregate_over_seed(chunks)
+
+
+SPARSE_COLUMN = 'acute_myocardial_infarction_person_time_in_2021_among_male_in_age_group_25_to_29_SBP_high'
+DENSE_COLUMN = COUNT_COLUMNS[1]
+
+
+def test_aggregate_over_seed_fills_only_sparse_columns():
+    data = pd.DataFrame({
+        results.INPUT_DRAW_COLUMN: [1, 1, 2, 2],
+        results.RANDOM_SEED_COLUMN: [0, 1, 0, 1],
+        process_results.SCENARIO_COLUMN: 'baseline',
+        SPARSE_COLUMN: [1.0, np.nan, np.nan, np.nan],
+        DENSE_COLUMN: [1.0, 2.0, np.nan, 3.0],
+    })
+    aggregated = process_results.aggregate_over_seed(data, sparse_diseases=[models.MI_MODEL_NAME])
+    assert aggregated[SPARSE_COLUMN].tolist() == [1.0, 0.0]
+    assert aggregated[DENSE_COLUMN].iloc[0] == 3.0
+    assert np.isnan(aggregated[DENSE_COLUMN].iloc[1])
+
+
+def test_densify_fills_only_sparse_columns():
+    data = pd.DataFrame({results.INPUT_DRAW_COLUMN: [1], process_results.SCENARIO_COLUMN: ['baseline'],
+                         DENSE_COLUMN: [np.nan]})
+    densified = process_results.densify(data, [DENSE_COLUMN, SPARSE_COLUMN], {SPARSE_COLUMN})
+    assert densified[SPARSE_COLUMN].tolist() == [0.0]
+    assert densified[DENSE_COLUMN].isna().all()
+    with pytest.raises(KeyError):
+        process_results.densify(data, [DENSE_COLUMN, SPARSE_COLUMN])
+
+
+def test_read_data_records_sparse_strata_counts(tmp_path):
+    schema_column = results.SPARSE_METRICS_SCHEMA_COLUMN_TEMPLATE.format(DISEASE=models.MI_MODEL_NAME)
+    data = pd.DataFrame({SPARSE_COLUMN: [1.0], schema_column: [42]})
+    data.to_hdf(tmp_path / 'output.hdf', 'data')
+    data, _ = process_results.read_data(tmp_path / 'output.hdf', single_run=True)
+    assert data.sparse_strata_counts == {models.MI_MODEL_NAME: 42}
+    assert schema_column not in next(iter(data))
+
+
+def test_check_sparse_strata():
+    risk_stratification = {disease: () for disease in models.STATE_MACHINE_MAP}
+    expected = process_results.get_sparse_columns(
+        results.RESULT_COLUMNS('state_person_time', risk_stratification)
+        + results.RESULT_COLUMNS('transition_count', risk_stratification),
+        [models.MI_MODEL_NAME]
+    )
+    process_results.check_sparse_strata([], {models.MI_MODEL_NAME: len(expected)}, risk_stratification)
+    with pytest.raises(ValueError, match='tracked'):
+        process_results.check_sparse_strata([], {models.MI_MODEL_NAME: len(expected) - 1}, risk_stratification)
+
+
+def test_summarize_over_draws_matches_groupby():
+    random = np.random.RandomState(0)
+    data = pd.DataFrame([(measure, sex, draw) for measure in ['deaths', 'ylls'] for sex in ['Female', 'Male']
+                         for draw in range(50)],
+                        columns=['measure', 'sex', results.INPUT_DRAW_COLUMN])
+    data['value'] = random.uniform(0, 100, len(data))
+    summary = process_results.summarize_over_draws(data.sample(frac=1, random_state=0))
+
+    grouped = data.groupby(['measure', 'sex']).value
+    expected = pd.DataFrame({
+        'mean': grouped.mean(),
+        'median': grouped.median(),
+        **{name: grouped.quantile(q) for name, q in process_results.SUMMARY_QUANTILES.items()},
+    }).reset_index()
+    pd.testing.assert_frame_equal(summary.sort_values(['measure', 'sex']).reset_index(drop=True), expected)
+
+
+def to_long(data):
+    return data.melt(id_vars=process_results.GROUPBY_COLUMNS, value_vars=COUNT_COLUMNS,
+                     var_name='measure', value_name='value')
+
+
+def test_scenario_differences_match_differences_paired_by_draw_and_seed(output_path):
+    data, keyspace = process_results.read_data(output_path, single_run=False)
+    data = process_results.filter_out_incomplete(data, keyspace)
+    differences = process_results.summarize_scenario_differences(
+        to_long(process_results.aggregate_over_seed(data))
+    )
+
+    raw = pd.read_hdf(output_path)
+    paired = raw.pivot_table(index=[results.INPUT_DRAW_COLUMN, results.RANDOM_SEED_COLUMN],
+                             columns=results.OUTPUT_SCENARIO_COLUMN, values=COUNT_COLUMNS)
+    seed_differences = (paired.xs('treatment', axis=1, level=1)
+                        - paired.xs('baseline', axis=1, level=1)).dropna()
+    draw_differences = seed_differences.groupby(level=results.INPUT_DRAW_COLUMN).sum()
+    expected = draw_differences.agg(['mean', 'median']).T
+
+    differences = differences.set_index('measure')
+    assert (differences[process_results.SCENARIO_COLUMN] == 'treatment').all()
+    np.testing.assert_allclose(differences.loc[expected.index, ['mean', 'median']], expected, rtol=1e-12)
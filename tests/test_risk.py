@@ -0,0 +1,153 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+from vivarium.framework.values import list_combiner, union_post_processor
+from vivarium.testing_utilities import TestPopulation
+from vivarium_public_health.risks import RiskEffect
+from vivarium_public_health.utilities import EntityString, TargetString
+
+from vivarium_nih_us_cvd.components import DemographicBins, JointRiskEffects
+from vivarium_nih_us_cvd.constants import data_values
+
+RISKS = [EntityString(risk) for risk in data_values.RISK_EFFECT_TARGETS]
+TARGETS = sorted({TargetString(target) for targets in data_values.RISK_EFFECT_TARGETS.values() for target in targets})
+TMREL = 10.0
+SCALE = 2.0
+
+
+class Exposures:
+    """Serves a fixed exposure per simulant for each risk."""
+
+    @property
+    def name(self):
+        return 'exposures'
+
+    def setup(self, builder):
+        self.randomness = builder.randomness.get_stream('exposures')
+        self.values = {}
+        builder.population.initializes_simulants(self.on_initialize_simulants, requires_columns=['age'])
+        for risk in RISKS:
+            builder.value.register_value_producer(f'{risk.name}.exposure', source=self.get_source(risk))
+
+    def on_initialize_simulants(self, pop_data):
+        for risk in RISKS:
+            draw = self.randomness.get_draw(pop_data.index, additional_key=risk)
+            self.values[risk] = pd.Series(TMREL + 4 * SCALE * (draw - 0.25), index=pop_data.index)
+
+    def get_source(self, risk):
+        return lambda index: self.values[risk].loc[index]
+
+
+class Targets:
+    """Serves the target rates and their PAFs, and records them during each
+    time step after exposures are cached."""
+
+    @property
+    def name(self):
+        return 'targets'
+
+    def setup(self, builder):
+        self.rates = {}
+        self.pafs = {}
+        for target in TARGETS:
+            self.rates[target] = builder.value.register_value_producer(
+                f'{target.name}.{target.measure}', source=lambda index: pd.Series(0.1, index=index)
+            )
+            self.pafs[target] = builder.value.register_value_producer(
+                f'{target.name}.{target.measure}.paf', source=lambda index: [pd.Series(0.0, index=index)],
+                preferred_combiner=list_combiner, preferred_post_processor=union_post_processor
+            )
+        self.records = []
+        # Before the test population ages simulants, as disease models do.
+        builder.event.register_listener('time_step', self.on_time_step, priority=4)
+
+    def on_time_step(self, event):
+        self.records.append(self.get_values(event.index))
+
+    def get_values(self, index):
+        return {(target, measure): pipeline(index)
+                for target in TARGETS
+                for measure, pipeline in [('rate', self.rates[target]), ('paf', self.pafs[target])]}
+
+
+def make_data():
+    rows = [(sex, age_start, age_end, year, year + 1)
+            for sex in ['Male', 'Female']
+            for age_start, age_end in [(0, 25), (25, 50), (50, 75), (75, 95)]
+            for year in [2021, 2022]]
+    demography = pd.DataFrame(rows, columns=['sex', 'age_start', 'age_end', 'year_start', 'year_end'])
+    random = np.random.RandomState(0)
+    data = {}
+    for risk in RISKS:
+        relative_risk, paf = [], []
+        for target in data_values.RISK_EFFECT_TARGETS[risk]:
+            target = TargetString(target)
+            target_data = demography.assign(affected_entity=target.name, affected_measure=target.measure)
+            relative_risk.append(target_data.assign(parameter='per unit',
+                                                    value=random.uniform(1, 1.5, len(demography))))
+            paf.append(target_data.assign(value=random.uniform(0, 0.3, len(demography))))
+        data.update({
+            f'{risk}.distribution': 'normal',
+            f'{risk}.relative_risk': pd.concat(relative_risk, ignore_index=True),
+            f'{risk}.population_attributable_fraction': pd.concat(paf, ignore_index=True),
+            f'{risk}.tmred': {'distribution': 'uniform', 'min': TMREL - 1, 'max': TMREL + 1},
+            f'{risk}.relative_risk_scalar': SCALE,
+        })
+    return data
+
+
+def run(make_simulation, risk_effects):
+    targets = Targets()
+    configuration = {risk.name: {'exposure': 'data', 'rebinned_exposed': [], 'category_thresholds': []}
+                     for risk in RISKS}
+    sim = make_simulation([TestPopulation(), DemographicBins(), Exposures(), targets] + risk_effects,
+                          configuration=configuration, data=make_data())
+    sim.run()
+    targets.records.append(targets.get_values(sim.get_population().index))
+    return targets.records
+
+
+def test_joint_risk_effects_match_chained_risk_effects(make_simulation):
+    chained = run(make_simulation, [RiskEffect(risk, target) for risk in RISKS
+                                    for target in data_values.RISK_EFFECT_TARGETS[risk]])
+    joint = run(make_simulation, [JointRiskEffects(*RISKS)])
+
+    assert len(chained) == len(joint) > 1
+    for chained_values, joint_values in zip(chained, joint):
+        for key, expected in chained_values.items():
+            assert (expected > 0).all()
+            np.testing.assert_allclose(joint_values[key].to_numpy(), expected.to_numpy(), rtol=1e-12,
+                                       err_msg=str(key))
+    # Some simulants are above the TMREL, so the effects do something.
+    rates = chained[-1][(TARGETS[0], 'rate')]
+    assert (rates > 0.1).any() and (rates == 0.1).any()
+
+
+def test_joint_risk_effects_rejects_categorical_risks(make_simulation):
+    data = make_data()
+    data[f'{RISKS[0]}.distribution'] = 'dichotomous'
+    configuration = {risk.name: {'exposure': 'data', 'rebinned_exposed': [], 'category_thresholds': []}
+                     for risk in RISKS}
+    with pytest.raises(ValueError, match='continuous'):
+        make_simulation([TestPopulation(), DemographicBins(), Exposures(), Targets(), JointRiskEffects(*RISKS)],
+                        configuration=configuration, data=data)
+
+
+def test_joint_risk_effects_compute_simulants_outside_the_cached_index(make_simulation):
+    targets = Targets()
+    joint = JointRiskEffects(*RISKS)
+    configuration = {risk.name: {'exposure': 'data', 'rebinned_exposed': [], 'category_thresholds': []}
+                     for risk in RISKS}
+    sim = make_simulation([TestPopulation(), DemographicBins(), Exposures(), targets, joint],
+                          configuration=configuration, data=make_data())
+    index = sim.get_population(untracked=True).index
+    expected = targets.get_values(index)
+
+    # As when the step's event index leaves out some of the simulants asked for.
+    joint.on_time_step_prepare(SimpleNamespace(index=index[1::2]))
+    values = targets.get_values(index)
+    for key, value in expected.items():
+        assert value.notna().all()
+        pd.testing.assert_series_equal(values[key], value, check_exact=True)
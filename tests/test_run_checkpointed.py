@@ -0,0 +1,91 @@
+from collections import Counter
+
+import pandas as pd
+import pytest
+from vivarium.framework.engine import SimulationContext
+
+from vivarium_nih_us_cvd.tools import simulation as simulation_tools
+from vivarium_nih_us_cvd.tools.run_checkpointed import run_checkpointed
+from vivarium_nih_us_cvd.tools.simulation import (build_simulation, check_uncaptured_state, get_component_state,
+                                                  get_run_configuration, get_simulation_state, get_uncaptured_state)
+
+
+class Preempted(Exception):
+    pass
+
+
+@pytest.mark.parametrize('preempt_after', [1, 3])
+def test_resumed_run_matches_uninterrupted_run(model_specification, tmp_path, monkeypatch, preempt_after):
+    uninterrupted_dir = tmp_path / 'uninterrupted'
+    run_checkpointed(model_specification, uninterrupted_dir, 0, 1, 'baseline',
+                     checkpoint_interval=100, resume=False)
+
+    resumed_dir = tmp_path / 'resumed'
+    step = SimulationContext.step
+    steps = []
+
+    # The job is preempted in the step after ``preempt_after`` checkpointed
+    # steps, then resumed for the rest of the run.
+    def preemptible_step(simulation):
+        if len(steps) == preempt_after + 1:
+            raise Preempted()
+        steps.append(simulation._clock.time)
+        step(simulation)
+
+    with monkeypatch.context() as m:
+        m.setattr(SimulationContext, 'step', preemptible_step)
+        with pytest.raises(Preempted):
+            run_checkpointed(model_specification, resumed_dir, 0, 1, 'baseline',
+                             checkpoint_interval=1, resume=False)
+    assert not (resumed_dir / 'output.hdf').exists()
+    run_checkpointed(model_specification, resumed_dir, 0, 1, 'baseline',
+                     checkpoint_interval=1, resume=True)
+
+    expected = pd.read_hdf(uninterrupted_dir / 'output.hdf')
+    assert expected.filter(like='deaths_in').gt(0).all(axis=None)
+    pd.testing.assert_frame_equal(pd.read_hdf(resumed_dir / 'output.hdf'), expected)
+
+
+class Totals:
+    """Accumulates in an attribute checkpoints don't save."""
+
+    @property
+    def name(self):
+        return 'totals'
+
+    def __init__(self):
+        self.counts = Counter()
+        self.totals = {}
+
+
+class CheckpointedTotals(Totals):
+
+    @property
+    def name(self):
+        return 'checkpointed_totals'
+
+    def get_checkpoint_state(self):
+        return {'counts': self.counts, 'totals': self.totals}
+
+
+def test_get_uncaptured_state():
+    assert get_uncaptured_state(Totals()) == ['totals']
+    assert get_component_state(Totals()) == {'counts': Counter()}
+    assert get_uncaptured_state(CheckpointedTotals()) == []
+
+
+def test_uncaptured_state_raises_unless_allowed(model_specification):
+    simulation = build_simulation(model_specification, get_run_configuration(0, 1, 'baseline'))
+    check_uncaptured_state(simulation)
+    for component in [Totals(), CheckpointedTotals()]:
+        simulation._component_manager._components.add(component)
+    with pytest.raises(ValueError, match="'totals': \\['totals'\\]"):
+        check_uncaptured_state(simulation)
+    check_uncaptured_state(simulation, allow_uncaptured_state=True)
+
+
+def test_simulation_state_checks_vivarium_version(model_specification, monkeypatch):
+    simulation = build_simulation(model_specification, get_run_configuration(0, 1, 'baseline'))
+    monkeypatch.setattr(simulation_tools.vivarium, '__version__', '0.0.0')
+    with pytest.raises(RuntimeError, match='vivarium 0.0.0'):
+        get_simulation_state(simulation)
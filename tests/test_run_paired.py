@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+from vivarium.framework.engine import SimulationContext
+
+from vivarium_nih_us_cvd.constants import results
+from vivarium_nih_us_cvd.tools.run_paired import fork_scenario, run_paired
+from vivarium_nih_us_cvd.tools.simulation import build_simulation, get_run_configuration, get_simulation_state
+
+
+@pytest.fixture
+def initializations(monkeypatch):
+    """Records the scenario of each population initialization."""
+    scenarios = []
+    initialize_simulants = SimulationContext.initialize_simulants
+
+    def recorded(simulation):
+        scenarios.append(simulation.configuration.branch_name.scenario)
+        initialize_simulants(simulation)
+
+    monkeypatch.setattr(SimulationContext, 'initialize_simulants', recorded)
+    return scenarios
+
+
+def test_forked_scenario_starts_from_baseline_state(model_specification, initializations):
+    baseline = build_simulation(model_specification, get_run_configuration(0, 1, 'baseline'))
+    treatment = fork_scenario(model_specification, get_run_configuration(0, 1, 'treatment'),
+                              get_simulation_state(baseline))
+    assert initializations == ['baseline']
+    pd.testing.assert_frame_equal(treatment.get_population(), baseline.get_population())
+    assert (baseline._randomness._key_mapping._map == treatment._randomness._key_mapping._map).all()
+    assert treatment._clock.time == baseline._clock.time
+
+
+def test_forked_scenario_initializes_only_added_columns(model_specification, initializations):
+    baseline = build_simulation(model_specification, get_run_configuration(0, 1, 'baseline'))
+    baseline_pop = baseline.get_population()
+    # Baseline state that differs from what the treated scenario initializes.
+    baseline._population._population['age'] += 1
+    treated = fork_scenario(model_specification, get_run_configuration(0, 1, 'treated'),
+                            get_simulation_state(baseline))
+    assert initializations == ['baseline', 'treated']
+    treated_pop = treated.get_population()
+    pd.testing.assert_frame_equal(treated_pop[baseline_pop.columns], baseline.get_population())
+    assert treated_pop.treated.any() and not treated_pop.treated.all()
+
+    baseline.step()
+    with pytest.raises(ValueError, match='treated'):
+        fork_scenario(model_specification, get_run_configuration(0, 1, 'treated'), get_simulation_state(baseline))
+
+
+# Scenarios that add columns can only fork at initialization.
+@pytest.mark.parametrize('intervention_start, scenarios, expected_initializations', [
+    (None, ['baseline', 'treatment', 'placebo', 'treated'], ['baseline', 'treated']),
+    ('2022-01-01', ['baseline', 'treatment', 'placebo'], ['baseline']),
+])
+def test_run_paired_diverges_only_through_the_intervention(model_specification, tmp_path, initializations,
+                                                           intervention_start, scenarios, expected_initializations):
+    output_dir = tmp_path / 'output'
+    run_paired(model_specification, output_dir, scenarios, 0, 1, intervention_start=intervention_start)
+    assert initializations == expected_initializations
+
+    divergence = pd.read_csv(output_dir / 'divergence.csv', index_col='time', parse_dates=['time'])
+    assert (divergence.treatment.diff().dropna() >= 0).all() and divergence.treatment.iloc[-1] > 0
+    if intervention_start is not None:
+        assert divergence.index.min() >= pd.Timestamp(intervention_start)
+    # With common random numbers, everyone who dies under treatment also dies
+    # in baseline.
+    output = pd.read_hdf(output_dir / 'output.hdf').set_index(results.OUTPUT_SCENARIO_COLUMN)
+    deaths = output.filter(like='deaths_in')
+    assert (deaths.loc['treatment'] <= deaths.loc['baseline']).all()
+    pd.testing.assert_series_equal(deaths.loc['treatment'], deaths.loc['placebo'], check_names=False)
+    if 'treated' in scenarios:
+        pd.testing.assert_series_equal(deaths.loc['treatment'], deaths.loc['treated'], check_names=False)
+    if intervention_start is not None:
+        before = [c for c in deaths if c < f'deaths_in_{intervention_start}']
+        assert before
+        pd.testing.assert_series_equal(deaths.loc['treatment', before], deaths.loc['baseline', before],
+                                       check_names=False)
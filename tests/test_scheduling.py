@@ -0,0 +1,107 @@
+import math
+import sys
+
+import pytest
+
+from vivarium_nih_us_cvd.constants import metadata
+from vivarium_nih_us_cvd.tools import scheduling
+from vivarium_nih_us_cvd.tools.scheduling import LocalScheduler, Resources, Task
+
+GB = 1024 ** 3
+
+
+def exit_task(name, code):
+    return Task(name, ['-c', f'import sys; sys.exit({code})'])
+
+
+def fail_once_task(name, marker):
+    """Fails the first time it runs and succeeds after that."""
+    return Task(name, ['-c', f'import pathlib, sys; p = pathlib.Path({str(marker)!r}); '
+                             f'ran = p.exists(); p.touch(); sys.exit(0 if ran else 1)'])
+
+
+@pytest.mark.parametrize('memory_bytes, expected', [
+    (1 * GB, '4G'),
+    (int(4 * GB / metadata.MAKE_ARTIFACT_MEM_HEADROOM), '4G'),
+    (int(4 * GB / metadata.MAKE_ARTIFACT_MEM_HEADROOM) + 1, '8G'),
+    (20 * GB, '32G'),
+    (100 * GB, '64G'),  # Past the last tier.
+])
+def test_size_resources_memory(memory_bytes, expected):
+    assert scheduling.size_resources(memory_bytes, 0).memory == expected
+
+
+def test_size_resources_runtime():
+    minimum = metadata.MAKE_ARTIFACT_MIN_RUNTIME_SECONDS
+    assert scheduling.parse_runtime(scheduling.size_resources(GB, 1).runtime) == minimum
+    seconds = 2 * minimum + 0.3
+    runtime = scheduling.size_resources(GB, seconds).runtime
+    assert scheduling.parse_runtime(runtime) == math.ceil(seconds * metadata.MAKE_ARTIFACT_RUNTIME_HEADROOM)
+
+
+def test_escalate():
+    default_runtime = scheduling.parse_runtime(metadata.MAKE_ARTIFACT_RUNTIME)
+    escalated = scheduling.escalate(Resources(memory='4G', runtime='0:30:00'))
+    assert escalated.memory == '8G'
+    assert scheduling.parse_runtime(escalated.runtime) == default_runtime
+    # Requests between tiers go to the next one, and long run times are kept.
+    escalated = scheduling.escalate(Resources(memory='10G', runtime='10:00:00'))
+    assert escalated == Resources(memory='16G', runtime='10:00:00')
+    assert scheduling.escalate(Resources(memory='64G')).memory == '64G'
+
+
+def test_scheduler_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        scheduling.Scheduler(tmp_path)
+
+
+def test_local_scheduler_runs_tasks(tmp_path):
+    tasks = [exit_task('succeeds', 0), exit_task('fails', 3), exit_task('also_succeeds', 0)]
+    with LocalScheduler(tmp_path) as scheduler:
+        job_ids = scheduler.submit_array('job', tasks, Resources())
+        assert len(set(job_ids)) == len(tasks)
+        assert list(scheduler.wait(job_ids).values()) == [True, False, True]
+    assert (tmp_path / 'job.json').exists()
+
+
+@pytest.mark.skipif(sys.platform != 'linux', reason='Memory is limited with setrlimit.')
+def test_local_scheduler_enforces_memory(tmp_path):
+    task = Task('allocates', ['-c', f'bytearray({6 * GB})'])
+    with LocalScheduler(tmp_path, enforce_memory=True) as scheduler:
+        job_ids = scheduler.submit_array('job', [task], Resources(memory='4G'))
+        assert scheduler.wait(job_ids) == {job_ids[0]: False}
+
+
+def test_submit_tasks_groups_by_resources(tmp_path):
+    small, large = Resources(memory='4G'), Resources(memory='16G')
+    tasks = [(exit_task('a', 0), large), (exit_task('b', 0), small), (exit_task('c', 0), large)]
+    with LocalScheduler(tmp_path) as scheduler:
+        jobs = scheduling.submit_tasks(scheduler, 'job', tasks)
+    assert [(name, [t.name for t in tier_tasks], resources)
+            for name, tier_tasks, resources in scheduler.submitted] == [
+        ('job_4G', ['b'], small),
+        ('job_16G', ['a', 'c'], large),
+    ]
+    assert sorted((task.name, resources) for task, resources in jobs.values()) == sorted(
+        (task.name, resources) for task, resources in tasks
+    )
+
+
+def test_wait_for_tasks_retries_with_escalated_resources(tmp_path):
+    tasks = [
+        (exit_task('succeeds', 0), Resources(memory='4G')),
+        (fail_once_task('fails_once', tmp_path / 'marker'), Resources(memory='4G')),
+        (exit_task('always_fails', 1), Resources(memory='8G')),
+    ]
+    with LocalScheduler(tmp_path) as scheduler:
+        jobs = scheduling.submit_tasks(scheduler, 'job', tasks)
+        failed = scheduling.wait_for_tasks(scheduler, 'job', jobs, max_attempts=3)
+
+    assert [task.name for task in failed] == ['always_fails']
+    retries = [(name, [t.name for t in tier_tasks], resources.memory)
+               for name, tier_tasks, resources in scheduler.submitted[2:]]
+    assert retries == [
+        ('job_retry_1_8G', ['fails_once'], '8G'),
+        ('job_retry_1_16G', ['always_fails'], '16G'),
+        ('job_retry_2', ['always_fails'], '32G'),
+    ]
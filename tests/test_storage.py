@@ -0,0 +1,99 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import tables
+from vivarium.framework.artifact import Artifact, ArtifactException, EntityKey
+
+from vivarium_nih_us_cvd.constants import data_keys
+from vivarium_nih_us_cvd.data import storage as artifact_storage
+from vivarium_nih_us_cvd.data.storage import (StorageOptions, apply_storage_options, get_max_relative_error,
+                                               get_table_bytes, write_data)
+
+KEY = 'cause.angina.incidence_rate'
+STORAGE = StorageOptions()
+
+
+def make_draws(values=None, rows=50, draws=100):
+    index = pd.MultiIndex.from_product([['Female', 'Male'], np.arange(rows // 2, dtype=float)],
+                                       names=['sex', 'age_start'])
+    if values is None:
+        values = np.random.RandomState(0).lognormal(-4, 2, size=(rows, draws))
+    return pd.DataFrame(values, index=index, columns=[f'draw_{i}' for i in range(draws)])
+
+
+def get_complib(artifact, key):
+    with tables.open_file(artifact.path, mode='r') as file:
+        return file.get_node(EntityKey(key).path).table.filters.complib
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    return Artifact(tmp_path / 'artifact.hdf')
+
+
+def test_reduced_precision_round_trip(artifact):
+    data = make_draws()
+    write_data(artifact, KEY, data, STORAGE)
+    loaded = Artifact(artifact.path).load(KEY)
+
+    assert (loaded.dtypes == STORAGE.dtype).all()
+    assert get_complib(artifact, KEY) == STORAGE.complib
+    pd.testing.assert_index_equal(loaded.index, data.index)
+    assert 0 < get_max_relative_error(data, loaded) <= STORAGE.max_relative_error
+
+
+@pytest.mark.parametrize('key', data_keys.FULL_PRECISION_KEYS)
+def test_full_precision_keys_stay_float64(artifact, key):
+    data = make_draws()
+    write_data(artifact, key, data, STORAGE)
+    loaded = Artifact(artifact.path).load(key)
+
+    assert (loaded.dtypes == np.float64).all()
+    pd.testing.assert_frame_equal(loaded, data)
+
+
+# Below the smallest normal float32 the cast loses precision, and above the
+# largest it overflows.
+@pytest.mark.parametrize('value', [1e-40, 1e39])
+def test_values_float32_cannot_hold_stay_float64(artifact, value):
+    data = make_draws(np.full((50, 100), value))
+    data.iloc[0, 0] = 0.1
+    write_data(artifact, KEY, data, STORAGE)
+    pd.testing.assert_frame_equal(Artifact(artifact.path).load(KEY), data)
+
+
+def test_apply_storage_options_repacks_only_when_worthwhile(artifact, monkeypatch):
+    data = make_draws(rows=200, draws=1000)
+    write_data(artifact, KEY, data, STORAGE)
+    copies = []
+    copy_file = tables.copy_file
+    monkeypatch.setattr(tables, 'copy_file', lambda *args, **kwargs: copies.append(args) or copy_file(*args, **kwargs))
+
+    # Rewriting a small table written by vivarium frees little space.
+    table_bytes = get_table_bytes(artifact)
+    small_key = 'cause.angina.prevalence'
+    artifact.write(small_key, make_draws(rows=4, draws=10))
+    apply_storage_options(artifact, STORAGE, table_bytes)
+    assert get_complib(artifact, small_key) == STORAGE.complib
+    assert not copies
+
+    # Replacing a large table frees most of the file.
+    table_bytes = get_table_bytes(artifact)
+    artifact.replace(KEY, data * 2)
+    size = Path(artifact.path).stat().st_size
+    apply_storage_options(artifact, STORAGE, table_bytes)
+    assert len(copies) == 1
+    assert Path(artifact.path).stat().st_size < 0.6 * size
+    artifact = Artifact(artifact.path)
+    assert get_complib(artifact, KEY) == STORAGE.complib
+    pd.testing.assert_frame_equal(artifact.load(KEY), (data * 2).astype(STORAGE.dtype))
+    pd.testing.assert_frame_equal(artifact.load(small_key), make_draws(rows=4, draws=10).astype(STORAGE.dtype))
+
+
+def test_write_data_checks_vivarium_version(artifact, monkeypatch):
+    monkeypatch.setattr(artifact_storage.vivarium, '__version__', '0.0.0')
+    with pytest.raises(ArtifactException, match='vivarium 0.0.0'):
+        write_data(artifact, KEY, make_draws(), STORAGE)
+    assert KEY not in artifact
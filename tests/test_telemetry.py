@@ -0,0 +1,55 @@
+import json
+import time
+
+import numpy as np
+import pytest
+
+from vivarium_nih_us_cvd.data import telemetry
+
+ALLOCATION_BYTES = 200 * 1024 ** 2
+
+pytestmark = pytest.mark.skipif(telemetry.get_rss() == 0, reason='Resident memory is read from /proc.')
+
+
+def allocate():
+    """Allocates and touches memory, and holds it for a few samples."""
+    data = np.ones(ALLOCATION_BYTES // 8)
+    time.sleep(10 * telemetry.RSS_SAMPLE_SECONDS)
+    return data
+
+
+def test_key_peaks_are_per_key(tmp_path):
+    telemetry.start_build('Alabama', tmp_path / 'alabama.hdf')
+    with telemetry.record_key('transient'):
+        allocate()
+    with telemetry.record_key('small'):
+        pass
+    path = telemetry.finish_build()
+
+    build = json.loads(path.read_text())
+    transient, small = build['keys']
+    assert transient['peak_rss_bytes'] - build['start_rss_bytes'] > 0.9 * ALLOCATION_BYTES
+    assert transient['rss_delta_bytes'] < 0.5 * ALLOCATION_BYTES
+    assert small['peak_rss_bytes'] < transient['peak_rss_bytes'] - 0.5 * ALLOCATION_BYTES
+    assert build['peak_rss_bytes'] == transient['peak_rss_bytes']
+
+
+def test_build_memory_excludes_earlier_builds_in_the_process(tmp_path):
+    telemetry.start_build('Alabama', tmp_path / 'alabama.hdf')
+    with telemetry.record_key('retained'):
+        retained = allocate()
+    telemetry.finish_build()
+
+    telemetry.start_build('California', tmp_path / 'california.hdf')
+    with telemetry.record_key('small'):
+        pass
+    telemetry.finish_build()
+    del retained
+
+    summary = json.loads(telemetry.summarize_telemetry(tmp_path).read_text())
+    alabama, california = summary['artifacts']['alabama'], summary['artifacts']['california']
+    # The second build starts with the first build's memory still held.
+    assert california['peak_rss_bytes'] > alabama['memory_bytes'] - 0.5 * ALLOCATION_BYTES
+    assert california['memory_bytes'] < alabama['memory_bytes'] - 0.9 * ALLOCATION_BYTES
+    assert summary['max_memory_bytes'] == alabama['memory_bytes']
+    assert summary['keys']['retained']['max_peak_rss_bytes'] == alabama['peak_rss_bytes']